@@ -3,10 +3,10 @@
 View archived EPICS process variable history
 Author: Friedrich Schotte
 Date created: 2017-10-04
-Date last modified: 2021-12-10
-Revision comment: Cleanup: channel_archiver
+Date last modified: 2026-10-17
+Revision comment: Using downsampled summaries for long time ranges
 """
-__version__ = "1.6.1"
+__version__ = "1.7.0"
 
 from logging import debug, info, error
 
@@ -251,7 +251,8 @@ class Channel_Archiver_Chart(wx.Panel):
     def value(self, attribute_name):
         if attribute_name in (self.t_name, self.v_name):
             t, v = self.log.history(self.t_name, self.v_name,
-                                    time_range=self.t_min_t_max)
+                                    time_range=self.t_min_t_max,
+                                    max_points=self.max_points)
             if attribute_name == self.t_name:
                 value = t
             else:
@@ -266,6 +267,12 @@ class Channel_Archiver_Chart(wx.Panel):
             value = getattr(self, attribute_name)
         return value
 
+    @property
+    def max_points(self):
+        """How many data points can be resolved on the screen?"""
+        width, height = self.figure.get_size_inches()
+        return max(int(width * self.figure.dpi), 100)
+
     def default_value(self, attribute_name):
         from numpy import nan
         from time import time
@@ -1,12 +1,13 @@
 """Simple database
 Author: Friedrich Schotte
 Date created: 2010-12-10
-Date last modified: 2022-07-01
+Date last modified: 2026-10-17
 Python Version: 2.7 and 3.7
-Revision comment: Updated example
+Revision comment: Reading changes by other processes while write-behind is pending
 """
-__version__ = "1.12.5"
+__version__ = "1.14.2"
 
+import atexit
 import logging
 from threading import Lock
 from typing import Any
@@ -32,23 +33,17 @@ def db(key, default_value: Any = ""):
     """Retrieve a value from the database
     Return value: any built-in Python data type"""
     value = dbget(key)
-    from numpy import nan, inf, array  # noqa - for "eval"
-    from collections import OrderedDict  # noqa - for "eval"
-    try:
-        import wx  # for "eval"
-    except ImportError:
-        pass
     if default_value is not None:
         dtype = type(default_value)
         # noinspection PyBroadException
         try:
-            value = dtype(eval(value))
+            value = dtype(dbeval(value))
         except Exception:
             value = default_value
     else:
         # noinspection PyBroadException
         try:
-            value = eval(value)
+            value = dbeval(value)
         except Exception:
             value = None
     return value
@@ -58,11 +53,9 @@ def dbval(key, default_value=None):
     """Retrieve a value from the database
     Return value: any built-in Python data type"""
     value = dbget(key)
-    from numpy import nan, inf, array  # noqa - for "eval"
-    from collections import OrderedDict  # noqa - for "eval"
     # noinspection PyBroadException
     try:
-        value = eval(value)
+        value = dbeval(value)
     except Exception:
         value = default_value
     if default_value is not None:
@@ -75,6 +68,39 @@ def dbval(key, default_value=None):
     return value
 
 
+def dbeval(str_value):
+    """Python object represented by a string in a settings file
+    Each string is evaluated only once.
+    Raises ValueError if the string is not a valid Python expression."""
+    if str_value not in evaluated_values:
+        from numpy import nan, inf, array  # noqa - for "eval"
+        from collections import OrderedDict  # noqa - for "eval"
+        try:
+            import wx  # noqa - for "eval"
+        except ImportError:
+            pass
+        # noinspection PyBroadException
+        try:
+            evaluated_value = (True, eval(str_value))
+        except Exception as x:
+            evaluated_value = (False, x)
+        if len(evaluated_values) >= max_evaluated_values:
+            evaluated_values.clear()
+        evaluated_values[str_value] = evaluated_value
+    valid, value = evaluated_values[str_value]
+    if not valid:
+        raise ValueError(f"{str_value!r}: {value}")
+    if not isinstance(value, immutable_types):
+        from copy import deepcopy
+        value = deepcopy(value)  # Caller might modify it.
+    return value
+
+
+evaluated_values = {}
+max_evaluated_values = 10000
+immutable_types = (type(None), bool, int, float, complex, str, bytes)
+
+
 def dbput(key, value):
     """Store a value in the database
     value: string"""
@@ -84,17 +110,67 @@ def dbput(key, value):
         changed = db_get_cache(key) != value
         if changed:
             db_put_cache(key, value)
-            dbsave(key_basename)
+            if write_behind_delay > 0:
+                unsaved_changes.setdefault(key_basename, {})[db_resname(key)] = value
+                dbsave_later(key_basename)
+            else:
+                dbsave(key_basename)
     if changed:
         handle_key_change(key)
 
 
+def dbwrite_behind(delay=0.25):
+    """Delay saving of changed values, such that many changes to the same
+    settings file can be written in one update of the file
+    delay: seconds, 0 = write immediately"""
+    global write_behind_delay
+    write_behind_delay = delay
+    if delay <= 0:
+        dbflush()
+
+
+def dbflush():
+    """Save all changes delayed by dbwrite_behind, e.g. before shutdown"""
+    for key_basename in list(unsaved):
+        save_unsaved(key_basename)
+
+
+def dbsave_later(key_basename):
+    """Save changes after 'write_behind_delay', together with all other changes
+    to the same file made in the meantime"""
+    if key_basename not in unsaved:
+        from threading import Timer
+        unsaved.add(key_basename)
+        timer = Timer(write_behind_delay, save_unsaved, [key_basename])
+        timer.daemon = True
+        timer.start()
+
+
+def save_unsaved(key_basename):
+    changed_keys = []
+    with lock_of_filename(db_filename_of_key_basename(key_basename)):
+        if key_basename in unsaved:
+            # Keep changes made by other processes in the meantime.
+            changed_keys = dbread_changed_keys(key_basename, force=True)
+            unsaved.discard(key_basename)
+            unsaved_changes.pop(key_basename, None)
+            dbsave(key_basename)
+    for key in changed_keys:
+        handle_key_change(key)
+
+
+write_behind_delay = 0.0
+unsaved = set()
+unsaved_changes = {}  # key_basename: {resname: value}, not saved yet
+
+
 def dbget(key):
     """Retrieve a value from the database
     Return value: string, if not found: empty string"""
     with lock_of_key(key):
         key_basename = db_basename(key)
-        dbread_with_callbacks(key_basename)
+        if key_basename not in watched:
+            dbread_with_callbacks(key_basename)
         value = db_get_cache(key)
     return value
 
@@ -176,14 +252,79 @@ def handle_file_change(key_basename):
     dbread_with_callbacks(key_basename)
 
 
-def dbread_with_callbacks(key_basename):
+def watch(key_basename):
+    """Keep the cached content of a settings file up to date by monitoring
+    the file for changes, rather than checking its timestamp each time a
+    value is read
+    All settings files in the same directory share one observer."""
+    if key_basename not in watched:
+        from os.path import abspath, dirname, isdir
+        filename = abspath(db_filename_of_key_basename(key_basename))
+        directory = dirname(filename)
+        with watch_lock:
+            if directory not in observers and isdir(directory):
+                try:
+                    observers[directory] = directory_observer(directory)
+                except ImportError as x:
+                    debug(f"{directory}: Not monitoring: {x}")
+            if directory in observers:
+                watched_files[filename] = key_basename
+                watched.add(key_basename)
+
+
+def directory_observer(directory):
+    """Report changes of settings files in a directory to
+    'handle_watched_file_change'"""
+    from watchdog.observers.polling import PollingObserver
+    from watchdog.events import FileSystemEventHandler
+    from silence_watchdog_messages import silence_watchdog_messages
+    silence_watchdog_messages()
+
+    class Event_Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            from os.path import abspath
+            for pathname in event.src_path, getattr(event, "dest_path", ""):
+                key_basename = watched_files.get(abspath(pathname)) if pathname else None
+                if key_basename is not None:
+                    handle_watched_file_change(key_basename)
+
+    observer = PollingObserver()
+    observer.daemon = True
+    observer.schedule(Event_Handler(), path=directory, recursive=False)
+    observer.start()
+    debug(f"Monitoring {directory!r}")
+    return observer
+
+
+def handle_watched_file_change(key_basename):
+    # Called from the observer thread, concurrently with "dbput" and "dbget".
+    with lock_of_filename(db_filename_of_key_basename(key_basename)):
+        changed_keys = dbread_changed_keys(key_basename, force=True)
+    for key in changed_keys:
+        handle_key_change(key)
+
+
+watched = set()
+watched_files = {}  # filename: key_basename
+observers = {}  # directory: observer
+watch_lock = Lock()
+
+
+def dbread_with_callbacks(key_basename, force=False):
+    for key in dbread_changed_keys(key_basename, force=force):
+        handle_key_change(key)
+
+
+def dbread_changed_keys(key_basename, force=False):
+    """Update the cached content of a settings file
+    Return value: list of monitored keys whose values changed"""
     affected_keys = [key for key in list(callbacks) if db_basename(key) == key_basename]
     # debug("affected_keys = %r" % affected_keys)
 
     old_values = dict([(key, db_get_cache(key)) for key in affected_keys])
     # debug("old_values = %r" % old_values)
 
-    dbread(key_basename)
+    dbread(key_basename, force=force)
 
     new_values = dict([(key, db_get_cache(key)) for key in affected_keys])
     # debug("new_values = %r" % new_values)
@@ -191,9 +332,7 @@ def dbread_with_callbacks(key_basename):
     changed_keys = [key for key in affected_keys if new_values[key] != old_values[key]]
     if changed_keys:
         debug("changed_keys = %r" % changed_keys)
-
-    for key in changed_keys:
-        handle_key_change(key)
+    return changed_keys
 
 
 def handle_key_change(key):
@@ -230,7 +369,9 @@ def db_put_cache(key, value):
     DB[key_basename][resname] = value
 
 
-def dbread(key_basename):
+def dbread(key_basename, force=False):
+    """force: check the timestamp of the file even if it was checked less
+    than a second ago"""
     from os.path import exists, getmtime
     from time import time
     from collections import OrderedDict
@@ -238,10 +379,11 @@ def dbread(key_basename):
         DB[key_basename] = OrderedDict()
     settings_file = db_filename_of_key_basename(key_basename)
     # Check only every N seconds to avoid excessive system load.
-    if settings_file in last_checked and \
+    if not force and settings_file in last_checked and \
             time() - last_checked[settings_file] < 1.0:
         return
     last_checked[settings_file] = time()
+    watch(key_basename)
 
     if not exists(settings_file):
         return
@@ -254,7 +396,9 @@ def dbread(key_basename):
         settings = ""
     settings = settings.replace("\r", "")  # Convert DOS to UNIX
 
-    DB[key_basename] = OrderedDict()
+    # Parse into a new dictionary and replace the old one in one step, such
+    # that concurrent readers never see a partially filled dictionary.
+    values = OrderedDict()
     lines = settings.split("\n")
     if len(lines) > 0 and lines[-1] == "":
         lines = lines[0:-1]
@@ -263,7 +407,7 @@ def dbread(key_basename):
         if "=" in entry:
             i = entry.index("=")
             resname = entry[:i].strip(" ")
-            DB[key_basename][resname] = entry[i + 1:].strip(" ")
+            values[resname] = entry[i + 1:].strip(" ")
 
     entry = ""
     for line in lines:
@@ -283,6 +427,9 @@ def dbread(key_basename):
             entry = line
     process(entry)
 
+    # Unsaved changes take precedence over the content of the file.
+    values.update(unsaved_changes.get(key_basename, {}))
+    DB[key_basename] = values
     timestamps[settings_file] = getmtime(settings_file)
 
 
@@ -419,6 +566,8 @@ DB = {}
 timestamps = {}
 last_checked = {}
 
+atexit.register(dbflush)
+
 
 def normpath(pathname):
     """Make sure no illegal characters are contained in the file name."""
@@ -453,3 +602,4 @@ if __name__ == '__main__':
     print(f"db({key!r}, {default_value!r})")
     print(f"dbset({key!r}, 'test')")
     print("dbset('test.test1', db('test.test1', '')+'.')")
+    print("dbwrite_behind(); [dbset(f'test.test{i}', i) for i in range(200)]; dbflush()")
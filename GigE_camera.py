@@ -3,10 +3,10 @@
 Driver for Prosilica GigE CCD cameras.
 Author: Friedrich Schotte
 Date created: 2010-10-16
-Date last modified: 2022-07-19
-Revision comment: Identical timestamps for event generated at the same time
+Date last modified: 2026-10-17
+Revision comment: rgb_image: documented when to copy
 """
-__version__ = "2.13.9"
+__version__ = "2.14.1"
 
 # Copied libPvAPI-1.22-OSX-x86.dylib from  AVT GigE SDK 1.22 for Mac OS X,
 # bin-pc/x86/libPvAPI.dylib
@@ -68,6 +68,8 @@ class GigE_camera(object):
         self.framerate = nan
         self.handlers = {}
         self.resume_active = 0
+        from camera_frame_buffer import Frame_Ring_Buffer
+        self.frame_buffer = Frame_Ring_Buffer()
 
     def __repr__(self):
         return "%s(%r)" % (type(self).__name__, self.name)
@@ -452,10 +454,10 @@ class GigE_camera(object):
         """Last read image as 1D numpy array.
         Size: 1360 * 1024 * 3 = 4177920, data type: int8
         (int8 rather than uint8 for compatibility with EPICS CA  array PVs)
+        Read-only view of 'rgb_image'
         """
         from numpy import int8
-        from numpy import frombuffer
-        rgb_array_flat = frombuffer(self.rgb_data, int8)
+        rgb_array_flat = self.rgb_image.view(int8).reshape(-1)
         return rgb_array_flat
 
     rgb_array_flat = property(get_rgb_array_flat)
@@ -464,38 +466,60 @@ class GigE_camera(object):
         """Last read image as 3D numpy array. Dimensions: 3xWxH
         datatype: uint8
         Usage R,G,B = camera.rgb_array"""
-        from numpy import frombuffer, uint8
-        w, h = self.width, self.height
-        return frombuffer(self.rgb_data, uint8).reshape(h, w, 3).T
+        return self.rgb_image.T
 
     rgb_array = RGB_array = property(get_rgb_array)
 
-    def get_rgb_data(self):
-        """All the pixels of the last read image as one single chunk
-        of contiguous data.
-        The format is one byte per pixel, in the order R,G,B, by scan line,
-        top left to bottom right.
+    def get_rgb_image(self):
+        """Last read image as 3D numpy array. Dimensions: HxWx3
+        datatype: uint8
+        Decoded once per frame into 'frame_buffer'. Repeated reads of the
+        same frame return the same data, as read-only view, with attribute
+        'frame_count'.
+        The view is overwritten after 4 newer frames ('valid' becomes False).
+        Callers that keep the image need to make a copy.
         'PixelFormat' attribute of the camera needs to be set to 'Bayer8'
         or 'Rgb24'.
         """
+        from functools import partial
         self.resume_auto()
         if not self.has_image:
-            return self.default_rgb_data()
-        if self.image_pixel_format == "Rgb24":
-            return self.get_image_data()
-        elif self.image_pixel_format == "Bayer8":
-            return self.rgb_from_bayer8()
+            return self.default_rgb_image()
+        i = self.current_buffer()
+        frame = self.Frames[i].frame
+        key = (frame.FrameCount, frame.TimestampHi, frame.TimestampLo)
+        shape = (frame.Height, frame.Width, 3)
+        rgb_image = self.frame_buffer.frame(key, shape, partial(self.decode_frame, i),
+                                            frame_count=frame.FrameCount)
+        return rgb_image
+
+    rgb_image = property(get_rgb_image)
+
+    def decode_frame(self, i, RGB):
+        """Convert the image in frame buffer i to RGB
+        RGB: uint8 array, dimensions (height, width, 3), overwritten"""
+        pixel_format = self.pixel_format_name(self.Frames[i].frame.Format)
+        if pixel_format == "Rgb24":
+            self.copy_rgb24(i, RGB)
+        elif pixel_format == "Bayer8":
+            self.rgb_from_bayer8(i, RGB)
         else:
-            return self.default_rgb_data()
+            RGB[...] = 0
+
+    def get_rgb_data(self):
+        """All the pixels of the last read image as one single chunk
+        of contiguous data.
+        The format is one byte per pixel, in the order R,G,B, by scan line,
+        top left to bottom right.
+        """
+        return self.rgb_image.tobytes()
 
     rgb_data = property(get_rgb_data)
 
-    def default_rgb_data(self):
-        rgb_size = self.width * self.height * 3
-        from numpy import zeros, int8
-        rgb_array_flat = zeros(rgb_size, int8)
-        rgb_data = rgb_array_flat.tobytes()
-        return rgb_data
+    def default_rgb_image(self):
+        from numpy import zeros, uint8
+        from camera_frame_buffer import frame_array
+        return frame_array(zeros((self.height, self.width, 3), uint8), 0)
 
     def get_image_data(self):
         """Returns all the pixels of the last read image as one single chunk
@@ -507,16 +531,26 @@ class GigE_camera(object):
             return ""
         return string_at(buffer, frame.ImageBufferSize)
 
-    def rgb_from_bayer8(self):
-        """Assuming BayerPattern = 0:  first line RGRG, second line GBGB..."""
-        from ctypes import addressof, byref, c_char, c_char_p, string_at
-        frame = self.Frames[self.current_buffer()].frame
-        RGB_size = frame.ImageBufferSize * 3
-        RGB = (c_char * RGB_size)()
-        addr = addressof(RGB)
+    def copy_rgb24(self, i, RGB):
+        """Copy the image in frame buffer i
+        RGB: uint8 array, dimensions (height, width, 3), overwritten"""
+        from numpy import frombuffer, uint8
+        frame = self.Frames[i].frame
+        RGB_flat = RGB.reshape(-1)
+        count = min(RGB_flat.size, frame.ImageBufferSize, len(self.Frames[i].buffer))
+        RGB_flat[0:count] = frombuffer(self.Frames[i].buffer, uint8, count=count)
+        RGB_flat[count:] = 0
+
+    def rgb_from_bayer8(self, i, RGB):
+        """Demosaic the image in frame buffer i directly into RGB
+        Assuming BayerPattern = 0:  first line RGRG, second line GBGB...
+        RGB: C-contiguous uint8 array, dimensions (height, width, 3),
+        overwritten"""
+        from ctypes import byref, c_char_p
+        frame = self.Frames[i].frame
+        addr = RGB.ctypes.data
         R, G, B = c_char_p(addr), c_char_p(addr + 1), c_char_p(addr + 2)
         self.PvAPI.PvUtilityColorInterpolate(byref(frame), R, G, B, 2, 0)
-        return string_at(RGB, RGB_size)
         # PvUtilityColorInterpolate converts 8-bit Bayer mosaic images into
         # RGB24 images. The first parameter is the input frame data structure,
         # the following three parameter are the starting addresses for the
@@ -5,15 +5,39 @@ Server for Prosilica GigE CCD cameras
 Configuration:
     set_defaults()
 
+Besides the full image ("RGB_ARRAY_FLAT"), reduced images are published for
+clients that do not need full resolution: region of interest
+("ROI_ARRAY_FLAT"), binned ("BINNED_ARRAY_FLAT"), binned grayscale
+("GRAY_ARRAY_FLAT") and compressed ("COMPRESSED_ARRAY_FLAT").
+Each is calculated once per frame, the first time it is needed, and the
+update rate of each can be limited ("<STREAM>_MAX_RATE", 0 = unlimited).
+A reduced image is calculated only while a client subscribes to it, or if
+its maximum rate is set to a non-zero value.
+
 Author: Friedrich Schotte
 Date created: 2020-03-16
-Date last modified: 2021-01-11
-Revision comment: Issue: always simulated
+Date last modified: 2026-10-17
+Revision comment: rgb_array_flat: publishing the per-frame copy
 """
-__version__ = "1.2.3"
+__version__ = "1.3.3"
 
 from cached_function import cached_function
 from IOC_single_threaded import IOC
+from alias_property import alias_property
+
+
+class stream_alias_property(alias_property):
+    """Notifies of changes like the camera property it is an alias of, but
+    its value is the IOC's copy of the image, made once per frame, rather
+    than a view of the camera's frame buffer, which is overwritten after a
+    few frames"""
+    def __init__(self, name, stream_name):
+        alias_property.__init__(self, name)
+        self.stream_name = stream_name
+
+    def get_property(self, instance):
+        from camera_streams import flat
+        return flat(instance.stream(self.stream_name))
 
 
 @cached_function()
@@ -31,6 +55,10 @@ class Camera_IOC(IOC):
         else:
             self.camera = self.GigE_camera(name)
 
+        self.streams = {}
+        self.streams_frame_count = None
+        self.last_update_times = {}
+
         self.add_idle_handler(0.05, self.resume)
 
     def __repr__(self):
@@ -89,14 +117,54 @@ class Camera_IOC(IOC):
         "gain",
         "bin_factor",
         "stream_bytes_per_second",
+        "ROI",
+        "stream_bin_factor",
+        "compression",
+        "compressed_stream",
+        "rgb_max_rate",
+        "roi_max_rate",
+        "binned_max_rate",
+        "gray_max_rate",
+        "compressed_max_rate",
+    ]
+
+    # Calculated from "rgb_array_flat", updated with it
+    stream_property_names = [
+        "roi_array_flat",
+        "roi_width",
+        "roi_height",
+        "binned_array_flat",
+        "binned_width",
+        "binned_height",
+        "gray_array_flat",
+        "compressed_array_flat",
+    ]
+
+    stream_setting_names = [
+        "ROI",
+        "stream_bin_factor",
+        "compression",
+        "compressed_stream",
     ]
-    from alias_property import alias_property
+
+    max_rate_names = {
+        "rgb_array_flat": "rgb_max_rate",
+        "roi_array_flat": "roi_max_rate",
+        "binned_array_flat": "binned_max_rate",
+        "gray_array_flat": "gray_max_rate",
+        "compressed_array_flat": "compressed_max_rate",
+    }
+
+    @property
+    def all_property_names(self):
+        return self.property_names + self.stream_property_names + ["scan_period"]
+
     name = alias_property("camera.name")
 
     monitor = alias_property("camera.monitor")
     monitor_clear = alias_property("camera.monitor_clear")
 
-    rgb_array_flat = alias_property("camera.rgb_array_flat")
+    rgb_array_flat = stream_alias_property("camera.rgb_array_flat", "rgb")
     acquiring = alias_property("camera.acquiring")
     IP_addr = alias_property("camera.IP_addr")
     state = alias_property("camera.state")
@@ -115,6 +183,139 @@ class Camera_IOC(IOC):
     bin_factor = alias_property("camera.bin_factor")
     stream_bytes_per_second = alias_property("camera.stream_bytes_per_second")
 
+    from persistent_property_new import persistent_property
+    ROI = persistent_property("GigE_camera.{name}.stream.ROI", [0, 0, 256, 256])
+    stream_bin_factor = persistent_property("GigE_camera.{name}.stream.bin_factor", 4)
+    compression = persistent_property("GigE_camera.{name}.stream.compression", "zlib")
+    compressed_stream = persistent_property("GigE_camera.{name}.stream.compressed_stream", "gray")
+    rgb_max_rate = persistent_property("GigE_camera.{name}.stream.rgb_max_rate", 0.0)
+    roi_max_rate = persistent_property("GigE_camera.{name}.stream.roi_max_rate", 0.0)
+    binned_max_rate = persistent_property("GigE_camera.{name}.stream.binned_max_rate", 0.0)
+    gray_max_rate = persistent_property("GigE_camera.{name}.stream.gray_max_rate", 0.0)
+    compressed_max_rate = persistent_property("GigE_camera.{name}.stream.compressed_max_rate", 0.0)
+
+    @property
+    def roi_array_flat(self):
+        from camera_streams import flat
+        return flat(self.stream("roi"))
+
+    @property
+    def roi_width(self):
+        return self.stream_region[2]
+
+    @property
+    def roi_height(self):
+        return self.stream_region[3]
+
+    @property
+    def stream_region(self):
+        from camera_streams import ROI_region
+        return ROI_region(self.ROI, self.width, self.height)
+
+    @property
+    def binned_array_flat(self):
+        from camera_streams import flat
+        return flat(self.stream("binned"))
+
+    @property
+    def binned_width(self):
+        from camera_streams import binned_shape
+        return binned_shape(self.width, self.height, self.stream_bin_factor)[0]
+
+    @property
+    def binned_height(self):
+        from camera_streams import binned_shape
+        return binned_shape(self.width, self.height, self.stream_bin_factor)[1]
+
+    @property
+    def gray_array_flat(self):
+        from camera_streams import flat
+        return flat(self.stream("gray"))
+
+    @property
+    def compressed_array_flat(self):
+        return self.stream("compressed")
+
+    def stream(self, name):
+        """Image calculated from the current frame, once per frame
+        name: "rgb", "roi", "binned", "gray", or "compressed"
+        Return value: uint8 array, dimensions (height, width, 3) or
+        (height, width), 1D int8 array for compressed"""
+        frame_count = self.frame_count
+        if frame_count != self.streams_frame_count:
+            self.streams = {}
+            self.streams_frame_count = frame_count
+        if name not in self.streams:
+            self.streams[name] = self.calculate_stream(name)
+        return self.streams[name]
+
+    def calculate_stream(self, name):
+        import camera_streams
+        if name == "roi":
+            image = camera_streams.ROI_image(self.stream("rgb"), self.ROI)
+        elif name == "binned":
+            image = camera_streams.binned_image(self.stream("rgb"), self.stream_bin_factor)
+        elif name == "gray":
+            image = camera_streams.grayscale_image(self.stream("binned"))
+        elif name == "compressed":
+            source = self.compressed_stream
+            if source not in ["rgb", "roi", "binned", "gray"]:
+                source = "gray"
+            image = camera_streams.compressed_image(self.stream(source), self.compression)
+        else:
+            width, height = self.width, self.height
+            # The camera's image is a view of its frame buffer, reused after a
+            # few frames. The streams are kept until the next frame is
+            # published, so they need their own copy.
+            image = camera_streams.RGB_image(self.camera.rgb_array_flat, width, height).copy()
+        return image
+
+    def handle_change(self, property_name):
+        """Publish a new value of a PV, and of the PVs calculated from it,
+        observing the rate limit of each stream"""
+        if property_name in self.stream_setting_names:
+            self.streams = {}
+        if not self.rate_limited(property_name):
+            IOC.handle_change(self, property_name)
+        if property_name == "rgb_array_flat" or property_name in self.stream_setting_names:
+            for name in self.stream_property_names:
+                if self.stream_active(name):
+                    self.handle_change(name)
+
+    @property
+    def timed_update_property_names(self):
+        return [name for name in self.all_property_names if self.stream_active(name)]
+
+    def stream_active(self, property_name):
+        """Calculate and publish this PV? Reduced images only if a client
+        subscribes to them, or if their maximum rate is set"""
+        if property_name not in self.max_rate_names or property_name == "rgb_array_flat":
+            return True
+        if getattr(self, self.max_rate_names[property_name]) > 0:
+            return True
+        return self.PV_connected(property_name)
+
+    def PV_connected(self, property_name):
+        """Is a client subscribing to the PV of this property?
+        True if the CA server cannot tell"""
+        try:
+            from CAServer_single_threaded import PV_connected
+        except ImportError:
+            return True
+        return PV_connected(self.PV_name(property_name))
+
+    def rate_limited(self, property_name):
+        """Skip this update of a stream because the last update was too
+        recent?"""
+        from time import time
+        if property_name not in self.max_rate_names:
+            return False
+        max_rate = getattr(self, self.max_rate_names[property_name])
+        if max_rate > 0 and time() - self.last_update_times.get(property_name, 0) < 1 / max_rate:
+            return True
+        self.last_update_times[property_name] = time()
+        return False
+
 
 def run(name, simulated=False):
     camera_ioc(name, simulated).run()
@@ -3,10 +3,10 @@
 Simulator for Prosilica GigE CCD cameras.
 Author: Friedrich Schotte
 Date created: 2020-05-07
-Date last modified: 2022-07-19
-Revision comment: Cleanup: logging, f-strings
+Date last modified: 2026-10-17
+Revision comment: rgb_image: documented when to copy
 """
-__version__ = "1.0.8"
+__version__ = "1.1.1"
 
 import warnings
 import logging
@@ -39,7 +39,9 @@ class GigE_camera_simulator(object):
         self.frame_count = 0
         self.timestamp = 0.0
         self.handlers = {}
-        self.rgb_array = self.default_rgb_array
+        from camera_frame_buffer import Frame_Ring_Buffer
+        self.frame_buffer = Frame_Ring_Buffer()
+        self.raw_image = self.default_raw_image
 
     def __repr__(self):
         return f"{self.class_name}({self.name!r})"
@@ -123,25 +125,52 @@ class GigE_camera_simulator(object):
         return self.handlers[property_name]
 
     def update_image(self):
-        self.rgb_array = self.simulated_image
+        self.raw_image = self.simulated_image
 
     @property
     def simulated_image(self):
-        """Image as 3D numpy array. Dimensions: 3xWxH, data type: uint8
-        Usage R,G,B = image
+        """Image as transmitted by the camera, data type: uint8
+        Dimensions: HxW for "Bayer8", HxWx3 otherwise
         """
         from numpy import uint8
-        image = noise(1, shape=(3, self.width, self.height), dtype=uint8)
+        image = noise(1, shape=self.raw_image_shape, dtype=uint8)
+        return image
+
+    @property
+    def default_raw_image(self):
+        from numpy import zeros, uint8
+        image = zeros(self.raw_image_shape, uint8)
         return image
 
     @property
-    def default_rgb_array(self):
+    def raw_image_shape(self):
+        if self.pixel_format == "Bayer8":
+            shape = (self.height, self.width)
+        else:
+            shape = (self.height, self.width, 3)
+        return shape
+
+    @property
+    def rgb_image(self):
+        """Image as 3D numpy array. Dimensions: HxWx3, data type: uint8
+        Decoded once per frame into 'frame_buffer', read-only, with
+        attributes 'frame_count' and 'valid'. Callers that keep the image
+        need to make a copy.
+        """
+        raw_image = self.raw_image
+        key = (self.frame_count, self.timestamp, id(raw_image))
+        shape = raw_image.shape[0:2] + (3,)
+        from functools import partial
+        rgb_image = self.frame_buffer.frame(key, shape, partial(decode_image, raw_image),
+                                            frame_count=self.frame_count)
+        return rgb_image
+
+    @property
+    def rgb_array(self):
         """Image as 3D numpy array. Dimensions: 3xWxH, data type: uint8
         Usage R,G,B = image
         """
-        from numpy import zeros, uint8
-        image = zeros((3, self.width, self.height), uint8)
-        return image
+        return self.rgb_image.T
 
     @property
     def rgb_array_flat(self):
@@ -150,11 +179,11 @@ class GigE_camera_simulator(object):
         (int8 rather than uint8 for compatibility with EPICS CA array PVs)
         """
         from numpy import int8
-        return self.rgb_array.T.flatten().astype(int8)
+        return self.rgb_image.view(int8).reshape(-1)
 
     @property
     def rgb_data(self):
-        return self.rgb_array_flat.tobytes()
+        return self.rgb_image.tobytes()
 
     @property
     def state(self):
@@ -286,10 +315,20 @@ class GigE_camera_simulator(object):
 GigE_camera = GigE_camera_simulator
 
 
+def decode_image(raw_image, RGB):
+    """Convert an image as transmitted by the camera to RGB
+    RGB: uint8 array, dimensions (height, width, 3), overwritten"""
+    if raw_image.ndim == 2:
+        from camera_frame_buffer import demosaic_bayer8
+        demosaic_bayer8(raw_image, RGB)
+    else:
+        RGB[...] = raw_image
+
+
 def noise(average, shape, dtype=int):
     """Simulated shot noise"""
-    from numpy import product
-    size = product(shape)
+    from numpy import prod
+    size = prod(shape)
     from numpy.random import poisson
     from numpy import ceil, tile
     block_size = 40000
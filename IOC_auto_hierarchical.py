@@ -2,10 +2,10 @@
 EPICS Input/Output Controller
 Author: Friedrich Schotte
 Date created: 2020-12-02
-Date last modified: 2022-08-18
-Revision comment: Debug messages
+Date last modified: 2026-10-17
+Revision comment: attribute_paths: caching names not found, invalidate_attribute_paths
 """
-__version__ = "1.3.2"
+__version__ = "1.4.2"
 
 from logging import debug, exception
 from cached_function import cached_function
@@ -141,17 +141,65 @@ class IOC:
         self.cas.casput(PV_name, event.value, timestamp=event.time)
 
     def attribute_reference(self, PV_name):
+        """reference or item_reference object for a PV.
+        None if the driver has no matching attribute
+        The attribute path is resolved only once per PV name, also if there
+        is no matching attribute. The objects along the path are looked up
+        again each time, such that a changed intermediate object is not used
+        in its old state."""
         reference = None
-        if PV_name.startswith(self.prefix):
-            name = PV_name[len(self.prefix):]
-            # name = translate(name) # "METHOD.MOTOR1.CHOICES" -> "METHOD.CHOICES1"
+        paths = self.attribute_paths
+        if PV_name in paths:
+            path = paths[PV_name]
+        else:
             # noinspection PyBroadException
             try:
-                reference = attribute_reference(self.driver, name)
+                path = self.resolved_attribute_path(PV_name)
             except Exception:
-                exception("{PV_name!r}")
+                exception(f"{PV_name!r}")
+                path = None  # Not cached, to retry next time
+            else:
+                if len(paths) >= self.max_cached_paths:
+                    paths.clear()
+                paths[PV_name] = path
+        if path is not None:
+            # noinspection PyBroadException
+            try:
+                reference = path_reference(self.driver, path)
+            except Exception as x:
+                debug(f"{PV_name}: {path}: {x}")
+                paths.pop(PV_name, None)
         return reference
 
+    max_cached_paths = 10000
+
+    @property
+    def attribute_paths(self):
+        """PV name: attribute path, as returned by 'attribute_path',
+        None if not existing
+        Discarded when the driver object changes"""
+        driver = self.driver
+        if self.__dict__.get("__attribute_paths_driver__") is not driver:
+            self.__attribute_paths_driver__ = driver
+            self.__attribute_paths__ = {}
+        return self.__attribute_paths__
+
+    def invalidate_attribute_paths(self, PV_name=None):
+        """To be called when the driver adds or removes attributes
+        PV_name: default: all"""
+        if PV_name is None:
+            self.__dict__.pop("__attribute_paths_driver__", None)
+        else:
+            self.attribute_paths.pop(PV_name, None)
+
+    def resolved_attribute_path(self, PV_name):
+        path = None
+        if PV_name.startswith(self.prefix):
+            name = PV_name[len(self.prefix):]
+            # name = translate(name) # "METHOD.MOTOR1.CHOICES" -> "METHOD.CHOICES1"
+            path = attribute_path(self.driver, name)
+        return path
+
     @property
     @cached_function()
     def attribute_names(self):
@@ -170,6 +218,16 @@ def example(name): return Example(name)
 
 
 def attribute_reference(obj, name):
+    path = attribute_path(obj, name)
+    ref = path_reference(obj, path) if path is not None else None
+    return ref
+
+
+def attribute_path(obj, name):
+    """Case-insensitive, dot-separated PV name translated to the actual
+    attribute names of the object hierarchy
+    Return value: tuple of ("attribute", name) or ("item", index) steps,
+    None if there is no matching attribute"""
     # debug(f"{obj}, {name!r}")
     name = name.upper()
     if "." in name:
@@ -179,12 +237,11 @@ def attribute_reference(obj, name):
 
     if attribute_name in attribute_names(obj):
         attribute_name = attribute_names(obj)[attribute_name]
+        path = (("attribute", attribute_name),)
         if remaining_part:
             child_object = getattr(obj, attribute_name)
-            ref = attribute_reference(child_object, remaining_part)
-        else:
-            from reference import reference
-            ref = reference(obj, attribute_name)
+            child_path = attribute_path(child_object, remaining_part)
+            path = path + child_path if child_path is not None else None
     elif index_suffix(attribute_name) is not None:
         indexable_attribute_name, index = name_without_index(attribute_name), index_suffix(attribute_name)
         # debug(f"attribute_name = {indexable_attribute_name!r}, index = {index}")
@@ -192,21 +249,35 @@ def attribute_reference(obj, name):
             indexable_attribute_name = attribute_names(obj)[indexable_attribute_name]
             obj = getattr(obj, indexable_attribute_name)
             if hasattr(obj, "__getitem__"):
+                path = (("attribute", indexable_attribute_name), ("item", index))
                 if remaining_part:
                     child_object = obj[index]
-                    ref = attribute_reference(child_object, remaining_part)
-                else:
-                    from item_reference import item_reference
-                    ref = item_reference(obj, index)
+                    child_path = attribute_path(child_object, remaining_part)
+                    path = path + child_path if child_path is not None else None
             else:
                 debug(f"{name}: {obj}[{index}]: {obj} is not indexable")
-                ref = None
+                path = None
         else:
             debug(f"{name}: {obj} has no attribute '{attribute_name}' or '{indexable_attribute_name}'")
-            ref = None
+            path = None
     else:
         debug(f"{name}: {obj} has no attribute '{attribute_name}'")
-        ref = None
+        path = None
+    return path
+
+
+def path_reference(obj, path):
+    """reference or item_reference for the last step of an attribute path,
+    as returned by 'attribute_path', looking up the intermediate objects"""
+    for (kind, key) in path[:-1]:
+        obj = getattr(obj, key) if kind == "attribute" else obj[key]
+    kind, key = path[-1]
+    if kind == "attribute":
+        from reference import reference
+        ref = reference(obj, key)
+    else:
+        from item_reference import item_reference
+        ref = item_reference(obj, key)
     return ref
 
 
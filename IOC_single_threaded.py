@@ -1,10 +1,10 @@
 """EPICS IOC prototype
 Author: Friedrich Schotte
 Date created: 2019-05-18
-Date last modified: 2020-01-11
-Revision comment: Added: default_scan_period
+Date last modified: 2026-10-17
+Revision comment: Added: timed_update_property_names
 """
-__version__ = "2.5"
+__version__ = "2.6"
 
 from logging import debug, info
 
@@ -73,7 +73,7 @@ class IOC(object):
     def timed_update(self):
         from CAServer_single_threaded import casget, casput
         from same import same
-        for property_name in self.all_property_names:
+        for property_name in self.timed_update_property_names:
             value = getattr(self, property_name)
             PV_name = self.PV_name(property_name)
             old_value = casget(PV_name)
@@ -81,6 +81,11 @@ class IOC(object):
                 debug("Timed update: %s=%r" % (PV_name, value))
                 casput(PV_name, value, update=False)
 
+    @property
+    def timed_update_property_names(self):
+        """Properties to be polled every 'scan_period'"""
+        return self.all_property_names
+
     EPICS_enabled = running  # for backward compatibility
 
     def start_monitoring(self):
@@ -2,10 +2,10 @@
 Caching of Channel Access
 Author: Friedrich Schotte
 Date created: 2020-11-27
-Date last modified: 2021-05-28
-Revision comment: Do not update cache as "None" if PV disconnects
+Date last modified: 2026-10-17
+Revision comment: Cached values kept in memory, saved as one file
 """
-__version__ = "1.0.3"
+__version__ = "1.1.0"
 
 from logging import debug, warning
 import warnings
@@ -130,23 +130,37 @@ class _PV_cached:
             # debug("%s=%s" % (self.name, value))
             self.cached_value = value
 
+    @property
+    def value_cache(self):
+        from PV_value_cache import PV_value_cache
+        return PV_value_cache()
+
     def get_cached_value(self):
-        cache_value = self.cache.get(self.name + ".py")
-        # Needed for eval:
-        try:
-            value = eval(cache_value)
-        except Exception:
-            value = None
+        if self.value_cache.exists(self.name):
+            value = self.value_cache.get(self.name)
+        else:
+            value = self.legacy_cached_value
         return value
 
     def set_cached_value(self, value):
-        self.cache.set(self.name + ".py", repr(value).encode("utf-8"))
+        self.value_cache.set(self.name, value)
 
     cached_value = property(get_cached_value, set_cached_value)
 
     @property
     def cache_exists(self):
-        return self.cache.exists(self.name + ".py")
+        return self.value_cache.exists(self.name) or self.cache.exists(self.name + ".py")
+
+    @property
+    def legacy_cached_value(self):
+        """Saved by a previous version, one file per PV"""
+        cache_value = self.cache.get(self.name + ".py")
+        # Needed for eval:
+        try:
+            value = eval(cache_value)
+        except Exception:
+            value = None
+        return value
 
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+"""
+Memory-resident cache of the last known values of Channel Access PVs,
+saved to disk as a single file, periodically and at exit, such that the
+values are available after a restart when a PV is not reachable.
+The file is read when the first value is needed, and read again when it
+was modified by another process.
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment: save: lock file, keeping changes unsaved on failure
+"""
+__version__ = "1.1.1"
+
+from contextlib import contextmanager
+from logging import warning
+from sys import platform
+from cached_function import cached_function
+
+
+@cached_function()
+def PV_value_cache(name="PV"):
+    return PV_Value_Cache(name)
+
+
+class PV_Value_Cache(object):
+    save_interval = 10.0  # seconds
+    check_interval = 1.0  # seconds, for modifications of the file
+
+    def __init__(self, name="PV"):
+        from threading import Lock
+        self.name = name
+        self.lock = Lock()
+        self.__values__ = None
+        self.file_mtime = None
+        self.last_checked = 0.0
+        self.unsaved = set()
+        self.saving_thread = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+    def get(self, key, default=None):
+        """A copy, if the value is mutable, such that the caller may modify it"""
+        return copy(self.values.get(key, default))
+
+    def exists(self, key):
+        return key in self.values
+
+    def set(self, key, value):
+        values = self.values
+        with self.lock:
+            values[key] = copy(value)
+            self.unsaved.add(key)
+            if self.saving_thread is None:
+                self.start_saving()
+
+    @property
+    def values(self):
+        """key: value dictionary, loaded from disk on first use and reloaded
+        if the file was modified since"""
+        from time import time
+        if self.__values__ is None or time() - self.last_checked >= self.check_interval:
+            with self.lock:
+                self.last_checked = time()
+                mtime = self.current_file_mtime
+                if self.__values__ is None or mtime != self.file_mtime:
+                    values = self.load()
+                    # Changes not saved yet take precedence over the file.
+                    if self.__values__ is not None:
+                        for key in self.unsaved:
+                            values[key] = self.__values__[key]
+                    self.__values__ = values
+                    self.file_mtime = mtime
+        return self.__values__
+
+    @property
+    def current_file_mtime(self):
+        from os.path import getmtime
+        try:
+            mtime = getmtime(self.filename)
+        except OSError:
+            mtime = None
+        return mtime
+
+    def load(self):
+        from pickle import loads
+        try:
+            content = open(self.filename, "rb").read()
+        except OSError:
+            content = b""
+        values = {}
+        if content:
+            # noinspection PyBroadException
+            try:
+                values = loads(content)
+            except Exception as x:
+                warning(f"{self.filename}: {x}")
+            if not isinstance(values, dict):
+                values = {}
+        return values
+
+    def save(self):
+        """Write the values that changed to disk, keeping the values
+        saved by other processes
+        Changes remain unsaved until the file was written successfully."""
+        from pickle import dumps, HIGHEST_PROTOCOL
+        from os import replace, makedirs, getpid
+        from os.path import dirname, exists
+        with self.lock:
+            changes = {key: self.__values__[key] for key in self.unsaved}
+        if changes:
+            directory = dirname(self.filename)
+            temp_filename = f"{self.filename}.{getpid()}.tmp"
+            try:
+                if not exists(directory):
+                    makedirs(directory, exist_ok=True)
+                # Other processes must not save between 'load' and 'replace'.
+                with file_lock(self.filename + ".lock"):
+                    values = self.load()
+                    values.update(changes)
+                    with open(temp_filename, "wb") as file:
+                        file.write(dumps(values, protocol=HIGHEST_PROTOCOL))
+                    replace(temp_filename, self.filename)
+                    mtime = self.current_file_mtime
+            except OSError as x:
+                warning(f"{self.filename}: {x}")
+            else:
+                with self.lock:
+                    for key in changes:
+                        # Not saved if changed again in the meantime.
+                        if self.__values__.get(key) is changes[key]:
+                            self.unsaved.discard(key)
+                    # Values saved by other processes in the meantime
+                    for key in values:
+                        if key not in self.unsaved:
+                            self.__values__[key] = values[key]
+                    self.file_mtime = mtime
+
+    def start_saving(self):
+        from threading import Thread
+        import atexit
+        atexit.register(self.save)
+        self.saving_thread = Thread(target=self.keep_saving, daemon=True)
+        self.saving_thread.start()
+
+    def keep_saving(self):
+        from time import sleep
+        while True:
+            sleep(self.save_interval)
+            self.save()
+
+    @property
+    def filename(self):
+        from tempfile import gettempdir
+        return f"{gettempdir()}/{self.name}/values.pickle"
+
+
+@contextmanager
+def file_lock(filename):
+    """Exclusive lock across processes, held while the context is active
+    filename: lock file, created if needed"""
+    with open(filename, "a+b") as file:
+        if platform == "win32":
+            import msvcrt
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def copy(value):
+    """Copy of a mutable value, immutable values as is"""
+    if not isinstance(value, immutable_types):
+        from copy import deepcopy
+        value = deepcopy(value)
+    return value
+
+
+immutable_types = (type(None), bool, int, float, complex, str, bytes)
+
+
+if __name__ == "__main__":
+    import logging
+
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    self = PV_value_cache()
+    print('self.set("NIH:TIMING.registers.image_number.count", 0)')
+    print('self.get("NIH:TIMING.registers.image_number.count")')
+    print('self.save()')
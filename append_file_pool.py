@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+"""
+Pool of open files for appending, to avoid opening and closing a file
+for each line written to a log file.
+Files are kept open in least-recently-used order, up to a maximum count,
+and closed after an idle timeout.
+Writes are buffered and flushed periodically, or when the amount of
+unwritten data for a file exceeds a threshold.
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment:
+"""
+__version__ = "1.0"
+
+from logging import warning
+from cached_function import cached_function
+
+
+@cached_function()
+def append_file_pool():
+    return Append_File_Pool()
+
+
+class Append_File_Pool(object):
+    max_open = 256  # number of files
+    idle_timeout = 60.0  # seconds
+    flush_interval = 1.0  # seconds
+    flush_bytes = 65536  # unwritten data per file
+
+    def __init__(self, max_open=None, idle_timeout=None,
+                 flush_interval=None, flush_bytes=None):
+        from collections import OrderedDict
+        from threading import Lock
+        if max_open is not None:
+            self.max_open = max_open
+        if idle_timeout is not None:
+            self.idle_timeout = idle_timeout
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        if flush_bytes is not None:
+            self.flush_bytes = flush_bytes
+        self.files = OrderedDict()  # filename: [file object, last used, unflushed bytes]
+        self.lock = Lock()
+        self.flushing_thread = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+    def write(self, filename, data):
+        """Append to a file
+        filename: normalized pathname
+        data: bytes"""
+        from time import time
+        with self.lock:
+            entry = self.entry(filename)
+            if entry is not None:
+                file, _, unflushed = entry
+                try:
+                    file.write(data)
+                except OSError as x:
+                    warning(f"{filename}: {x}")
+                    self.close_file(filename)
+                else:
+                    entry[1] = time()
+                    entry[2] = unflushed + len(data)
+                    if entry[2] >= self.flush_bytes:
+                        self.flush_file(filename)
+            if self.flushing_thread is None:
+                self.start_flushing()
+
+    def size(self, filename):
+        """Current length of a file, including unflushed data
+        filename: normalized pathname"""
+        from os.path import getsize
+        with self.lock:
+            if filename in self.files:
+                size = self.files[filename][0].tell()
+            else:
+                try:
+                    size = getsize(filename)
+                except OSError:
+                    size = 0
+        return size
+
+    def entry(self, filename):
+        """Open file, if needed, and mark it as most recently used"""
+        from os.path import dirname, exists
+        from os import makedirs
+        from time import time
+        if filename in self.files:
+            self.files.move_to_end(filename)
+        else:
+            while len(self.files) >= self.max_open:
+                self.close_file(next(iter(self.files)))
+            directory = dirname(filename)
+            if directory and not exists(directory):
+                try:
+                    makedirs(directory)
+                except OSError as x:
+                    if not exists(directory):
+                        warning(f"{directory}: {x}")
+            try:
+                file = open(filename, "ab", buffering=self.flush_bytes)
+            except OSError as x:
+                warning(f"{filename}: {x}")
+            else:
+                self.files[filename] = [file, time(), 0]
+        return self.files.get(filename)
+
+    def flush(self, filename=None):
+        """Write buffered data to disk
+        filename: default: all files"""
+        with self.lock:
+            filenames = [filename] if filename is not None else list(self.files)
+            for filename in filenames:
+                if filename in self.files:
+                    self.flush_file(filename)
+
+    def flush_file(self, filename):
+        entry = self.files[filename]
+        if entry[2] > 0:
+            try:
+                entry[0].flush()
+            except OSError as x:
+                warning(f"{filename}: {x}")
+            entry[2] = 0
+
+    def close(self, filename=None):
+        """filename: default: all files"""
+        with self.lock:
+            filenames = [filename] if filename is not None else list(self.files)
+            for filename in filenames:
+                if filename in self.files:
+                    self.close_file(filename)
+
+    def close_file(self, filename):
+        file = self.files.pop(filename)[0]
+        try:
+            file.close()
+        except OSError as x:
+            warning(f"{filename}: {x}")
+
+    def close_idle_files(self):
+        from time import time
+        with self.lock:
+            for filename in list(self.files):
+                if time() - self.files[filename][1] > self.idle_timeout:
+                    self.close_file(filename)
+
+    def start_flushing(self):
+        from threading import Thread
+        import atexit
+        atexit.register(self.close)
+        self.flushing_thread = Thread(target=self.keep_flushing, daemon=True)
+        self.flushing_thread.start()
+
+    def keep_flushing(self):
+        from time import sleep
+        while True:
+            sleep(self.flush_interval)
+            self.flush()
+            self.close_idle_files()
+
+
+if __name__ == "__main__":
+    import logging
+
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    self = append_file_pool()
+    print('from time import time; t=time(); [self.write("/tmp/test.txt", b"test\\n") for i in range(100000)]; time()-t')
+    print('self.flush()')
@@ -1,13 +1,20 @@
 #!/usr/bin/env python
 """
 Prosilica GigE CCD cameras.
+
+Reduced images (region of interest, binned, grayscale, compressed), as
+published by 'GigE_camera_IOC', are available for viewers that do not need
+the full image: 'ROI_RGB_array', 'binned_RGB_array', 'gray_array',
+'decompressed_array'.
+The update rate of each can be limited, e.g. 'gray_max_rate'.
+
 Author: Friedrich Schotte
 Python Version: 2.7, 3.6
 Date created: 2020-04-02
-Date last modified: 2021-07-19
-Revision comment: Using monitored_property_1
+Date last modified: 2026-10-17
+Revision comment: Added: ROI, binned, grayscale and compressed image streams
 """
-__version__ = "3.4.3"
+__version__ = "3.5.0"
 
 import logging
 from PV_property import PV_property
@@ -68,6 +75,24 @@ class Camera(object):
     bin_factor = PV_property("bin_factor", 1)
     stream_bytes_per_second = PV_property("stream_bytes_per_second", 0)
 
+    roi_array_flat = PV_property("roi_array_flat", zeros(0, int8))
+    roi_width = PV_property("roi_width", 0)
+    roi_height = PV_property("roi_height", 0)
+    binned_array_flat = PV_property("binned_array_flat", zeros(0, int8))
+    binned_width = PV_property("binned_width", 0)
+    binned_height = PV_property("binned_height", 0)
+    gray_array_flat = PV_property("gray_array_flat", zeros(0, int8))
+    compressed_array_flat = PV_property("compressed_array_flat", zeros(0, int8))
+    ROI = PV_property("ROI", [0, 0, 0, 0])
+    stream_bin_factor = PV_property("stream_bin_factor", 4)
+    compression = PV_property("compression", "zlib")
+    compressed_stream = PV_property("compressed_stream", "gray")
+    rgb_max_rate = PV_property("rgb_max_rate", 0.0)
+    roi_max_rate = PV_property("roi_max_rate", 0.0)
+    binned_max_rate = PV_property("binned_max_rate", 0.0)
+    gray_max_rate = PV_property("gray_max_rate", 0.0)
+    compressed_max_rate = PV_property("compressed_max_rate", 0.0)
+
     @monitored_property
     def RGB_array(self, rgb_array_flat, width, height):
         """Dimensions: (3, W, H) e.g. (3, 1360, 1024), datatype: uint8"""
@@ -75,6 +100,32 @@ class Camera(object):
         RGB_array = reshape(rgb_array_flat.view(uint8), (height, width, 3)).T
         return RGB_array
 
+    @monitored_property
+    def ROI_RGB_array(self, roi_array_flat, roi_width, roi_height):
+        """Region of interest, dimensions: (3, W, H), datatype: uint8"""
+        from numpy import uint8
+        return reshape(roi_array_flat.view(uint8), (roi_height, roi_width, 3)).T
+
+    @monitored_property
+    def binned_RGB_array(self, binned_array_flat, binned_width, binned_height):
+        """Dimensions: (3, W, H) e.g. (3, 340, 256), datatype: uint8"""
+        from numpy import uint8
+        return reshape(binned_array_flat.view(uint8), (binned_height, binned_width, 3)).T
+
+    @monitored_property
+    def gray_array(self, gray_array_flat, binned_width, binned_height):
+        """Binned, grayscale, dimensions: (W, H), datatype: uint8"""
+        from numpy import uint8
+        return reshape(gray_array_flat.view(uint8), (binned_height, binned_width)).T
+
+    @monitored_property
+    def decompressed_array(self, compressed_array_flat):
+        """Image selected by 'compressed_stream'
+        Dimensions: (3, W, H) for RGB, (W, H) for grayscale, datatype: uint8
+        The dimensions are part of the compressed data."""
+        from camera_streams import decompressed_image
+        return decompressed_image(compressed_array_flat).T
+
     server_ip_address = PV_info_property("pixel_format", "IP_address")
 
     bin_factors = ["1", "2", "4", "8"]
@@ -104,8 +155,8 @@ class Camera(object):
 
 def reshape(array, shape):
     """shape: (w,h,d)"""
-    from numpy import product
-    array = resize(array, product(shape)).reshape(shape)
+    from numpy import prod
+    array = resize(array, prod(shape)).reshape(shape)
     return array
 
 
@@ -0,0 +1,165 @@
+"""
+Preallocated ring buffer for decoded camera images.
+Each frame is decoded (demosaiced) once, into the next slot of the ring, the
+first time it is requested. Repeated requests for the same frame return the
+same data without decoding or copying again.
+Images are handed out as read-only views, tagged with their frame count.
+A view remains valid until 'length' newer frames have been decoded, after
+which its slot is reused. Each slot counts how often it was reused, such
+that an outdated view can be detected: 'image.valid' is False.
+Callers that keep an image for longer than one frame need to make a copy,
+e.g. 'image.copy()'. Views of views, e.g. 'image.T', share the slot of
+the original view, copies are independent of the buffer.
+
+Usage:
+buffer = Frame_Ring_Buffer()
+image = buffer.frame(key, (1024, 1360, 3), decode, frame_count=1)
+image.frame_count
+image.valid
+
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment: valid: Generation number per slot
+"""
+__version__ = "1.1"
+
+from numpy import ndarray
+
+
+class Frame_Array(ndarray):
+    """Read-only image, tagged with the frame count of the camera"""
+    frame_count = 0
+    buffer = None
+    slot = 0
+    generation = 0
+
+    def __array_finalize__(self, obj):
+        from numpy import may_share_memory
+        self.frame_count = getattr(obj, "frame_count", 0)
+        buffer = getattr(obj, "buffer", None)
+        if buffer is not None and may_share_memory(self, obj):
+            self.buffer = buffer
+            self.slot = obj.slot
+            self.generation = obj.generation
+
+    @property
+    def valid(self):
+        """False if the slot of the ring buffer this image is a view of has
+        been overwritten with a newer frame since"""
+        return self.buffer is None or \
+            self.buffer.generations[self.slot] == self.generation
+
+    def __array_wrap__(self, array, context=None, return_scalar=False):
+        # Reductions, e.g. 'sum', return plain scalars, as for 'ndarray'.
+        if array.ndim == 0:
+            return array[()]
+        return ndarray.__array_wrap__(self, array, context)
+
+
+def frame_array(array, frame_count, buffer=None, slot=0):
+    """Read-only view of an array, tagged with a frame count
+    buffer, slot: to which the array belongs, for 'valid'"""
+    view = array.view(Frame_Array)
+    view.frame_count = frame_count
+    if buffer is not None:
+        view.buffer = buffer
+        view.slot = slot
+        view.generation = buffer.generations[slot]
+    view.flags.writeable = False
+    return view
+
+
+class Frame_Ring_Buffer:
+    def __init__(self, length=4, dtype="uint8"):
+        from threading import Lock
+        self.length = length
+        self.dtype = dtype
+        self.slots = [None] * length
+        self.keys = [None] * length
+        self.generations = [0] * length
+        self.next_slot = 0
+        self.lock = Lock()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(length={self.length})"
+
+    def frame(self, key, shape, decode, frame_count=0):
+        """Decoded image of a frame, decoded only once
+        key: identifies the frame, e.g. (frame count, timestamp)
+        shape: e.g. (height, width, 3)
+        decode: function to call with the slot (writable array of the given
+            shape) as argument, if the frame is not already in the buffer
+        frame_count: tag of the returned view
+        Return value: read-only 'Frame_Array'"""
+        with self.lock:
+            if key in self.keys:
+                i = self.keys.index(key)
+                if self.slots[i].shape == tuple(shape):
+                    return frame_array(self.slots[i], frame_count, self, i)
+                self.keys[i] = None
+            i = self.next_slot
+            self.next_slot = (i + 1) % self.length
+            if self.slots[i] is None or self.slots[i].shape != tuple(shape):
+                from numpy import empty
+                self.slots[i] = empty(shape, self.dtype)
+            self.keys[i] = None
+            self.generations[i] += 1
+            decode(self.slots[i])
+            self.keys[i] = key
+            return frame_array(self.slots[i], frame_count, self, i)
+
+    def clear(self):
+        with self.lock:
+            self.keys = [None] * self.length
+
+
+def demosaic_bayer8(bayer, out):
+    """Bilinear interpolation of a Bayer mosaic image, pattern:
+    first line RGRG, second line GBGB, ...
+    Same convention as PvUtilityColorInterpolate with BayerPattern = 0
+    bayer: 2D uint8 array, dimensions (height, width)
+    out: uint8 array, dimensions (height, width, 3), overwritten"""
+    from numpy import pad, uint16
+    P = pad(bayer, 1, mode="reflect").astype(uint16)
+    C = P[1:-1, 1:-1]
+    vertical = P[0:-2, 1:-1] + P[2:, 1:-1]
+    horizontal = P[1:-1, 0:-2] + P[1:-1, 2:]
+    cross = vertical + horizontal
+    diagonal = P[0:-2, 0:-2] + P[0:-2, 2:] + P[2:, 0:-2] + P[2:, 2:]
+    cross += 2
+    cross >>= 2
+    diagonal += 2
+    diagonal >>= 2
+    vertical += 1
+    vertical >>= 1
+    horizontal += 1
+    horizontal >>= 1
+
+    R, G, B = out[..., 0], out[..., 1], out[..., 2]
+    # Red pixels (even row, even column)
+    R[0::2, 0::2] = C[0::2, 0::2]
+    G[0::2, 0::2] = cross[0::2, 0::2]
+    B[0::2, 0::2] = diagonal[0::2, 0::2]
+    # Green pixels on red rows (even row, odd column)
+    R[0::2, 1::2] = horizontal[0::2, 1::2]
+    G[0::2, 1::2] = C[0::2, 1::2]
+    B[0::2, 1::2] = vertical[0::2, 1::2]
+    # Green pixels on blue rows (odd row, even column)
+    R[1::2, 0::2] = vertical[1::2, 0::2]
+    G[1::2, 0::2] = C[1::2, 0::2]
+    B[1::2, 0::2] = horizontal[1::2, 0::2]
+    # Blue pixels (odd row, odd column)
+    R[1::2, 1::2] = diagonal[1::2, 1::2]
+    G[1::2, 1::2] = cross[1::2, 1::2]
+    B[1::2, 1::2] = C[1::2, 1::2]
+    return out
+
+
+if __name__ == "__main__":
+    from numpy import random, uint8
+    bayer = random.randint(0, 256, (1024, 1360)).astype(uint8)
+    buffer = Frame_Ring_Buffer()
+    print("image = buffer.frame(1, bayer.shape + (3,), lambda out: demosaic_bayer8(bayer, out), frame_count=1)")
+    print("image.frame_count")
+    print("image.valid")
@@ -0,0 +1,172 @@
+"""
+Reduced representations of camera images, for streaming over the network:
+region of interest, binned, grayscale, and compressed.
+The server ('GigE_camera_IOC') encodes, the client ('camera_client') decodes.
+
+Images are NumPy arrays of dimensions (height, width, 3) for RGB or
+(height, width) for grayscale, datatype uint8, as in 'rgb_array_flat'.
+
+Compressed images carry their own dimensions in a 16-byte header, such that
+a client does not depend on other PVs being updated at the same time:
+codec name (4 bytes), height, width, depth (uint32 each).
+Codecs: "zlib", "lz4" (if the 'lz4' package is installed)
+
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment:
+"""
+__version__ = "1.0"
+
+import logging
+
+header_format = "<4sIII"
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+def RGB_image(rgb_array_flat, width, height):
+    """rgb_array_flat: 1D int8 array as published by 'GigE_camera'
+    Return value: uint8 array of dimensions (height, width, 3),
+    empty if the size does not match"""
+    from numpy import uint8, zeros
+    if rgb_array_flat.size != width * height * 3:
+        return zeros((0, 0, 3), uint8)
+    return rgb_array_flat.view(uint8).reshape((height, width, 3))
+
+
+def ROI_region(ROI, width, height):
+    """ROI: [x, y, width, height], in pixels, 0 width or height: to the edge
+    of the image
+    Return value: (x, y, width, height), limited to the image"""
+    x, y, w, h = (list(ROI) + [0, 0, 0, 0])[0:4]
+    x, y = min(max(int(x), 0), width), min(max(int(y), 0), height)
+    w = width - x if w <= 0 else min(int(w), width - x)
+    h = height - y if h <= 0 else min(int(h), height - y)
+    return x, y, w, h
+
+
+def ROI_image(image, ROI):
+    """Crop to region of interest
+    ROI: [x, y, width, height]"""
+    x, y, w, h = ROI_region(ROI, image.shape[1], image.shape[0])
+    return image[y:y + h, x:x + w]
+
+
+def binned_shape(width, height, bin_factor):
+    """(width, height) after binning, partial bins at the edges discarded"""
+    bin_factor = max(int(bin_factor), 1)
+    return width // bin_factor, height // bin_factor
+
+
+def binned_image(image, bin_factor):
+    """Average of bin_factor x bin_factor pixel blocks"""
+    from numpy import uint8, uint16, uint32
+    bin_factor = max(int(bin_factor), 1)
+    if bin_factor == 1:
+        return image
+    w, h = binned_shape(image.shape[1], image.shape[0], bin_factor)
+    image = image[0:h * bin_factor, 0:w * bin_factor]
+    dtype = uint16 if bin_factor <= 16 else uint32
+    # Adding strided slices is several times faster than 'sum' over the
+    # axes of a (h, bin_factor, w, bin_factor, 3) view.
+    rows = image[0::bin_factor].astype(dtype)
+    for i in range(1, bin_factor):
+        rows += image[i::bin_factor]
+    rows = rows.reshape((h, w, bin_factor) + image.shape[2:])
+    sums = rows[:, :, 0].copy()
+    for j in range(1, bin_factor):
+        sums += rows[:, :, j]
+    sums //= bin_factor ** 2
+    return sums.astype(uint8)
+
+
+def grayscale_image(image):
+    """Luminance, ITU-R 601 weights, in integer arithmetic
+    image: RGB, dimensions (height, width, 3)
+    Return value: dimensions (height, width)"""
+    from numpy import multiply, uint8, uint16
+    gray = multiply(image[..., 0], 77, dtype=uint16)
+    gray += multiply(image[..., 1], 150, dtype=uint16)
+    gray += multiply(image[..., 2], 29, dtype=uint16)
+    gray >>= 8
+    return gray.astype(uint8)
+
+
+def flat(image):
+    """1D int8 array, for an EPICS CA array PV"""
+    from numpy import ascontiguousarray, int8
+    return ascontiguousarray(image).view(int8).reshape(-1)
+
+
+def compressions():
+    """Available codecs"""
+    names = ["zlib"]
+    if lz4 is not None:
+        names += ["lz4"]
+    return names
+
+
+def compressed_image(image, compression="zlib"):
+    """Compressed image with header
+    compression: "zlib" or "lz4"
+    Return value: 1D int8 array"""
+    from struct import pack
+    from numpy import ascontiguousarray, frombuffer, int8
+    if compression not in compressions():
+        logging.warning(f"Compression {compression!r} not available, using 'zlib'")
+        compression = "zlib"
+    height, width = image.shape[0:2]
+    depth = image.shape[2] if image.ndim > 2 else 1
+    data = ascontiguousarray(image).data
+    if compression == "lz4":
+        data = lz4.frame.compress(data, compression_level=0)
+    else:
+        from zlib import compress
+        data = compress(data, 1)
+    header = pack(header_format, compression.encode("ascii").ljust(4), height, width, depth)
+    return frombuffer(header + data, int8)
+
+
+def decompressed_image(compressed_array_flat):
+    """Image from compressed image with header
+    compressed_array_flat: int8 array as returned by 'compressed_image'
+    Return value: uint8 array, dimensions (height, width, depth) or
+    (height, width), empty if the data cannot be decoded"""
+    from struct import unpack_from, calcsize
+    from numpy import frombuffer, uint8, zeros
+    header_size = calcsize(header_format)
+    data = compressed_array_flat.tobytes()
+    if len(data) < header_size:
+        return zeros((0, 0), uint8)
+    codec, height, width, depth = unpack_from(header_format, data)
+    compression = codec.decode("ascii", "replace").strip()
+    try:
+        if compression == "lz4":
+            if lz4 is None:
+                raise RuntimeError("Package 'lz4' not installed")
+            data = lz4.frame.decompress(data[header_size:])
+        elif compression == "zlib":
+            from zlib import decompress
+            data = decompress(data[header_size:])
+        else:
+            raise RuntimeError(f"Unknown compression {compression!r}")
+        shape = (height, width, depth) if depth > 1 else (height, width)
+        image = frombuffer(data, uint8).reshape(shape)
+    except Exception as x:
+        logging.warning(f"Cannot decode image: {x}")
+        image = zeros((0, 0), uint8)
+    return image
+
+
+if __name__ == "__main__":
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s, line %(lineno)d: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    from numpy import random, uint8
+    image = random.randint(0, 256, (1024, 1360, 3)).astype(uint8)
+    print("binned_image(image, 4).shape")
+    print("decompressed_image(compressed_image(grayscale_image(image))).shape")
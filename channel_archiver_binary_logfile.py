@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""Binary log file for the channel archiver
+Fixed-width records of two little-endian float64 numbers: timestamp, value.
+Values that cannot be represented as a floating point number are stored as
+NaN in the record file, with the original string in a side file
+("<name>.strings.txt", one line "<record index>\t<string>" per value).
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment: convert_logfile: keeping strings, timestamp_range as for text
+"""
+__version__ = "1.2.2"
+
+
+class Binary_LogFile(object):
+    name = "logfile"
+    columns = ["date time", "value"]
+
+    record_dtype = [("date time", "<f8"), ("value", "<f8")]
+    record_size = 16
+
+    def __init__(self, filename):
+        """filename: where to save, e.g. "/data/NIH.TEMP.RBV.bin" """
+        self.filename = filename
+        from threading import Lock
+        self.lock = Lock()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.filename!r})"
+
+    @property
+    def strings_filename(self):
+        from os.path import splitext
+        return splitext(self.filename)[0] + ".strings.txt"
+
+    def log(self, *args, **kwargs):
+        """Append to logfile
+        time: time in seconds since 1970-01-01 00:00:00 UTC
+        """
+        from time import time
+        from numpy import nan
+        from append_file_pool import append_file_pool
+
+        value = args[0] if len(args) > 0 else nan
+        if "time" in kwargs:
+            timestamp = kwargs["time"]
+        else:
+            timestamp = time()
+
+        try:
+            number = float(value)
+            string = None
+        except (ValueError, TypeError):
+            number = nan
+            string = str(value)
+
+        with self.lock:  # Allow only one thread at a time inside this function.
+            filename = self.normalized_filename
+            pool = append_file_pool()
+            if string is not None:
+                index = pool.size(filename) // self.record_size
+                line = "%d\t%s\n" % (index, string.replace("\n", " "))
+                pool.write(self.normalized_strings_filename, line.encode("UTF-8"))
+            pool.write(filename, self.record_bytes(timestamp, number))
+            self.summaries.add(timestamp, number)
+
+    @property
+    def normalized_filename(self):
+        """Pathname, translated for the local platform, determined only once"""
+        from normpath import normpath
+        if self.__normalized_filename__ is None:
+            self.__normalized_filename__ = normpath(self.filename)
+        return self.__normalized_filename__
+
+    __normalized_filename__ = None
+
+    @property
+    def normalized_strings_filename(self):
+        from os.path import splitext
+        return splitext(self.normalized_filename)[0] + ".strings.txt"
+
+    @property
+    def summaries(self):
+        """Downsampled minimum, maximum and mean values"""
+        from channel_archiver_summary import Summaries
+        if self.__summaries__ is None:
+            self.__summaries__ = Summaries(self.normalized_filename)
+        return self.__summaries__
+
+    __summaries__ = None
+
+    def flush(self):
+        """Make sure all logged data is written to disk"""
+        from append_file_pool import append_file_pool
+        append_file_pool().flush(self.normalized_filename)
+        append_file_pool().flush(self.normalized_strings_filename)
+
+    def record_bytes(self, timestamp, value):
+        from numpy import array
+        return array([(timestamp, value)], dtype=self.record_dtype).tobytes()
+
+    def history(self, *args, **kwargs):
+        """time_range: t_min,t_max: time in seconds since 1970-01-01 00:00:00 UTC
+        range: i_min,i_max: all values from i_min to i_max, including imax
+        (Negative integers count from the end, -1 = last.)
+        count: last N
+        max_points: if the time range has more samples, return averages over
+        time buckets from the summary files (see channel_archiver_summary)
+        *args: column names
+        Return value: list of NumPy arrays, one per column
+        """
+        self.flush()
+        if "max_points" in kwargs and "time_range" in kwargs:
+            level = self.summaries.level(kwargs["time_range"], kwargs["max_points"],
+                                         start_time=self.start_time)
+            if level is not None:
+                return level.history(*args, time_range=kwargs["time_range"])
+        records = self.records
+        if "count" in kwargs:
+            count = kwargs["count"]
+            start, end = max(len(records) - count, 0), len(records)
+        elif "range" in kwargs:
+            i_min, i_max = kwargs["range"]
+            start, end = slice(i_min, i_max + 1 if i_max != -1 else None).indices(len(records))[0:2]
+        elif "time_range" in kwargs:
+            start, end = self.timestamp_range(*kwargs["time_range"])
+        else:
+            start, end = 0, 0
+        column_names = args
+        values = [self.column(records, name, start, end) for name in column_names]
+        return values
+
+    def column(self, records, name, start, end):
+        from numpy import array, isnan, where
+        values = array(records[name][start:end])
+        if name != "date time" and len(values) > 0:
+            undefined = where(isnan(values))[0]
+            if len(undefined) > 0:
+                strings = self.strings
+                indices = [start + i for i in undefined if start + i in strings]
+                if len(indices) > 0:
+                    values = values.astype(object)
+                    for i in indices:
+                        values[i - start] = strings[i]
+        return values
+
+    @property
+    def records(self):
+        """Memory-mapped structured array of all complete records"""
+        return memory_mapped_records(self.normalized_filename, self.record_dtype, self.record_size)
+
+    @property
+    def strings(self):
+        """Non-numeric values, indexed by record number"""
+        strings = {}
+        try:
+            content = open(self.normalized_strings_filename, "rb").read()
+        except OSError:
+            content = b""
+        for line in content.split(b"\n"):
+            if b"\t" in line:
+                index, string = line.split(b"\t", 1)
+                try:
+                    strings[int(index)] = string.decode("UTF-8")
+                except ValueError:
+                    pass
+        return strings
+
+    def timestamp_range(self, t1, t2):
+        """Start and end record indices of a time range, excluding t1,
+        including t2, same as for text log files
+        t1: seconds since 1970-01-01T00:00:00+00
+        t2: seconds since 1970-01-01T00:00:00+00
+        """
+        from numpy import searchsorted
+        timestamps = self.records["date time"]
+        start = int(searchsorted(timestamps, t1, side="right"))
+        end = int(searchsorted(timestamps, t2, side="right"))
+        return start, end
+
+    @property
+    def start_time(self):
+        from time import time
+        records = self.records
+        t = float(records["date time"][0]) if len(records) > 0 else time()
+        return t
+
+    def __len__(self):
+        return len(self.records)
+
+
+binary_logfile = Binary_LogFile
+
+
+def memory_mapped_records(filename, record_dtype, record_size):
+    """Structured array of all complete fixed-width records in a file
+    filename: normalized pathname"""
+    from numpy import memmap, zeros
+    from os.path import getsize
+    try:
+        count = getsize(filename) // record_size
+    except OSError:
+        count = 0
+    if count > 0:
+        records = memmap(filename, dtype=record_dtype, mode="r", shape=(count,))
+    else:
+        records = zeros(0, dtype=record_dtype)
+    return records
+
+
+def convert_logfile(text_filename, binary_filename=None):
+    """Create a binary log file from an existing text log file
+    text_filename: e.g. "/data/NIH.TEMP.RBV.txt"
+    binary_filename: default: same name with extension ".bin"
+    Return value: name of the binary file
+    """
+    from os.path import splitext, exists
+    from os import remove
+    from numpy import array, nan
+    from normpath import normpath
+    from channel_archiver_logfile import logfile
+    from timestamps_fast import timestamps_fast
+
+    if binary_filename is None:
+        binary_filename = splitext(text_filename)[0] + ".bin"
+    log = Binary_LogFile(binary_filename)
+    for filename in binary_filename, log.strings_filename:
+        if exists(normpath(filename)):
+            remove(normpath(filename))
+
+    # Using the raw value column, because 'history' converts strings that
+    # are not numbers to NaN.
+    text_log = logfile(text_filename)
+    lines = text_log.lines(0, len(text_log.content))
+    lines = [line for line in lines if len(line) == len(text_log.columns)]
+    i_timestamp = text_log.columns.index("date time")
+    i_value = text_log.columns.index("value")
+    timestamps = timestamps_fast([line[i_timestamp] for line in lines])
+    numbers = []
+    strings = []
+    for i, line in enumerate(lines):
+        value = line[i_value]
+        try:
+            numbers.append(float(value))
+        except ValueError:
+            numbers.append(nan)
+            string = value.decode("UTF-8", "replace").replace("\n", " ")
+            strings.append("%d\t%s\n" % (i, string))
+    records = array(list(zip(timestamps, numbers)), dtype=log.record_dtype)
+    open(normpath(binary_filename), "wb").write(records.tobytes())
+    if strings:
+        open(normpath(log.strings_filename), "wb").write("".join(strings).encode("UTF-8"))
+    return binary_filename
+
+
+if __name__ == "__main__":
+    import logging
+
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    from channel_archiver_driver import channel_archiver_driver
+
+    self = binary_logfile(channel_archiver_driver("BioCARS").filename("NIH:TEMP.RBV", log_format="binary"))
+    print('convert_logfile(channel_archiver_driver("BioCARS").filename("NIH:TEMP.RBV"))')
+    print('from time import time; t=time(); x=self.history("date time","value",time_range=(time()-10*60,time())); time()-t')
+    print('len(self)')
@@ -3,10 +3,10 @@
 Archive EPICS process variables via Channel Access
 Author: Friedrich Schotte
 Date created: 2017-10-04
-Date last modified: 2022-07-11
-Revision comment: __repr__: lower case
+Date last modified: 2026-10-17
+Revision comment: logfile: one object per file, thread-safe
 """
-__version__ = "1.3.10"
+__version__ = "1.5.2"
 
 from logging import info
 from cached_function import cached_function
@@ -22,8 +22,11 @@ channel_archiver = channel_archiver_driver  # for backward compatibility
 
 class Channel_Archiver_Driver(object):
     def __init__(self, domain_name=None):
+        from threading import Lock
         if domain_name is not None:
             self.domain_name = domain_name
+        self.logfiles = {}  # reused, such that files can be kept open
+        self.logfiles_lock = Lock()
 
     def __repr__(self):
         return f"{self.class_name}({self.domain_name!r})"
@@ -37,6 +40,8 @@ class Channel_Archiver_Driver(object):
 
     def stop(self):
         self.archiving_enabled = False
+        for logfile in list(self.logfiles.values()):
+            logfile.summaries.flush()
 
     domain_name = "BioCARS"
 
@@ -51,6 +56,7 @@ class Channel_Archiver_Driver(object):
     PVs = db_property("PVs", [])
     __archiving_requested__ = db_property("archiving_requested", True)
     __directory__ = db_property("directory", ".")
+    log_format = db_property("log_format", "text")  # "text" or "binary"
     monitored_PVs = []
     __archiving__ = monitored_value_property(default_value=False)
     __archiving_enabled__ = monitored_value_property(default_value=False)
@@ -167,23 +173,66 @@ class Channel_Archiver_Driver(object):
 
     def logfile(self, PV_name):
         """logfile object"""
-        from channel_archiver_logfile import logfile
-        return logfile(self.filename(PV_name))
-
-    def filename(self, PV_name):
-        filename = "%s/%s.txt" % (self.directory, PV_name.replace(":", "."))
+        filename = self.filename(PV_name)
+        if filename not in self.logfiles:
+            # Monitor callbacks run in multiple threads. There must be only
+            # one logfile object per file.
+            with self.logfiles_lock:
+                if filename not in self.logfiles:
+                    if self.log_format == "binary":
+                        from channel_archiver_binary_logfile import binary_logfile as logfile
+                    else:
+                        from channel_archiver_logfile import logfile
+                    self.logfiles[filename] = logfile(filename)
+        return self.logfiles[filename]
+
+    def filename(self, PV_name, log_format=None):
+        """log_format: "text" or "binary", default: self.log_format"""
+        if log_format is None:
+            log_format = self.log_format
+        extension = "bin" if log_format == "binary" else "txt"
+        filename = "%s/%s.%s" % (self.directory, PV_name.replace(":", "."), extension)
         return filename
 
-    def history(self, PV_name, start_time, end_time):
+    def convert_logfiles(self, PV_names=None):
+        """Create binary log files from the existing text log files
+        PV_names: default: all archived PVs"""
+        from os.path import exists
+        from channel_archiver_binary_logfile import convert_logfile
+        if PV_names is None:
+            PV_names = self.PVs
+        for PV_name in PV_names:
+            text_filename = self.filename(PV_name, log_format="text")
+            if exists(text_filename):
+                info(f"Converting {text_filename}")
+                convert_logfile(text_filename, self.filename(PV_name, log_format="binary"))
+
+    def history(self, PV_name, start_time, end_time, max_points=None):
         """Retrieve values from the archive
         PV_name: string, e.g. "NIH:TEMP.RBV"
         start_time: seconds since 1970-01-01 00:00:00 UT
         end_time: seconds since 1970-01-01 00:00:00 UT
+        max_points: if given, return averages over time buckets for long
+        time ranges, with at least max_points buckets
         """
+        kwargs = {"max_points": max_points} if max_points is not None else {}
         values = self.logfile(PV_name).history("date time", "value",
-                                               time_range=(start_time, end_time))
+                                               time_range=(start_time, end_time),
+                                               **kwargs)
         return values
 
+    def build_summaries(self, PV_names=None):
+        """Create the downsampled summaries from the existing log files
+        PV_names: default: all archived PVs"""
+        from numpy import inf
+        if PV_names is None:
+            PV_names = self.PVs
+        for PV_name in PV_names:
+            info(f"Summarizing {PV_name}")
+            logfile = self.logfile(PV_name)
+            t, v = logfile.history("date time", "value", time_range=(-inf, inf))
+            logfile.summaries.rebuild(t, v)
+
 
 if __name__ == "__main__":  # for testing
     import logging
@@ -204,6 +253,7 @@ if __name__ == "__main__":  # for testing
     print('self.archiving_requested = True')
     print('self.archiving_requested = False')
     print('self.history("NIH:TEMP.RBV",time()-1,time())')
+    print('self.convert_logfiles(); self.log_format = "binary"')
 
 
     def report(obj, name): info("%r.%s = %r" % (obj, name, getattr(obj, name)))
@@ -2,14 +2,11 @@
 """Log file
 Author: Friedrich Schotte,
 Date created: 2019-03-02
-Date last modified: 2022-03-23
+Date last modified: 2026-10-17
 Python Version: 2.7 and 3.7
-Revision comment: Simplified
+Revision comment: index: thread-safe, rebuilt if the file is replaced
 """
-__version__ = "2.0"
-
-from logging import warning
-from traceback import format_exc
+__version__ = "2.4.3"
 
 
 class LogFile(object):
@@ -29,9 +26,7 @@ class LogFile(object):
         """
         from time import time
         from date_time import date_time
-        from normpath import normpath
-        from os.path import exists, dirname
-        from os import makedirs
+        from append_file_pool import append_file_pool
 
         values = args
         if "time" in kwargs:
@@ -40,32 +35,106 @@ class LogFile(object):
             timestamp = time()
 
         with self.lock:  # Allow only one thread at a time inside this function.
-            filename = normpath(self.filename)
-            if not exists(filename):
+            filename = self.normalized_filename
+            pool = append_file_pool()
+            if pool.size(filename) == 0:
                 header = "#" + "\t".join(self.columns) + "\n"
             else:
                 header = ""
             fields = [date_time(timestamp)] + [str(v) for v in values]
             line = "\t".join(fields) + "\n"
-            directory = dirname(filename)
-            if not exists(directory):
-                try:
-                    makedirs(directory)
-                except OSError as x:
-                    if not exists(directory):
-                        warning(f"{directory}: {x}")
-            if exists(directory):
-                try:
-                    open(filename, "ab").write((header + line).encode("UTF-8"))
-                except OSError as x:
-                    warning(f"{filename}: {x}")
+            offset = pool.size(filename) + len(header)
+            pool.write(filename, (header + line).encode("UTF-8"))
+            if offset >= self.next_index_offset:
+                pool.write(self.index_filename, index_record(timestamp, offset))
+                self.next_index_offset = offset + self.index_interval
+            if len(values) > 0:
+                self.summaries.add(timestamp, values[0])
+
+    index_interval = 65536  # bytes of log file per index entry
+
+    @property
+    def index_filename(self):
+        """Sidecar file with binary (timestamp, byte offset) records"""
+        from os.path import splitext
+        return splitext(self.normalized_filename)[0] + ".index"
+
+    def get_next_index_offset(self):
+        """Byte offset of the log file from which on the next line needs an index entry"""
+        if self.__next_index_offset__ is None:
+            entries = self.index_entries(count=1)
+            if len(entries) > 0:
+                self.__next_index_offset__ = entries[-1][1] + self.index_interval
+            else:
+                self.__next_index_offset__ = 0
+        return self.__next_index_offset__
+
+    def set_next_index_offset(self, offset):
+        self.__next_index_offset__ = offset
+
+    next_index_offset = property(get_next_index_offset, set_next_index_offset)
+    __next_index_offset__ = None
+
+    def index_entries(self, count=None):
+        """Content of the sidecar index file
+        count: last N entries, default: all
+        Return value: list of (timestamp, offset) tuples"""
+        from struct import iter_unpack
+        from append_file_pool import append_file_pool
+        append_file_pool().flush(self.index_filename)
+        try:
+            with open(self.index_filename, "rb") as f:
+                if count is not None:
+                    from os import SEEK_END
+                    size = f.seek(0, SEEK_END)
+                    size -= size % index_record_size
+                    f.seek(max(size - count * index_record_size, 0))
+                data = f.read()
+        except OSError:
+            data = b""
+        data = data[0:len(data) - len(data) % index_record_size]
+        return list(iter_unpack(index_record_format, data))
+
+    @property
+    def normalized_filename(self):
+        """Pathname, translated for the local platform, determined only once"""
+        from normpath import normpath
+        if self.__normalized_filename__ is None:
+            self.__normalized_filename__ = normpath(self.filename)
+        return self.__normalized_filename__
+
+    __normalized_filename__ = None
+
+    @property
+    def summaries(self):
+        """Downsampled minimum, maximum and mean values"""
+        from channel_archiver_summary import Summaries
+        if self.__summaries__ is None:
+            self.__summaries__ = Summaries(self.normalized_filename)
+        return self.__summaries__
+
+    __summaries__ = None
+
+    def flush(self):
+        """Make sure all logged data is written to disk"""
+        from append_file_pool import append_file_pool
+        append_file_pool().flush(self.normalized_filename)
+        append_file_pool().flush(self.index_filename)
 
     def history(self, *args, **kwargs):
         """time_range: t_min,t_max: time in seconds since 1970-01-01 00:00:00 UTC
         range: i_min,i_max: all values from i_min to i_max, including imax
         (Negative integers count from the end, -1 = last.)
         count: last N
+        max_points: if the time range has more samples, return averages over
+        time buckets from the summary files (see channel_archiver_summary)
         *args: column names"""
+        self.flush()
+        if "max_points" in kwargs and "time_range" in kwargs:
+            level = self.summaries.level(kwargs["time_range"], kwargs["max_points"],
+                                         start_time=self.start_time)
+            if level is not None:
+                return level.history(*args, time_range=kwargs["time_range"])
         if "count" in kwargs:
             count = kwargs["count"]
             lines = self.lines(*self.last_lines_range(count))
@@ -76,19 +145,9 @@ class LogFile(object):
             lines = []
         column_names = args
         column_indices = [self.columns.index(name) for name in column_names]
-        values = []
-        for i in range(0, len(lines)):
-            if len(lines[i]) == len(column_names):
-                # noinspection PyBroadException
-                try:
-                    row_values = [convert(lines[i][j], name) for (j, name)
-                                  in zip(column_indices, column_names)]
-                    values += [row_values]
-                except Exception:
-                    warning("logfile: line %d/%d %r: %s" % (i + 1, len(lines), lines[i], format_exc()))
-        values = list(zip(*values))  # organize data in rows
-        if not values:
-            values = [[]] * len(column_names)
+        lines = [line for line in lines if len(line) == len(column_names)]
+        values = [convert_column([line[j] for line in lines], name)
+                  for (j, name) in zip(column_indices, column_names)]
         return values
 
     def lines(self, start, end):
@@ -138,24 +197,108 @@ class LogFile(object):
         Return value: byte offset from the beginning of the file.
         Length of file if all timestamp in the file are earlier
         timestamp: seconds since 1970-01-01T00:00:00+00"""
-        from numpy import isnan, clip
+        from bisect import bisect_right
         text = self.content
-        offset = len(text) // 2
-        step = len(text) // 4
-        while step > 0:
-            # debug("offset %r, step %r" % (offset,step))
-            t = self.next_timestamp(text, offset)
-            if isnan(t):
-                offset = len(text)
+        timestamps, offsets = self.index_of(text)
+        k = bisect_right(timestamps, timestamp)
+        if k == 0:
+            return 0
+        # Bisect the lines between two index entries.
+        low = offsets[k - 1]  # line with time stamp <= timestamp
+        high = offsets[k] if k < len(offsets) else len(text)
+        while True:
+            middle = (low + high) // 2
+            i = text.find(b"\n", middle, high)
+            if i < 0 or i + 1 >= high:
+                i = text.rfind(b"\n", low, middle)
+            if i < 0:
                 break
+            i += 1
+            t = self.line_timestamp(text, i)
             if t <= timestamp:
-                offset += step
+                low = i
+            else:
+                high = i
+        return high
+
+    @property
+    def index(self):
+        """Sparse index of the file
+        Return value: (timestamps, offsets), lists of the time stamps and
+        starting byte offsets of lines, about every 'index_interval' bytes"""
+        return self.index_of(self.content)
+
+    def index_of(self, text):
+        """Sparse index of the file, for the given content of the file
+        text: as returned by 'content'
+        Return value: (timestamps, offsets), copies, limited to 'text'"""
+        from bisect import bisect_left
+        filename = self.normalized_filename
+        with self.cache_lock:
+            # Rebuild the index only if the file was truncated or replaced
+            # ('content' discards the index of a replaced file).
+            if filename not in self.index_cache or len(text) < self.index_cache[filename][3]:
+                timestamps, offsets, next_offset = [], [], 0
+                entries = [(t, offset) for (t, offset) in self.index_entries() if offset < len(text)]
+                if not all(self.is_index_entry(text, t, offset) for (t, offset) in entries[0:1] + entries[-1:]):
+                    entries = []  # Index file of a replaced log file
+                if len(entries) > 0:
+                    self.extend_index(text, timestamps, offsets, next_offset, entries[0][1])
+                    timestamps += [t for (t, offset) in entries]
+                    offsets += [offset for (t, offset) in entries]
+                    next_offset = offsets[-1] + self.index_interval
+                self.index_cache[filename] = [timestamps, offsets, next_offset, 0]
+            timestamps, offsets, next_offset, indexed_length = self.index_cache[filename]
+            if len(text) > indexed_length:
+                next_offset = self.extend_index(text, timestamps, offsets, next_offset, len(text))
+                self.index_cache[filename][2:4] = [next_offset, len(text)]
+            # Another thread may have indexed a longer version of the file.
+            n = bisect_left(offsets, len(text))
+            return timestamps[0:n], offsets[0:n]
+
+    # filename: [timestamps, offsets, next offset to be indexed, bytes indexed]
+    index_cache = {}
+
+    def extend_index(self, text, timestamps, offsets, offset, end):
+        """Add index entries for the part of the file from offset to end
+        Return value: next offset to be indexed"""
+        from numpy import isnan
+        while offset < end:
+            if offset > 0 and text[offset - 1:offset] != b"\n":
+                i = text.find(b"\n", offset, end)
+                if i < 0:
+                    break
+                offset = i + 1
+            if offset >= end:
+                break
+            t = self.line_timestamp(text, offset)
+            if isnan(t):
+                offset += 1
             else:
-                offset -= step
-            offset = clip(offset, 0, len(text))
-            step = (step + 1) // 2 if step > 1 else 0
+                timestamps.append(t)
+                offsets.append(offset)
+                offset += self.index_interval
         return offset
 
+    def is_index_entry(self, text, t, offset):
+        """Does the line at the offset start with the timestamp?"""
+        at_line_start = offset == 0 or text[offset - 1:offset] == b"\n"
+        return at_line_start and self.line_timestamp(text, offset) == t
+
+    @staticmethod
+    def line_timestamp(text, offset):
+        """Time stamp of the line starting at the given byte offset"""
+        from numpy import nan
+        end = text.find(b"\n", offset)
+        if end < 0:
+            end = len(text)
+        j = text.find(b"\t", offset, end)
+        if j < 0:
+            t = nan
+        else:
+            t = timestamp(text[offset:j])
+        return t
+
     @staticmethod
     def next_timestamp(text, offset):
         from numpy import nan
@@ -172,16 +315,29 @@ class LogFile(object):
 
     @property
     def content(self):
-        from normpath import normpath
-        filename = normpath(self.filename)
+        """Memory map of the file, created once and renewed when the file size changes"""
+        from os import stat
         from mmap import mmap, ACCESS_READ
-        try:
-            f = open(filename)
-            content = mmap(f.fileno(), 0, access=ACCESS_READ)
-        except IOError:
-            content = b""
+        filename = self.normalized_filename
+        with self.cache_lock:
+            file, content, inode = self.mmap_cache.get(filename, (None, b"", None))
+            try:
+                status = stat(filename)
+                if status.st_ino != inode:
+                    file, content, inode = open(filename, "rb"), b"", status.st_ino
+                    # Offsets of the old file are not valid for the new one.
+                    self.index_cache.pop(filename, None)
+                if status.st_size != len(content):
+                    content = mmap(file.fileno(), 0, access=ACCESS_READ) if status.st_size > 0 else b""
+            except (OSError, ValueError):
+                file, content, inode = None, b"", None
+            self.mmap_cache[filename] = file, content, inode
         return content
 
+    mmap_cache = {}
+    from threading import RLock
+    cache_lock = RLock()  # for 'index_cache' and 'mmap_cache', shared by all threads
+
     @property
     def content_new(self):
         from os.path import exists, getsize
@@ -232,6 +388,23 @@ class LogFile(object):
 
 logfile = LogFile
 
+index_record_format = "<dq"  # timestamp, byte offset
+index_record_size = 16
+
+
+def index_record(timestamp, offset):
+    from struct import pack
+    return pack(index_record_format, timestamp, offset)
+
+
+def convert_column(strings, name):
+    """Convert strings to an array of Python objects, all at once if possible
+    name: if "date time", force conversion from string to seconds"""
+    from timestamps_fast import timestamps_fast, values_fast
+    if name == "date time":
+        return timestamps_fast(strings)
+    return values_fast(strings)
+
 
 def convert(x, name):
     """Try to convert string to a Python object.
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""Downsampled summaries of channel archiver log files
+For each archived PV, minimum, maximum, mean and count of the values in
+time buckets of fixed width (1 s, 1 min, 1 h), such that a long time range
+can be displayed without reading every sample.
+Each level is a file of fixed-width binary records, one per bucket
+("<name>.1s.summary", ...), appended when the first value of the following
+bucket is logged.
+The bucket in progress is also written when the summaries are flushed
+(before reading, and at exit), and rewritten in place as more values are
+added to it, also after a restart.
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment: Writing the bucket in progress, levels used only if complete
+"""
+__version__ = "1.1"
+
+from numpy import inf
+
+
+class Summaries(object):
+    """All summary levels of a log file"""
+    level_widths = {"1s": 1.0, "1min": 60.0, "1h": 3600.0}
+
+    def __init__(self, filename):
+        """filename: normalized pathname of the log file"""
+        from os.path import splitext
+        from threading import Lock
+        import atexit
+        basename = splitext(filename)[0]
+        self.levels = [
+            Summary_Level(f"{basename}.{name}.summary", width)
+            for (name, width) in sorted(self.level_widths.items(), key=lambda item: item[1])
+        ]
+        self.lock = Lock()
+        atexit.register(self.flush)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.levels!r})"
+
+    def add(self, timestamp, value):
+        try:
+            value = float(value)
+        except (ValueError, TypeError):
+            return
+        with self.lock:
+            for level in self.levels:
+                level.add(timestamp, value)
+
+    def flush(self):
+        """Write the buckets in progress"""
+        with self.lock:
+            for level in self.levels:
+                level.flush()
+
+    def level(self, time_range, max_points, start_time=-inf):
+        """Coarsest level with at least 'max_points' buckets in the time range
+        that covers the time range from its start, or, if later, from
+        'start_time'.
+        (Levels that were started after the log file only summarize the
+        recent part of it, until they are rebuilt.)
+        start_time: time of the first value in the log file
+        Return value: None if the raw data should be used"""
+        t1, t2 = time_range
+        levels = [level for level in self.levels if level.width * max_points <= t2 - t1]
+        if len(levels) == 0:
+            return None
+        self.flush()
+        levels = [level for level in levels if level.start_time <= max(t1, start_time)]
+        return levels[-1] if len(levels) > 0 else None
+
+    def rebuild(self, timestamps, values):
+        """Recreate all summary files from archived data
+        timestamps: seconds since 1970-01-01 00:00:00 UTC, sorted
+        values: floating point numbers"""
+        with self.lock:
+            for level in self.levels:
+                level.rebuild(timestamps, values)
+
+
+class Summary_Level(object):
+    """Summary for one bucket width"""
+    columns = ["date time", "min", "max", "mean", "count"]
+    record_dtype = [("date time", "<f8"), ("min", "<f8"), ("max", "<f8"),
+                    ("mean", "<f8"), ("count", "<i8")]
+    record_size = 40
+
+    def __init__(self, filename, width):
+        """filename: normalized pathname
+        width: bucket width in seconds"""
+        self.filename = filename
+        self.width = width
+        self.bucket = None
+        self.on_file = False  # Is there a record for the current bucket?
+        self.changed = False  # Values added since the record was written?
+        self.reset()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.filename!r}, {self.width!r})"
+
+    def reset(self):
+        from numpy import inf
+        self.min = inf
+        self.max = -inf
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, timestamp, value):
+        """Accumulate a value in the current bucket
+        timestamp: seconds since 1970-01-01 00:00:00 UTC"""
+        from math import floor, isnan
+        bucket = floor(timestamp / self.width)
+        if self.bucket is None:
+            self.continue_last_record()
+        if self.bucket is None or bucket > self.bucket:
+            if self.changed:
+                self.write()
+            self.bucket = bucket
+            self.on_file = False
+            self.reset()
+        elif bucket < self.bucket:
+            return  # Cannot go back in time.
+        if not isnan(value):
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+            self.sum += value
+            self.count += 1
+            self.changed = True
+
+    def continue_last_record(self):
+        """After a restart, merge values into the last bucket in the file,
+        rather than writing a second record for the same bucket"""
+        from math import floor
+        record = self.last_record
+        if record is not None and record["count"] > 0:
+            self.bucket = floor(record["date time"] / self.width + 0.5)
+            self.min, self.max = record["min"], record["max"]
+            self.sum = record["mean"] * record["count"]
+            self.count = int(record["count"])
+            self.on_file = True
+            self.changed = False
+
+    @property
+    def last_record(self):
+        """None if the file is empty"""
+        from os import SEEK_END
+        from numpy import frombuffer
+        from append_file_pool import append_file_pool
+        append_file_pool().flush(self.filename)
+        try:
+            with open(self.filename, "rb") as file:
+                size = file.seek(0, SEEK_END)
+                size -= size % self.record_size
+                if size == 0:
+                    return None
+                file.seek(size - self.record_size)
+                data = file.read(self.record_size)
+        except OSError:
+            return None
+        return frombuffer(data, dtype=self.record_dtype)[0]
+
+    def write(self):
+        """Append the current bucket to the file, or update its record"""
+        from os import SEEK_END
+        from numpy import array
+        from append_file_pool import append_file_pool
+        record = (self.bucket * self.width, self.min, self.max,
+                  self.sum / self.count, self.count)
+        data = array([record], dtype=self.record_dtype).tobytes()
+        pool = append_file_pool()
+        if self.on_file:
+            pool.flush(self.filename)
+            try:
+                with open(self.filename, "r+b") as file:
+                    size = file.seek(0, SEEK_END)
+                    file.seek(size - size % self.record_size - self.record_size)
+                    file.write(data)
+            except OSError as x:
+                from logging import warning
+                warning(f"{self.filename}: {x}")
+        else:
+            pool.write(self.filename, data)
+            self.on_file = True
+        self.changed = False
+
+    def flush(self):
+        """Write the bucket in progress, to make it visible to readers and
+        to keep it at exit"""
+        from append_file_pool import append_file_pool
+        if self.changed:
+            self.write()
+        append_file_pool().flush(self.filename)
+
+    @property
+    def start_time(self):
+        """Beginning of the first bucket, inf if empty"""
+        from numpy import inf
+        records = self.records
+        return float(records["date time"][0]) if len(records) > 0 else inf
+
+    def rebuild(self, timestamps, values):
+        """Recreate the summary file from archived data
+        timestamps: seconds since 1970-01-01 00:00:00 UTC, sorted
+        values: floating point numbers"""
+        from numpy import asarray, floor, isnan, flatnonzero, minimum, maximum, \
+            add, zeros, concatenate, diff, append
+        from append_file_pool import append_file_pool
+        timestamps = asarray(timestamps, dtype=float)
+        values = asarray(values, dtype=float)
+        valid = ~isnan(values) & ~isnan(timestamps)
+        timestamps, values = timestamps[valid], values[valid]
+        buckets = floor(timestamps / self.width)
+        starts = flatnonzero(concatenate([[True], buckets[1:] != buckets[:-1]])) \
+            if len(buckets) > 0 else zeros(0, dtype=int)
+        records = zeros(len(starts), dtype=self.record_dtype)
+        if len(starts) > 0:
+            records["date time"] = buckets[starts] * self.width
+            records["min"] = minimum.reduceat(values, starts)
+            records["max"] = maximum.reduceat(values, starts)
+            records["count"] = diff(append(starts, len(values)))
+            records["mean"] = add.reduceat(values, starts) / records["count"]
+        append_file_pool().close(self.filename)
+        with open(self.filename, "wb") as file:
+            file.write(records.tobytes())
+        self.bucket = None
+        self.on_file = False
+        self.changed = False
+        self.reset()
+
+    @property
+    def records(self):
+        from append_file_pool import append_file_pool
+        from channel_archiver_binary_logfile import memory_mapped_records
+        append_file_pool().flush(self.filename)
+        return memory_mapped_records(self.filename, self.record_dtype, self.record_size)
+
+    def history(self, *args, **kwargs):
+        """time_range: t_min,t_max: time in seconds since 1970-01-01 00:00:00 UTC
+        *args: column names: "date time" (center of bucket), "value" (mean),
+        "min", "max", "mean", "count"
+        Return value: list of NumPy arrays, one per column
+        """
+        from numpy import searchsorted, array
+        records = self.records
+        t1, t2 = kwargs["time_range"]
+        bucket_starts = records["date time"]
+        start = int(searchsorted(bucket_starts, t1 - self.width, side="right"))
+        end = int(searchsorted(bucket_starts, t2, side="right"))
+        values = []
+        for name in args:
+            if name == "date time":
+                values.append(array(bucket_starts[start:end]) + self.width / 2)
+            elif name == "value":
+                values.append(array(records["mean"][start:end]))
+            else:
+                values.append(array(records[name][start:end]))
+        return values
+
+    def __len__(self):
+        from append_file_pool import append_file_pool
+        return append_file_pool().size(self.filename) // self.record_size
+
+
+if __name__ == "__main__":
+    import logging
+
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    from channel_archiver_driver import channel_archiver_driver
+
+    driver = channel_archiver_driver("BioCARS")
+    self = driver.logfile("NIH:TEMP.RBV").summaries
+    print('driver.build_summaries(["NIH:TEMP.RBV"])')
+    print('from time import time; self.level((time()-30*86400, time()), 1000)')
+    print('from time import time; t=time(); x=driver.history("NIH:TEMP.RBV", time()-30*86400, time(), max_points=1000); time()-t')
@@ -6,11 +6,12 @@ files = [file for file in files if not file.startswith(".")]
 files.sort()
 files = [directory+"/"+file for file in files]
 files = files[0:80]
-from os.path import getmtime
 from numpy import array
-file_timestamps = array([getmtime(file) for file in files])
-from rayonix_image_timestamp import rayonix_image_timestamp
-header_timestamps = array([rayonix_image_timestamp(file) for file in files])
+from rayonix_image_catalog import rayonix_image_catalog
+catalog = rayonix_image_catalog(directory)
+catalog.update()
+file_timestamps = array([catalog.entries[file.split("/")[-1]][0] for file in files])
+header_timestamps = array(catalog.values(files, "acquire_timestamp"))
 from numpy import diff
 print("diff(file_timestamps)")
 print("diff(header_timestamps)")
@@ -0,0 +1,259 @@
+"""Storage of 'table' objects as HDF5 files with one chunked, extendable
+dataset per column, for long logs that grow by appending rows.
+Rows appended to a table can be added to the end of the datasets, without
+rewriting the file: table.save(filename, append=True)
+table(filename) reads such a file completely. Chunked_HDF5_Table(filename)
+reads only the columns and rows that are accessed.
+Requires PyTables ("tables" module).
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment: Appending only on request
+"""
+__version__ = "1.1"
+
+from logging import debug
+
+layout = "chunked"
+
+
+def is_chunked_HDF5(filename):
+    """Was the file written by 'save_chunked_HDF5'?"""
+    from os.path import splitext, exists
+    if not isinstance(filename, str):
+        return False
+    if splitext(filename)[1].lower() not in [".hdf5", ".hd5", ".h5"]:
+        return False
+    if not exists(filename):
+        return False
+    try:
+        import tables
+    except ImportError:
+        return False
+    try:
+        with tables.open_file(filename, mode="r") as h5file:
+            chunked = getattr(h5file.root._v_attrs, "layout", "") == layout
+    except (OSError, tables.HDF5ExtError) as x:
+        debug(f"{filename}: {x}")
+        chunked = False
+    return chunked
+
+
+def save_chunked_HDF5(data, filename, chunk_rows=None, append=False):
+    """Write a table, or append the rows added since the last time it was saved
+    data: one-dimensional 'table' object
+    chunk_rows: number of rows per chunk, default: chosen by PyTables
+    append: if the file contains the beginning of the table, write only the
+        rows after those stored. The file is rewritten if the columns differ,
+        if it contains more rows than the table or if its last row differs.
+        Changes to earlier rows are not saved.
+    """
+    import tables
+    from os.path import exists
+    if data.ndim != 1:
+        raise ValueError(f"{filename}: chunked HDF5 requires a one-dimensional table, got shape {data.shape}")
+    columns = [str(column) for column in data.columns]
+    if append and exists(filename) and is_chunked_HDF5(filename):
+        with tables.open_file(filename, mode="a") as h5file:
+            stored_columns = list(h5file.root._v_attrs.columns)
+            stored_rows = stored_row_count(h5file)
+            if stored_columns == columns and stored_rows <= len(data) and \
+                    same_row(h5file, data, stored_rows - 1):
+                for i, column in enumerate(columns):
+                    h5file.get_node("/", node_name(i)).append(
+                        storable(data[column][stored_rows:]))
+                return
+    with tables.open_file(filename, mode="w") as h5file:
+        h5file.root._v_attrs.layout = layout
+        h5file.root._v_attrs.columns = columns
+        for i, column in enumerate(columns):
+            values = storable(data[column])
+            dataset = h5file.create_earray(
+                h5file.root, node_name(i),
+                atom=tables.Atom.from_dtype(values.dtype),
+                shape=(0,),
+                title=column,
+                expectedrows=max(len(values), 65536),
+                chunkshape=(chunk_rows,) if chunk_rows else None,
+            )
+            dataset.append(values)
+
+
+def node_name(i):
+    """HDF5 dataset name for the i-th column
+    (Column labels like "phi[deg]" or "T/K" are not valid HDF5 names.)"""
+    return f"column{i}"
+
+
+def stored_row_count(h5file):
+    columns = h5file.root._v_attrs.columns
+    return h5file.get_node("/", node_name(0)).nrows if len(columns) > 0 else 0
+
+
+def same_row(h5file, data, row):
+    """Does the file contain the same values as the table in the given row?"""
+    from numpy import array_equal
+    if row < 0:
+        return True
+    for i, column in enumerate(data.columns):
+        stored_value = h5file.get_node("/", node_name(i))[row]
+        if not array_equal(stored_value, storable(data[column][row:row + 1])[0], equal_nan=True):
+            return False
+    return True
+
+
+def storable(values):
+    """Unicode strings are stored as UTF-8 encoded 8-bit strings"""
+    from numpy import asarray, char
+    values = asarray(values)
+    if values.dtype.kind == "U":
+        values = char.encode(values, "utf-8")
+    return values
+
+
+class Chunked_HDF5_Table(object):
+    """Read-on-demand view of a table saved by 'save_chunked_HDF5'
+    self["column"], self.column: 'Chunked_HDF5_Column'
+    self[i], self[i:j]: 'table' object with the selected rows
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.format = "HDF5"
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.filename!r})"
+
+    def h5file(self, mode="r"):
+        import tables
+        return tables.open_file(self.filename, mode=mode)
+
+    @property
+    def columns(self):
+        with self.h5file() as h5file:
+            columns = list(h5file.root._v_attrs.columns)
+        return columns
+
+    @property
+    def rows(self):
+        with self.h5file() as h5file:
+            rows = stored_row_count(h5file)
+        return rows
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def shape(self):
+        return (self.rows,)
+
+    def column_index(self, name):
+        """Allow data["phi"] for data["phi[deg]"]"""
+        from table import matches
+        columns = self.columns
+        if name in columns:
+            return columns.index(name)
+        for i, column_name in enumerate(columns):
+            if matches(name, column_name):
+                return i
+        raise KeyError(name)
+
+    def has_column(self, name):
+        try:
+            self.column_index(name)
+        except KeyError:
+            return False
+        return True
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return Chunked_HDF5_Column(self.filename, self.column_index(item))
+        return self.subtable(item)
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def subtable(self, rows):
+        """rows: index or slice
+        Return value: 'table' object"""
+        from table import table
+        from numpy import atleast_1d
+        if isinstance(rows, int):
+            rows = slice(rows, rows + 1 if rows != -1 else None)
+        columns = self.columns
+        with self.h5file() as h5file:
+            data = [atleast_1d(h5file.get_node("/", node_name(i))[rows])
+                    for i in range(0, len(columns))]
+        return table(data=data, columns=columns)
+
+    def load(self):
+        """The complete table in memory"""
+        return self.subtable(slice(None))
+
+    def append(self, data):
+        """Add rows at the end
+        data: 'table' object with the same columns"""
+        columns = self.columns
+        if [str(column) for column in data.columns] != columns:
+            raise ValueError(f"{self.filename}: columns {columns}, got {list(data.columns)}")
+        with self.h5file(mode="a") as h5file:
+            for i, column in enumerate(columns):
+                h5file.get_node("/", node_name(i)).append(storable(data[column]))
+
+
+class Chunked_HDF5_Column(object):
+    """Read-on-demand column of a 'Chunked_HDF5_Table'"""
+    def __init__(self, filename, index):
+        self.filename = filename
+        self.index = index
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.filename!r}, {self.index!r})"
+
+    def read(self, item=slice(None)):
+        import tables
+        with tables.open_file(self.filename, mode="r") as h5file:
+            values = h5file.get_node("/", node_name(self.index))[item]
+        return values
+
+    def __getitem__(self, item):
+        return self.read(item)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.read()
+        if dtype is not None:
+            values = values.astype(dtype)
+        return values
+
+    def __len__(self):
+        import tables
+        with tables.open_file(self.filename, mode="r") as h5file:
+            count = h5file.get_node("/", node_name(self.index)).nrows
+        return count
+
+    @property
+    def dtype(self):
+        import tables
+        with tables.open_file(self.filename, mode="r") as h5file:
+            dtype = h5file.get_node("/", node_name(self.index)).dtype
+        return dtype
+
+
+if __name__ == "__main__":
+    import logging
+
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    from table import table
+
+    filename = "/tmp/test.chunked.hdf5"
+    print('data = table(columns=["time","value"],rows=1000000)')
+    print('data.save(filename,format="chunked HDF5")')
+    print('data.save(filename,append=True)')
+    print('self = Chunked_HDF5_Table(filename)')
+    print('self["value"][-10:]')
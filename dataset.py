@@ -1,10 +1,10 @@
 """
 Author: Friedrich Schotte
 Date created: 2021-10-20
-Date last modified: 2021-10-21
-Revision comment:
+Date last modified: 2026-10-17
+Revision comment: Using rayonix_image_catalog
 """
-__version__ = "1.0"
+__version__ = "1.1"
 
 import numpy
 
@@ -57,14 +57,18 @@ class Dataset:
 
     @monitored_property
     def xray_images(self, xray_image_filenames):
-        from rayonix_image import rayonix_image
-        images = [rayonix_image(f) for f in xray_image_filenames]
+        """Header information from the image catalog, without opening the
+        image files"""
+        from rayonix_image_catalog import rayonix_image_headers
+        images = rayonix_image_headers(xray_image_filenames)
         return images
 
     @monitored_property
     def logfile_xray_images(self, logfile_xray_image_filenames):
-        from rayonix_image import rayonix_image
-        images = [rayonix_image(f) for f in logfile_xray_image_filenames]
+        """Header information from the image catalog, without opening the
+        image files"""
+        from rayonix_image_catalog import rayonix_image_headers
+        images = rayonix_image_headers(logfile_xray_image_filenames)
         return images
 
     @monitored_property
@@ -15,10 +15,10 @@ class Test(object):
 Author: Friedrich Schotte
 Python Version: 2.7 and 3.7
 Date created: 2020-05-25
-Date last modified: 2022-06-26
-Revision comment: Cleanup: docstring
+Date last modified: 2026-10-17
+Revision comment: str_to_value: Using cached dbeval
 """
-__version__ = "1.3.8"
+__version__ = "1.3.9"
 
 import logging
 from deprecated import deprecated
@@ -102,19 +102,12 @@ class db_property(property):
             self.private_str_value[instance] = str_value
 
     def str_to_value(self, instance, str_value):
+        from DB import dbeval
         default_value = self.get_default_value(instance)
         dtype = type(default_value)
-        try:
-            from numpy import nan, inf, array  # for "eval"
-        except ImportError:
-            pass
-        try:
-            import wx  # for "eval"
-        except ImportError:
-            pass
         # noinspection PyBroadException
         try:
-            value = dtype(eval(str_value))
+            value = dtype(dbeval(str_value))
         except Exception:
             value = default_value
         return value
@@ -54,13 +54,11 @@ Reads the number of measurement that where averaged.
 
 Author: Friedrich Schotte
 Date created: 2008-03-28
-Date last modified: 2022-08-03
-Revision comment: Issue:
-    line 363, in scope_trace_filename
-    filename = self.file_basenames[i]
-    IndexError: list index out of range
+Date last modified: 2026-10-17
+Revision comment: Trace_Copy_Scheduler: concurrent copies, retry with backoff,
+    directory listings instead of per-file exists
 """
-__version__ = "2.15.11"
+__version__ = "2.16.0"
 
 import traceback
 import logging
@@ -251,6 +249,7 @@ class Lecroy_Scope(object):
             if filename:
                 info("Acquiring %r: trig %r: %s" % (acq_count, trig_count, basename(filename)))
                 self.files_to_save[trig_count, channel_index] = filename
+        self.trace_copy_scheduler.new_files.set()
 
     # When the trace count reaches 99999, it goes to 100000, then wraps back
     # to 00000.
@@ -406,34 +405,57 @@ class Lecroy_Scope(object):
                 self.save_traces_task.start()
             else:
                 self.__save_traces_running__ = False
+                self.trace_copy_scheduler.new_files.set()
 
     save_traces_running = property(get_save_traces_running, set_save_traces_running)
 
     def save_traces_forever(self):
-        from time import sleep
+        """Copy trace files as they are registered, sleeping only until new
+        files are registered or the next retry is due"""
+        scheduler = self.trace_copy_scheduler
         while self.__save_traces_running__:
             try:
-                self.save_traces_once()
+                timeout = self.save_traces_once()
             except Exception as msg:
-                error("%s\n%s", msg, traceback.print_exc())
-            sleep(0.1)
+                error("%s\n%s", msg, traceback.format_exc())
+                timeout = 0.1
+            scheduler.wait(min(timeout, 1.0))
 
     def save_traces_once(self):
-        from os.path import exists
+        """Start copying the trace files that have been written
+        Return value: seconds until the next check for files not yet written"""
         from normpath import normpath
+        scheduler = self.trace_copy_scheduler
         for count, i in list(self.files_to_save.keys()):
-            source = self.trace_filename(i, count)
-            if exists(source):
-                destination = self.files_to_save[count, i]
-                if destination:
-                    destination = normpath(destination)
-                    # from os.path basename
-                    # info("Saving %r as %r", basename(source), basename(destination))
-                    info("Saving %r as %r", source, destination)
-                    copy(source, destination)
-                del self.files_to_save[count, i]
-            else:
-                info(f"File {source!r} not found")
+            destination = self.files_to_save.pop((count, i), "")
+            if destination:
+                source = self.trace_filename(i, count)
+                scheduler.add((count, i), source, normpath(destination))
+        return scheduler.schedule()
+
+    @cached_property
+    @property
+    def trace_copy_scheduler(self):
+        return Trace_Copy_Scheduler()
+
+    @property
+    def trace_copy_queue_depth(self):
+        """Number of trace files waiting to be copied or being copied"""
+        return self.trace_copy_scheduler.queue_depth
+
+    @property
+    def trace_copy_rate(self):
+        """Trace files copied per second, recently"""
+        return self.trace_copy_scheduler.copy_rate
+
+    @property
+    def trace_copy_throughput(self):
+        """Bytes per second, recently"""
+        return self.trace_copy_scheduler.throughput
+
+    @property
+    def traces_copied(self):
+        return self.trace_copy_scheduler.copy_count
 
     timing_system_acquiring = alias_property("timing_system.registers.acquiring.count")
 
@@ -1252,6 +1274,149 @@ class Lecroy_Scope_IOC(object):
                 casput(PV_name, getattr(self.instrument, name))
 
 
+class Trace_Copy_Scheduler(object):
+    """Copies trace files from the oscilloscope's file system as soon as
+    they are written, with a limited number of copies in progress at a time
+    Whether files have been written is checked with one directory listing
+    per directory, for all pending files. Files not found are checked again
+    after a delay that doubles with every attempt."""
+    max_copy_threads = 4
+    first_retry_delay = 0.02  # seconds
+    max_retry_delay = 0.25  # seconds
+    max_wait_time = 120.0  # seconds, after which a file is given up
+    throughput_period = 10.0  # seconds, for 'copy_rate' and 'throughput'
+
+    def __init__(self):
+        from threading import Lock, Event
+        from collections import deque
+        self.lock = Lock()
+        self.new_files = Event()
+        self.pending = {}  # key: Pending_Copy
+        self.in_progress = set()
+        self.completed = deque()  # (time, bytes)
+        self.copy_count = 0
+        self.failure_count = 0
+        self.__pool__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}(queue_depth={self.queue_depth})"
+
+    class Pending_Copy(object):
+        def __init__(self, source, destination, time):
+            self.source = source
+            self.destination = destination
+            self.time_added = time
+            self.next_try = time
+            self.attempts = 0
+
+    def add(self, key, source, destination):
+        """key: e.g. (trigger count, channel index)"""
+        from time import time
+        with self.lock:
+            if key not in self.pending and key not in self.in_progress:
+                self.pending[key] = self.Pending_Copy(source, destination, time())
+        self.new_files.set()
+
+    def wait(self, timeout):
+        """Until files are added or the timeout expires"""
+        self.new_files.wait(timeout)
+        self.new_files.clear()
+
+    def schedule(self):
+        """Start copying the pending files that have been written
+        Return value: seconds until the next retry is due"""
+        from time import time
+        from ntpath import split
+        now = time()
+        with self.lock:
+            due = [(key, item) for (key, item) in self.pending.items() if item.next_try <= now]
+        if due:
+            listings = directory_listings({split(item.source)[0] for (key, item) in due})
+            for key, item in due:
+                directory, name = split(item.source)
+                if name in listings[directory]:
+                    with self.lock:
+                        del self.pending[key]
+                        self.in_progress.add(key)
+                    info("Saving %r as %r", item.source, item.destination)
+                    self.pool.submit(self.copy, key, item)
+                elif now - item.time_added > self.max_wait_time:
+                    warning(f"File {item.source!r} not found after {self.max_wait_time:g} s")
+                    with self.lock:
+                        del self.pending[key]
+                        self.failure_count += 1
+                else:
+                    item.attempts += 1
+                    delay = min(self.first_retry_delay * 2 ** item.attempts, self.max_retry_delay)
+                    item.next_try = now + delay
+        with self.lock:
+            next_try = min([item.next_try for item in self.pending.values()], default=inf)
+        return max(next_try - time(), 0)
+
+    def copy(self, key, item):
+        from os.path import getsize
+        from time import time
+        try:
+            copy(item.source, item.destination)
+            size = getsize(item.destination)
+        except Exception as msg:
+            error("Error copying %r to %r: %s" % (item.source, item.destination, msg))
+            size = None
+        with self.lock:
+            self.in_progress.discard(key)
+            if size is not None:
+                self.copy_count += 1
+                self.completed.append((time(), size))
+            else:
+                self.failure_count += 1
+            while self.completed and self.completed[0][0] < time() - self.throughput_period:
+                self.completed.popleft()
+
+    @property
+    def pool(self):
+        from concurrent.futures import ThreadPoolExecutor
+        if self.__pool__ is None:
+            self.__pool__ = ThreadPoolExecutor(max_workers=self.max_copy_threads,
+                                               thread_name_prefix="copy_trace")
+        return self.__pool__
+
+    @property
+    def queue_depth(self):
+        """Number of files waiting to be copied or being copied"""
+        with self.lock:
+            return len(self.pending) + len(self.in_progress)
+
+    @property
+    def copy_rate(self):
+        """Files per second"""
+        return len(self.recently_completed) / self.throughput_period
+
+    @property
+    def throughput(self):
+        """Bytes per second"""
+        return sum(size for (t, size) in self.recently_completed) / self.throughput_period
+
+    @property
+    def recently_completed(self):
+        from time import time
+        with self.lock:
+            return [(t, size) for (t, size) in self.completed if t >= time() - self.throughput_period]
+
+
+def directory_listings(directories):
+    """Names of the files in each directory
+    Return value: dictionary of sets"""
+    from os import listdir
+    listings = {}
+    for directory in directories:
+        try:
+            listings[directory] = set(listdir(directory))
+        except OSError as msg:
+            debug("%r: %s" % (directory, msg))
+            listings[directory] = set()
+    return listings
+
+
 def number_of_files(directory):
     n_files = len(listdir(directory))
     info("Number of files in %r: %r" % (directory, n_files))
@@ -1,10 +1,14 @@
 """
+LeCroy oscilloscope binary waveform file (".trc")
+The file is memory-mapped once, read-only, and the WAVEDESC block is decoded
+with a single 'unpack' on first access.
+
 Author: Friedrich Schotte
 Date created: 2022-05-12
-Date last modified: 2022-05-12
-Revision comment:
+Date last modified: 2026-10-17
+Revision comment: Mapping the file once, decoding WAVEDESC once, float32 waveform
 """
-__version__ = "1.0"
+__version__ = "1.1"
 
 import logging
 
@@ -15,70 +19,90 @@ class field(property):
         self.format_string = format_string
         self.start = start
         self.end = end
+        self.name = ""
+
+    def __set_name__(self, owner, name):
+        self.name = name
 
     def get_property(self, instance):
-        from struct import unpack
-        return unpack(self.format_string, instance.wavedesc[self.start:self.end])[0]
+        return getattr(instance.descriptor, self.name)
 
 
 class lecroy_scope_trace_file:
     filename = ""
+    wavedesc_size = 346
 
     def __init__(self, filename=None):
         if filename is not None:
             self.filename = filename
+        self.__content__ = None
+        self.__content_filename__ = None
+        self.__descriptor__ = None
 
     def __repr__(self):
         return f"{type(self).__name__}({self.filename!r})"
 
+    def __enter__(self): return self  # for "with" block
+
+    def __exit__(self, exc_type, exc_value, exc_traceback): self.close()
+
     @property
     def waveform(self):
-        """tuple of two arrays, time, voltage"""
-        from numpy import arange, array
-        from numpy import frombuffer, int8, int16, float64, concatenate, zeros, nan
+        """tuple of two float32 arrays, time, voltage,
+        dimensions: (subarray_count, samples per subarray)"""
+        from numpy import arange, float32, multiply, full, nan
 
         # Check if format is indeed little-endian.
         assert(self.comm_order != 0)
 
-        dtype = int8 if self.comm_type == 0 else int16
-        data = frombuffer(self.content[self.data_offset:], dtype).astype(float)
-        Nsamples = self.wave_array_count // self.subarray_count
-        expected_size = self.subarray_count * Nsamples
-        if len(data) < expected_size:
-            logging.warning("%s: expecting %d*%d=%d samples, file truncated at %d samples." %
-                            (filename, self.subarray_count, Nsamples, expected_size, len(data)))
-            data = concatenate((data, nan * zeros(expected_size - len(data))))
-        data = data.reshape((self.subarray_count, Nsamples))
+        data = self.counts
+        Nsamples = self.samples_per_subarray
         # Convert counts to voltage.
-        U = data * self.vertical_gain - self.vertical_offset
+        U = full((self.subarray_count, Nsamples), nan, dtype=float32)
+        U_data = U.reshape(-1)[0:data.size].reshape(data.shape)
+        multiply(data, float32(self.vertical_gain), out=U_data)
+        U_data -= float32(self.vertical_offset)
 
         # Reconstruct time scales.
-        trigger_time_array_offset = self.trigger_times_and_offsets_offset
-        trigger_time_array = self.content[trigger_time_array_offset:trigger_time_array_offset + self.trig_time_array_size]
+        t = arange(0, Nsamples, dtype=float32) * float32(self.horiz_interval) + \
+            self.trigger_offsets[:, None].astype(float32)
 
-        data = frombuffer(trigger_time_array, float64)
-        data = data.reshape((self.subarray_count, 2))
-        relative_trigger_times, trigger_offsets = data.T
+        return t, U
 
-        t = array([arange(0, Nsamples) * self.horiz_interval + t0 for t0 in trigger_offsets])
-        # t = array([arange(0,Nsamples)*horiz_interval for t0 in trigger_offsets])+trigger_offsets[0]
+    @property
+    def counts(self):
+        """Unscaled samples, as read-only view of the file content
+        int8 or int16 array, dimensions: (subarray_count, samples per subarray),
+        flat if the file is truncated"""
+        from numpy import frombuffer, int8, int16
 
-        return t, U
+        dtype = int8 if self.comm_type == 0 else int16
+        Nsamples = self.samples_per_subarray
+        expected_size = self.subarray_count * Nsamples
+        available = max(len(self.content) - self.data_offset, 0) // dtype().itemsize
+        count = min(expected_size, available)
+        data = frombuffer(self.content, dtype, count=count, offset=min(self.data_offset, len(self.content)))
+        if count < expected_size:
+            logging.warning("%s: expecting %d*%d=%d samples, file truncated at %d samples." %
+                            (self.filename, self.subarray_count, Nsamples, expected_size, count))
+        else:
+            data = data.reshape((self.subarray_count, Nsamples))
+        return data
+
+    @property
+    def samples_per_subarray(self):
+        return self.wave_array_count // self.subarray_count if self.subarray_count else 0
 
     @property
     def trigger_time(self):
-        from struct import unpack
         from time import mktime
         from numpy import floor
 
-        second, = unpack("<d", self.wavedesc[296 + 0:296 + 8])
-        minute, = unpack("B", self.wavedesc[296 + 8:296 + 9])
-        hour, = unpack("B", self.wavedesc[296 + 9:296 + 10])
-        day, = unpack("B", self.wavedesc[296 + 10:296 + 11])
-        month, = unpack("B", self.wavedesc[296 + 11:296 + 12])
-        year, = unpack("H", self.wavedesc[296 + 12:296 + 14])
-        trigger_time = mktime((year, month, day, hour, minute, int(floor(second)), -1, -1, -1)) \
-            + (second - floor(second))
+        second = self.trigger_second
+        trigger_time = mktime((
+            self.trigger_year, self.trigger_month, self.trigger_day,
+            self.trigger_hour, self.trigger_minute, int(floor(second)), -1, -1, -1,
+        )) + (second - floor(second))
         return trigger_time
 
     @property
@@ -96,7 +120,8 @@ class lecroy_scope_trace_file:
     @property
     def trigger_times_and_offsets_array(self):
         from numpy import frombuffer, float64
-        return frombuffer(self.trigger_times_and_offsets_data, float64).reshape((self.subarray_count, 2))
+        return frombuffer(self.content, float64, count=2 * self.subarray_count,
+                          offset=self.trigger_times_and_offsets_offset).reshape((self.subarray_count, 2))
 
     @property
     def trigger_times_and_offsets_data(self):
@@ -108,11 +133,11 @@ class lecroy_scope_trace_file:
 
     @property
     def wavedesc(self):
-        return self.content[self.wavedesc_offset:self.wavedesc_offset + 346]
+        return self.content[self.wavedesc_offset:self.wavedesc_offset + self.wavedesc_size]
 
     @property
     def wavedesc_offset(self):
-        return self.content.find(b"WAVEDESC")
+        return self.descriptor.wavedesc_offset
 
     @property
     def data_offset(self):
@@ -135,18 +160,79 @@ class lecroy_scope_trace_file:
     horiz_interval = field("<f", 176, 180)
     horiz_offset = field("<d", 180, 188)
 
+    trigger_second = field("<d", 296, 304)
+    trigger_minute = field("B", 304, 305)
+    trigger_hour = field("B", 305, 306)
+    trigger_day = field("B", 306, 307)
+    trigger_month = field("B", 307, 308)
+    trigger_year = field("<H", 308, 310)
+
+    @property
+    def descriptor(self):
+        """All fields of the WAVEDESC block, decoded at once
+        Return value: named tuple"""
+        if self.__descriptor__ is None or self.__content_filename__ != self.filename:
+            content = self.content
+            offset = content.find(b"WAVEDESC")
+            descriptor_format, descriptor_type = wavedesc_format(type(self))
+            wavedesc = content[offset:offset + self.wavedesc_size] if offset >= 0 else b""
+            wavedesc = bytes(wavedesc).ljust(descriptor_format.size, b"\0")
+            values = descriptor_format.unpack_from(wavedesc)
+            self.__descriptor__ = descriptor_type(offset, *values)
+        return self.__descriptor__
+
     @property
     def content(self):
-        if self.filename:
-            from os.path import getsize
-            length = getsize(self.filename)
-            with open(self.filename, "rb+") as f:
-                from mmap import mmap
-                content = mmap(f.fileno(), length=length)
-                f.close()
-        else:
+        """Read-only memory map of the file, created once"""
+        if self.__content__ is None or self.__content_filename__ != self.filename:
             content = bytearray()
-        return content
+            if self.filename:
+                from mmap import mmap, ACCESS_READ
+                with open(self.filename, "rb") as f:
+                    try:
+                        content = mmap(f.fileno(), 0, access=ACCESS_READ)
+                    except ValueError:  # empty file
+                        pass
+            self.__content__ = content
+            self.__content_filename__ = self.filename
+            self.__descriptor__ = None
+        return self.__content__
+
+    def close(self):
+        """Release the memory map
+        (Not possible while arrays returned by 'counts' or 'trigger_offsets'
+        are in use.)"""
+        if hasattr(self.__content__, "close"):
+            try:
+                self.__content__.close()
+            except BufferError:
+                return
+        self.__content__ = None
+        self.__descriptor__ = None
+
+
+def wavedesc_format(cls):
+    """Layout of all 'field' properties of a class
+    Return value: (struct.Struct object, named tuple type for the decoded values)"""
+    if "__wavedesc_format__" not in vars(cls):
+        from struct import Struct
+        from collections import namedtuple
+        fields = {}
+        for base in reversed(cls.__mro__):
+            for (name, value) in vars(base).items():
+                if isinstance(value, field):
+                    fields[name] = value
+        fields = sorted(fields.items(), key=lambda item: item[1].start)
+        format_string = "<"
+        position = 0
+        for (name, value) in fields:
+            if value.start > position:
+                format_string += "%dx" % (value.start - position)
+            format_string += value.format_string.lstrip("<")
+            position = value.end
+        descriptor_type = namedtuple("WAVEDESC", ["wavedesc_offset"] + [name for (name, value) in fields])
+        setattr(cls, "__wavedesc_format__", (Struct(format_string), descriptor_type))
+    return getattr(cls, "__wavedesc_format__")
 
 
 if __name__ == '__main__':
@@ -157,3 +243,4 @@ if __name__ == '__main__':
     self = lecroy_scope_trace_file(filename)
 
     print("from time_string import date_time; print(date_time(self.trigger_time))")
+    print("t, U = self.waveform")
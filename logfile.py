@@ -2,14 +2,13 @@
 """Log file
 Author: Friedrich Schotte,
 Date created: 2019-03-02
-Date last modified: 2021-03-12
+Date last modified: 2026-10-17
 Python Version: 2.7 and 3.7
-Revision comment: Using mmap, bytes
+Revision comment: history: converting columns in bulk
 """
-__version__ = "1.1.13"
+__version__ = "1.2.0"
 
 from logging import warning
-from traceback import format_exc
 
 
 class LogFile(object):
@@ -82,18 +81,9 @@ class LogFile(object):
             lines = []
         column_names = args
         column_indices = [self.columns.index(name) for name in column_names]
-        values = []
-        for i in range(0, len(lines)):
-            if len(lines[i]) == len(column_names):
-                try:
-                    row_values = [convert(lines[i][j], name) for (j, name)
-                                  in zip(column_indices, column_names)]
-                    values += [row_values]
-                except Exception:
-                    warning("logfile: line %d/%d %r: %s" % (i + 1, len(lines), lines[i], format_exc()))
-        values = list(zip(*values))  # organize data in rows
-        if not values:
-            values = [[]] * len(column_names)
+        lines = [line for line in lines if len(line) == len(column_names)]
+        values = [convert_column([line[j] for line in lines], name)
+                  for (j, name) in zip(column_indices, column_names)]
         return values
 
     def lines(self, start, end):
@@ -237,6 +227,15 @@ class LogFile(object):
 logfile = LogFile
 
 
+def convert_column(strings, name):
+    """Convert strings to an array of Python objects, all at once if possible
+    name: if "date time", force conversion from string to seconds"""
+    from timestamps_fast import timestamps_fast, values_fast
+    if name == "date time":
+        return timestamps_fast(strings)
+    return values_fast(strings)
+
+
 def convert(x, name):
     """Try to convert string to a Python object.
     if not possible return a string
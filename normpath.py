@@ -2,10 +2,18 @@
 Platform-independent pathnames
 Author: Friedrich Schotte
 Date created: 2014-03-28
-Date last modified: 2021-06-20
-Revision comment: Cleanup: pylint
+Date last modified: 2026-10-17
+Revision comment: win32wnet imported only once
 """
-__version__ = "1.3.3"
+__version__ = "1.3.4"
+
+try:
+    from win32wnet import WNetGetUniversalName, error as win32wnet_error
+except ImportError:
+    def WNetGetUniversalName(pathname):
+        return pathname
+
+    win32wnet_error = OSError
 
 
 def normpath(pathname):
@@ -22,13 +30,6 @@ def normpath(pathname):
 
     # Try to expand a Windows drive letter to a UNC name.
     # E.g. "J:/anfinrud_1106" to "//mx340hs/data/anfinrud_1106"
-    try:
-        from win32wnet import WNetGetUniversalName, error as win32wnet_error
-    except ImportError:
-        def WNetGetUniversalName(pathname):
-            return pathname
-
-        win32wnet_error = OSError
     try:
         pathname = WNetGetUniversalName(pathname)
     except win32wnet_error:
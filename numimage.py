@@ -3,10 +3,10 @@ Load an image and convert it into a numpy array for processing.
 
 Author: Friedrich Schotte
 Date created: 2013-09-04
-Date last modified: 2021-08-10
-Revision comment: Cleanup
+Date last modified: 2026-10-17
+Revision comment: mapped_image: zero-copy loading of uncompressed TIFF/MCCD
 """
-__version__ = "1.9.8"
+__version__ = "1.10.0"
 
 from logging import debug, warning
 
@@ -46,6 +46,9 @@ class numimage(numpy.ndarray):
         if filename:
             from normpath import normpath
             filename = normpath(filename)
+            mapped = mapped_image(filename)
+            if mapped is not None:
+                self, file_format, pixelsize, info = mapped
             # A MAR CCD or Rayonix image is a TIFF image with NxN pixels,
             # depth 16 bit and a fixed-size 4096-byte TIFF header.
             # N = N_max/bin_factor
@@ -58,7 +61,7 @@ class numimage(numpy.ndarray):
             filesize = getsize(filename)
             for image_size in image_sizes:
                 image_n_bytes = 2 * image_size ** 2
-                if filesize == header_size + image_n_bytes:
+                if self is None and filesize == header_size + image_n_bytes:
                     file_format = "RX"
                     if DEBUG:
                         debug("using memmap")
@@ -268,8 +271,11 @@ class numimage(numpy.ndarray):
                 header[2048 + 416:]
             # Convert image to 16-bit depth
             data_16bit = array(clip(nan_to_num(rint(self)), 0, 65535), uint16)
-            image_data = header + data_16bit.tobytes()
-            open(self.filename, "wb").write(image_data)
+            # Writing the array directly, in C order, without copying it to a
+            # bytes object
+            with open(self.filename, "wb") as file:
+                file.write(header)
+                data_16bit.tofile(file)
         else:  # e.g. PNG
             if nanmax(self) > 255:
                 # PNG driver of PIL does not support mode I;16 but I (32-bit)
@@ -290,6 +296,117 @@ class numimage(numpy.ndarray):
     write = save
 
 
+def mapped_image(filename):
+    """Uncompressed grayscale TIFF or MAR CCD/Rayonix image, without decoding
+    or copying the pixel data
+    The pixel data is a view of a copy-on-write memory map of the file.
+    Pages are read from the file only when accessed and copied only when
+    modified. The file is never modified.
+    Return value: (array, file format, pixel size in mm, info),
+    None if the file is not a TIFF image that can be mapped"""
+    from mmap import mmap, ACCESS_COPY
+    from numpy import ndarray, nan
+    try:
+        with open(filename, "rb") as file:
+            if file.read(4) not in (b"II*\0", b"MM\0*"):
+                return None
+            memory_map = mmap(file.fileno(), 0, access=ACCESS_COPY)
+    except (OSError, ValueError) as x:
+        if DEBUG:
+            debug("%s: %s" % (filename, x))
+        return None
+    from struct import error as struct_error
+    try:
+        layout = TIFF_layout(memory_map)
+    except (ValueError, KeyError, IndexError, struct_error) as x:
+        if DEBUG:
+            debug("%s: %s" % (filename, x))
+        layout = None
+    if layout is None:
+        memory_map.close()
+        return None
+    offset, dtype, shape, pixelsize = layout
+    info = {}
+    file_format = "TIFF"
+    # A MAR CCD or Rayonix image has a fixed-size 4096-byte TIFF header,
+    # with a custom frame header starting at offset 1024.
+    header_size = 4096
+    TIFF_header_size = 1024
+    if offset == header_size and dtype.itemsize == 2 and \
+            len(memory_map) == header_size + 2 * shape[0] * shape[1]:
+        from struct import unpack_from
+        file_format = "RX"
+        # Rayonix_HS_detector_manual-0.3a.pdf, Chapter 8: Image Format (marccd)
+        pixelsize_nm, = unpack_from("<i", memory_map, TIFF_header_size + 193 * 4)
+        pixelsize = pixelsize_nm * 1e-9 / 1e-3  # convert from nm to mm
+    elif pixelsize == pixelsize:
+        dpi = 25.4 / pixelsize
+        info["dpi"] = (dpi, dpi)
+    # TIFF pixel data is stored row by row, the array index is [x,y].
+    self = ndarray(shape, dtype, buffer=memory_map, offset=offset, order="F")
+    return self, file_format, (pixelsize if pixelsize == pixelsize else nan), info
+
+
+def TIFF_layout(data):
+    """Where and how the pixels of a TIFF image are stored
+    data: content of the file
+    Return value: (offset, dtype, (width, height), pixel size in mm)
+    None if not a single-channel, uncompressed image stored contiguously"""
+    from struct import unpack_from, iter_unpack, calcsize
+    from numpy import dtype as numpy_dtype, nan
+    byte_order = "<" if data[0:2] == b"II" else ">"
+    IFD_offset, = unpack_from(byte_order + "I", data, 4)
+    n_tags, = unpack_from(byte_order + "H", data, IFD_offset)
+    entries = data[IFD_offset + 2:IFD_offset + 2 + 12 * n_tags]
+    # TIFF field type: (struct format, values per item)
+    type_formats = {1: ("B", 1), 3: ("H", 1), 4: ("I", 1), 5: ("I", 2),
+                    6: ("b", 1), 8: ("h", 1), 9: ("i", 1), 11: ("f", 1), 12: ("d", 1)}
+
+    tags = {}
+    for (tag, tag_type, count, value) in iter_unpack(byte_order + "HHI4s", entries):
+        if tag_type not in type_formats:
+            continue
+        value_type, values_per_item = type_formats[tag_type]
+        value_format = byte_order + str(count * values_per_item) + value_type
+        if calcsize(value_format) <= 4:
+            values = unpack_from(value_format, value)
+        else:
+            values = unpack_from(value_format, data, unpack_from(byte_order + "I", value)[0])
+        tags[tag] = values
+
+    width, = tags[256]
+    height, = tags[257]
+    bits_per_sample = tags.get(258, (1,))[0]
+    compression = tags.get(259, (1,))[0]
+    samples_per_pixel = tags.get(277, (1,))[0]
+    sample_format = tags.get(339, (1,))[0]
+    strip_offsets = tags[273]
+    strip_byte_counts = tags.get(279, ())
+
+    if compression != 1 or samples_per_pixel != 1 or tags.get(262, (1,))[0] != 1:
+        return None
+    if bits_per_sample not in (8, 16, 32, 64) or sample_format not in (1, 2, 3):
+        return None
+    # Multiple strips need to follow each other without gaps.
+    # (The strip byte count of a single strip is not checked because numimage.save
+    # does not update it for MCCD files.)
+    for i in range(0, len(strip_offsets) - 1):
+        if strip_offsets[i] + strip_byte_counts[i] != strip_offsets[i + 1]:
+            return None
+    dtype = numpy_dtype(byte_order + {1: "u", 2: "i", 3: "f"}[sample_format] + str(bits_per_sample // 8))
+    offset = strip_offsets[0]
+    if offset + width * height * dtype.itemsize > len(data):
+        return None
+
+    pixelsize = nan
+    if 282 in tags:  # x resolution, rational
+        numerator, denominator = tags[282]
+        unit = {2: 25.4, 3: 10.0}.get(tags.get(296, (2,))[0], nan)  # inch, cm
+        if numerator > 0:
+            pixelsize = unit / (float(numerator) / denominator)
+    return offset, dtype, (width, height), pixelsize
+
+
 def to_int(x):
     """Convert x to an integer value without throwing an exception"""
     try:
@@ -0,0 +1,342 @@
+"""
+Locating crystals from the diffraction images of a raster scan while the
+scan is running.
+Same analysis as 'RasterScan_CrystalFinder.py' by Philip Anfinrud, but
+streaming: each new image is memory-mapped and its region of interest read
+once; beamstop intensity, SAXS intensity, diffraction pixels and photons and
+scattering photons are computed in one pass over the frame, using work
+buffers that are reused from frame to frame, and entered in 2D raster maps
+that grow with the scan. The crystal positions and centroid are updated after each frame.
+
+Image filenames start with the raster-scan indices: "<row>,<column>_...mccd"
+
+Usage:
+self = raster_scan_crystal_finder(directory, ROI=[497, 491, 481])
+self.monitoring = True
+self.crystal_centroid, self.crystal_positions, self.D_photons_image
+
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment:
+"""
+__version__ = "1.0"
+
+import logging
+
+from cached_function import cached_function
+
+logger = logging.getLogger(__name__)
+if not logger.level:
+    logger.level = logging.INFO
+
+
+@cached_function()
+def raster_scan_crystal_finder(directory, ROI=(497, 491, 481)):
+    return Raster_Scan_Crystal_Finder(directory, ROI)
+
+
+class Raster_Scan_Crystal_Finder(object):
+    """ROI: [x0,y0,w] with w odd so the beam center is in the center pixel"""
+    map_names = ["I_BS", "I_SAXS", "D_pixels", "D_photons", "S_photons"]
+    poll_interval = 0.5  # seconds
+    crystal_SNR = 100
+
+    def __init__(self, directory, ROI=(497, 491, 481)):
+        from threading import Lock
+        self.directory = directory
+        self.ROI = tuple(ROI)
+        self.lock = Lock()
+        self.processed_filenames = set()
+        self.maps = Raster_Maps(self.map_names)
+        self.buffers = None
+        self.monitoring_thread = None
+        self.monitoring_cancelled = False
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.directory!r}, ROI={list(self.ROI)})"
+
+    def update(self):
+        """Process the images that were added since the last update
+        Return value: number of images processed"""
+        with self.lock:
+            count = 0
+            for filename in self.new_filenames:
+                if self.process(filename):
+                    count += 1
+        return count
+
+    @property
+    def new_filenames(self):
+        from os import scandir
+        filenames = []
+        try:
+            with scandir(self.directory) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".mccd") and not entry.name.startswith(".") \
+                            and entry.path not in self.processed_filenames:
+                        filenames.append(entry.path)
+        except OSError as x:
+            logger.warning(f"{self.directory}: {x}")
+        return sorted(filenames)
+
+    def process(self, filename):
+        """Return value: True if successful, False if the file is not complete"""
+        try:
+            R, C = RS_indices(filename)
+        except ValueError:
+            logger.debug(f"{filename}: no raster-scan indices")
+            self.processed_filenames.add(filename)
+            return False
+        x0, y0, w = self.ROI
+        if self.buffers is None:
+            self.buffers = Frame_Buffers((w, w))
+        try:
+            I = image_ROI(filename, self.ROI, out=self.buffers.I)
+        except (OSError, ValueError) as x:
+            logger.debug(f"{filename}: {x}")
+            return False
+        metrics = frame_metrics(I, self.buffers)
+        self.maps.set(R, C, metrics)
+        self.processed_filenames.add(filename)
+        return True
+
+    @property
+    def monitoring(self):
+        """Processing new images as they are written"""
+        return self.monitoring_thread is not None and self.monitoring_thread.is_alive()
+
+    @monitoring.setter
+    def monitoring(self, monitoring):
+        from threading import Thread
+        if monitoring and not self.monitoring:
+            self.monitoring_cancelled = False
+            self.monitoring_thread = Thread(target=self.monitor, daemon=True)
+            self.monitoring_thread.start()
+        if not monitoring:
+            self.monitoring_cancelled = True
+
+    def monitor(self):
+        from time import sleep
+        while not self.monitoring_cancelled:
+            self.update()
+            sleep(self.poll_interval)
+
+    def reset(self):
+        with self.lock:
+            self.processed_filenames = set()
+            self.maps = Raster_Maps(self.map_names)
+
+    @property
+    def I_BS_image(self):
+        return self.maps.image("I_BS")
+
+    @property
+    def I_SAXS_image(self):
+        return self.maps.image("I_SAXS")
+
+    @property
+    def D_pixels_image(self):
+        return self.maps.image("D_pixels")
+
+    @property
+    def D_photons_image(self):
+        return self.maps.image("D_photons")
+
+    @property
+    def S_photons_image(self):
+        return self.maps.image("S_photons")
+
+    @property
+    def crystal_positions(self):
+        """Raster-scan rows and columns of diffraction maxima
+        Return value: 2D array [[row, column], ...]"""
+        from numpy import argwhere, nan_to_num
+        D_photons = nan_to_num(self.D_photons_image, nan=0.0)
+        return argwhere(spotfinder(D_photons, self.crystal_SNR))
+
+    @property
+    def crystal_centroid(self):
+        """Diffracted-photon weighted center of the crystals, in units of
+        raster-scan rows and columns
+        Return value: (row, column), NaN if no crystals found"""
+        from numpy import nan, clip
+        D_photons = self.D_photons_image
+        positions = self.crystal_positions
+        rows, columns = positions[:, 0], positions[:, 1]
+        weights = clip(D_photons[rows, columns], 0, None)
+        if weights.sum() == 0:
+            return nan, nan
+        return (rows * weights).sum() / weights.sum(), (columns * weights).sum() / weights.sum()
+
+
+class Raster_Maps(object):
+    """2D maps of per-image values, indexed by raster-scan row and column,
+    growing as needed"""
+    def __init__(self, names):
+        from numpy import full, nan
+        self.names = list(names)
+        self.arrays = {name: full((0, 0), nan) for name in self.names}
+        self.shape = (0, 0)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.names}, shape={self.shape})"
+
+    def set(self, R, C, values):
+        """values: dictionary"""
+        self.grow(R + 1, C + 1)
+        for name in self.names:
+            self.arrays[name][R, C] = values[name]
+
+    def grow(self, rows, columns):
+        """Make sure the maps have at least the given dimensions
+        Capacity is doubled, such that maps are copied only log(N) times."""
+        from numpy import full, nan
+        N_R, N_C = max(self.shape[0], rows), max(self.shape[1], columns)
+        capacity = self.arrays[self.names[0]].shape
+        if N_R > capacity[0] or N_C > capacity[1]:
+            new_capacity = (max(N_R, 2 * capacity[0]), max(N_C, 2 * capacity[1]))
+            for name in self.names:
+                array = full(new_capacity, nan)
+                array[0:capacity[0], 0:capacity[1]] = self.arrays[name]
+                self.arrays[name] = array
+        self.shape = (N_R, N_C)
+
+    def image(self, name):
+        N_R, N_C = self.shape
+        return self.arrays[name][0:N_R, 0:N_C].copy()
+
+
+def RS_indices(name):
+    """Extract raster-scan indices (row,column) from name; returns (r,c)."""
+    indices = name.split("/")[-1].split("_")[0].split(",")
+    R = int(indices[0])
+    C = int(indices[1])
+    return R, C
+
+
+def image_ROI(filename, ROI, out=None):
+    """Region of interest of an MCCD image, memory-mapped, as float32 array
+    ROI: [x0,y0,w] with w odd so the beam center is in the center pixel
+    out: 2D float32 array of shape (w, w) to reuse
+    Only the memory pages of the ROI are read."""
+    from numpy import memmap, uint16, empty, float32
+    from rayonix_image import rayonix_image, read_header, Header_Bytes
+    header = read_header(filename)
+    if header is None:
+        raise OSError(f"{filename}: cannot read header")
+    header = Header_Bytes(header)
+    width = rayonix_image.tiff_width.get_value(header)
+    height = rayonix_image.tiff_height.get_value(header)
+    image = memmap(filename, uint16, mode="r", offset=rayonix_image.header_size,
+                   shape=(height, width))
+    x0, y0, w = ROI
+    xmin, xmax = x0 - (w - 1) // 2, x0 + (w - 1) // 2 + 1
+    ymin, ymax = y0 - (w - 1) // 2, y0 + (w - 1) // 2 + 1
+    I = out if out is not None else empty((w, w), float32)
+    I[...] = image[xmin:xmax, ymin:ymax]
+    del image
+    return I
+
+
+def frame_metrics(I, buffers=None, SAXS_radius=15, BS_scale=0.6385, SNR=5, readout_variance=5):
+    """Per-image values of the raster-scan maps, calculated in one pass
+    I: 2D float32 array, ROI centered on the beam
+    buffers: 'Frame_Buffers' object to reuse
+    Return value: dictionary"""
+    from numpy import sqrt, subtract, greater, multiply, add, count_nonzero
+    from scipy.ndimage import gaussian_filter
+    if buffers is None:
+        buffers = Frame_Buffers(I.shape)
+    w, h = I.shape
+    x0, y0 = (w - 1) // 2, (h - 1) // 2
+
+    # Transmitted intensity through the beamstop
+    I_sum3x3 = I[x0 - 1:x0 + 2, y0 - 1:y0 + 2].sum(dtype=float)
+    I_sum5x5 = I[x0 - 2:x0 + 3, y0 - 2:y0 + 3].sum(dtype=float)
+    I_BS = I_sum3x3 - BS_scale * (9. / 16) * (I_sum5x5 - I_sum3x3)
+
+    # Integrated SAXS intensity near beamstop
+    SAXS_mask, BKG_mask = SAXS_masks(SAXS_radius)
+    r = SAXS_radius
+    I_center = I[x0 - r:x0 + r + 1, y0 - r:y0 + r + 1]
+    I_sum = I_center[SAXS_mask].sum(dtype=float)
+    I_BKG = I_center[BKG_mask].sum(dtype=float)
+    I_SAXS = I_sum - I_BKG * SAXS_mask.sum() / float(BKG_mask.sum())
+
+    # Approximate background by smoothing image, 10 count offset
+    background = gaussian_filter(I, 5, output=buffers.background)
+    offset = 10 * count_nonzero(I)
+    background_sum = background.sum(dtype=float)
+
+    # Diffracted photons: S/N criterion; readout variance ~5
+    signal = subtract(I, background, out=buffers.signal)
+    noise = add(I, readout_variance, out=buffers.noise)
+    sqrt(noise, out=noise)
+    multiply(noise, SNR, out=noise)
+    S_mask = greater(signal, noise, out=buffers.S_mask)
+    D_pixels = count_nonzero(S_mask)
+    D_photons = signal.sum(where=S_mask, dtype=float) - I_SAXS
+    S_photons = background_sum - offset - D_photons
+
+    return dict(I_BS=I_BS, I_SAXS=I_SAXS, D_pixels=D_pixels,
+                D_photons=D_photons, S_photons=S_photons)
+
+
+class Frame_Buffers(object):
+    """Work arrays, reused for all frames of a raster scan"""
+    def __init__(self, shape):
+        from numpy import empty, float32
+        self.I = empty(shape, float32)
+        self.background = empty(shape, float32)
+        self.signal = empty(shape, float32)
+        self.noise = empty(shape, float32)
+        self.S_mask = empty(shape, bool)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.I.shape})"
+
+
+@cached_function()
+def SAXS_masks(radius):
+    """Pixels included in the SAXS intensity and the background around it
+    Return value: (SAXS_mask, BKG_mask), 2D boolean arrays (2*radius+1)^2"""
+    from numpy import indices, sqrt
+    x_indices, y_indices = indices((2 * radius + 1, 2 * radius + 1))
+    SAXS_mask = sqrt((y_indices - radius) ** 2 + (x_indices - radius) ** 2) < radius
+    SAXS_mask[radius - 1:radius + 2, radius - 1:radius + 2] = 0
+    BKG_mask = ~SAXS_mask
+    BKG_mask[radius - 1:radius + 2, radius - 1:radius + 2] = 0
+    return SAXS_mask, BKG_mask
+
+
+def spotfinder(I, SNR=10):
+    """Finds spots whose Signal-to-Noise Ratio exceeds SNR (default = 10);
+    returns S_mask"""
+    from numpy import array, sqrt, errstate
+    from scipy.ndimage import maximum_filter, minimum_filter
+    footprint0 = array([[1, 1, 1],
+                        [1, 1, 1],
+                        [1, 1, 1]])
+    footprint1 = array([[1, 1, 1],
+                        [1, 0, 1],
+                        [1, 1, 1]])
+    I_max = maximum_filter(I, footprint=footprint0)
+    I_min = minimum_filter(I, footprint=footprint1)
+    test1 = I == I_max
+    with errstate(invalid="ignore", divide="ignore"):
+        test2 = ((I_max - I_min) / sqrt(I_max + I_min) > SNR)
+    S_mask = test1 & test2
+    return S_mask
+
+
+if __name__ == "__main__":
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s, line %(lineno)d: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    directory = "/Volumes/data-3/anfinrud_1711-1/Data/Laue/Lyz/Lyz-1/alignment"
+    self = raster_scan_crystal_finder(directory)
+    print("from time import time; t=time(); self.update(); time()-t")
+    print("self.monitoring = True")
+    print("self.crystal_centroid")
+    print("self.crystal_positions")
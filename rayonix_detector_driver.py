@@ -18,10 +18,10 @@ Rayonix MX series CCD X-ray detector
 
 Author: Friedrich Schotte
 Date created: 2016-06-17
-Date last modified: 2022-07-21
-Revision comment: Filtering xdet_trig_count_offsets
+Date last modified: 2026-10-17
+Revision comment: Save_Queue: separate retry queue, resume images given up on
 """
-__version__ = "8.4.5"
+__version__ = "8.6.1"
 
 import logging
 from os.path import basename
@@ -65,10 +65,13 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
         Rayonix_Detector.__init__(self)
         self.trigger_events = []
         self.temp_images = {}
+        self.temp_image_index = Temp_Image_Index()
         self.xdet_acq_count_offset = nan
+        self.save_queue = self.Save_Queue()
 
         # For pylint "Instance attribute ... defined outside __init__"
         self.saving_images = False
+        self.watching_scratch_directory = False
         self.monitoring_new_temp_filenames = False
         self.updating_file_timestamps = False
         self.updating_xdet_trig_count_offset = False
@@ -165,6 +168,8 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
             self.trigger_monitoring,
             self.updating_file_timestamps,
             self.monitoring_new_temp_filenames,
+            self.watching_scratch_directory,
+            self.saving_images,
         ])
         return acquiring_images
 
@@ -173,9 +178,12 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
         if value != self.monitoring_acquisition:
             if value:
                 self.temp_images = {}
+                self.temp_image_index.clear()
                 self.trigger_monitoring = True
                 self.updating_file_timestamps = True
+                self.saving_images = True
                 self.monitoring_new_temp_filenames = True
+                self.watching_scratch_directory = True
                 self.xdet_trig_count_history.recording = True
                 self.xdet_acq_count_history.recording = True
                 self.xdet_acq_history.recording = True
@@ -184,6 +192,8 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
                 self.trigger_monitoring = False
                 self.updating_file_timestamps = False
                 self.monitoring_new_temp_filenames = False
+                self.watching_scratch_directory = False
+                self.saving_images = False
                 self.xdet_trig_count_history.recording = False
                 self.xdet_acq_count_history.recording = False
                 self.xdet_acq_history.recording = False
@@ -280,12 +290,22 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
             save_filename = ""
         return save_filename
 
+    def image_acquire_timestamp(self, temp_filename):
+        """Acquisition timestamp recorded in the image header"""
+        from numpy import isnan
+        from rayonix_image import acquire_timestamps
+        image = self.temp_images.get(temp_filename)
+        if image is not None and not isnan(image.acquire_timestamp):
+            acquire_timestamp = image.acquire_timestamp
+        else:
+            acquire_timestamp = acquire_timestamps([temp_filename])[0]
+        return acquire_timestamp
+
     def acquire_timestamp(self, temp_filename):
-        from rayonix_image import rayonix_image
         from numpy import isnan
 
         if not isnan(self.acquire_timestamp_offset):
-            acquire_timestamp = rayonix_image(temp_filename).acquire_timestamp
+            acquire_timestamp = self.image_acquire_timestamp(temp_filename)
             if isnan(acquire_timestamp):
                 logging.error(f"failed to read acquire_timestamp of {temp_filename}")
             acquire_timestamp -= self.acquire_timestamp_offset
@@ -425,29 +445,54 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
                         image.file_timestamp = getmtime(filename)
                     except OSError:
                         pass
-                if isnan(image.acquire_timestamp):
-                    from rayonix_image import rayonix_image
-                    try:
-                        image.acquire_timestamp = rayonix_image(filename).acquire_timestamp
-                    except (OSError, ValueError):
-                        pass
 
+            # Read the headers of all new images at once.
+            from rayonix_image import acquire_timestamps
+            images = [temp_images[filename] for filename in filenames
+                      if filename in temp_images and isnan(temp_images[filename].acquire_timestamp)]
+            if len(images) > 0 and not cancelled():
+                timestamps = acquire_timestamps([image.filename for image in images])
+                for (image, timestamp) in zip(images, timestamps):
+                    image.acquire_timestamp = timestamp
+                    if not isnan(timestamp):
+                        self.temp_image_index.add(timestamp, image.filename)
+                        self.save_queue.resume(image.filename)
+
+            existing_filenames = set(filenames)
             for image in list(temp_images.values()):
-                if image.filename not in filenames:
+                if image.filename not in existing_filenames:
                     try:
                         del temp_images[image.filename]
                     except KeyError:
                         pass
+                    self.temp_image_index.remove(image.filename)
+                    self.save_queue.forget(image.filename)
             self.temp_images = temp_images
             from time import sleep
             sleep(1.0)
 
     @thread_property
     def saving_images(self):
-        from time import sleep
+        """Save each new image in the scratch directory once, as soon as it is
+        reported by 'queue_temp_files'"""
         while not cancelled():
-            self.save_images()
-            sleep(0.2)
+            temp_filename = self.save_queue.next(timeout=0.2)
+            if temp_filename:
+                self.save_queued_temp_file(temp_filename)
+
+    def queue_temp_files(self, temp_filenames):
+        """Have images saved by the 'saving_images' thread"""
+        for temp_filename in temp_filenames:
+            self.save_queue.put(temp_filename)
+
+    def save_queued_temp_file(self, temp_filename):
+        from numpy import isnan
+        if isnan(self.image_acquire_timestamp(temp_filename)):
+            # The header is not written yet.
+            self.save_queue.retry(temp_filename)
+        else:
+            self.save_temp_file(temp_filename)
+            self.save_queue.done(temp_filename)
 
     def save_images(self):
         """Check whether the last acquired image needs to be saved and save it."""
@@ -501,16 +546,8 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
 
     def temp_filename(self, xdet_acq_timestamp):
         """Full pathname of image file"""
-        from numpy import inf
-        filename = ""
-        min_dt = inf
-        images = list(self.temp_images.values())
-        for image in images:
-            timestamp = image.acquire_timestamp - self.acquire_timestamp_offset
-            dt = timestamp - xdet_acq_timestamp
-            if 0 <= dt < min_dt:
-                min_dt = dt
-                filename = image.filename
+        timestamp = xdet_acq_timestamp + self.acquire_timestamp_offset
+        filename = self.temp_image_index.first_at_or_after(timestamp)
         return filename
 
     @thread_property
@@ -778,8 +815,59 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
     @handler_method
     def handle_new_temp_filenames(self, event):
         new_temp_filenames = event.value
-        for temp_filename in new_temp_filenames:
-            self.save_temp_file(temp_filename)
+        self.queue_temp_files(new_temp_filenames)
+
+    @property
+    def watching_scratch_directory(self):
+        """Getting notified by the operating system of new image files"""
+        observer = self.scratch_directory_observer
+        return observer is not None and observer.is_alive()
+
+    @watching_scratch_directory.setter
+    def watching_scratch_directory(self, watching):
+        if watching != self.watching_scratch_directory:
+            if watching:
+                self.scratch_directory_observer = self.new_scratch_directory_observer()
+            else:
+                observer = self.scratch_directory_observer
+                if observer is not None:
+                    observer.stop()
+                self.scratch_directory_observer = None
+
+    scratch_directory_observer = None
+
+    def new_scratch_directory_observer(self):
+        """Reports new files as soon as they are closed or renamed"""
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError as x:
+            logging.warning(f"{x}. New images detected by polling only.")
+            return None
+
+        driver = self
+
+        class Event_Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.is_directory:
+                    return
+                if event.event_type in ("created", "closed"):
+                    filename = event.src_path
+                elif event.event_type == "moved":
+                    filename = event.dest_path
+                else:
+                    return
+                if not basename(filename).startswith("."):
+                    driver.queue_temp_files([filename])
+
+        observer = Observer()
+        try:
+            observer.schedule(Event_Handler(), path=self.scratch_directory, recursive=False)
+            observer.start()
+        except OSError as x:
+            logging.warning(f"{self.scratch_directory}: {x}. New images detected by polling only.")
+            observer = None
+        return observer
 
     @property
     def current_temp_filename(self):
@@ -885,10 +973,151 @@ class Rayonix_Detector_Driver(Rayonix_Detector):
             # file_timestamp = acquire_timestamp - offset
             return self.acquire_timestamp - self.file_timestamp
 
+    class Save_Queue:
+        """Temp images to be saved, each only once
+        Images whose header is incomplete are retried after a delay.
+        Retries are kept apart from the bounded queue, such that the
+        consumer never has to wait for space in its own queue."""
+        max_length = 10000
+        retry_delay = 0.1  # seconds
+        max_retries = 20
+
+        def __init__(self):
+            from queue import Queue
+            from collections import deque
+            from threading import Lock
+            self.queue = Queue(maxsize=self.max_length)
+            self.retry_queue = deque()
+            self.lock = Lock()
+            self.queued = set()
+            self.saved = set()
+            self.given_up = set()
+            self.retries = {}  # filename: (count, time)
+
+        def __repr__(self):
+            return f"{type(self).__name__}(queued={len(self.queued)}, saved={len(self.saved)}, " \
+                   f"given_up={len(self.given_up)})"
+
+        def put(self, filename):
+            with self.lock:
+                if filename in self.queued or filename in self.saved:
+                    return
+                self.queued.add(filename)
+                self.given_up.discard(filename)
+            self.queue.put(filename)
+
+        def next(self, timeout):
+            """Filename to be saved, "" if none"""
+            from queue import Empty
+            self.requeue_retries()
+            if self.retry_queue:
+                return self.retry_queue.popleft()
+            try:
+                filename = self.queue.get(timeout=timeout)
+            except Empty:
+                filename = ""
+            return filename
+
+        def done(self, filename):
+            with self.lock:
+                self.queued.discard(filename)
+                self.retries.pop(filename, None)
+                self.given_up.discard(filename)
+                self.saved.add(filename)
+
+        def retry(self, filename):
+            from time import time
+            with self.lock:
+                count = self.retries.get(filename, (0, 0))[0] + 1
+                if count <= self.max_retries:
+                    self.retries[filename] = (count, time() + self.retry_delay)
+                else:
+                    logging.warning(f"{filename}: no acquire_timestamp yet, waiting for header")
+                    self.queued.discard(filename)
+                    self.retries.pop(filename, None)
+                    self.given_up.add(filename)
+
+        def resume(self, filename):
+            """The header of an image given up on is complete now"""
+            with self.lock:
+                if filename not in self.given_up:
+                    return
+            self.put(filename)
+
+        def requeue_retries(self):
+            from time import time
+            with self.lock:
+                due = [filename for (filename, (count, t)) in self.retries.items()
+                       if t <= time() and filename in self.queued]
+                for filename in due:
+                    self.retries[filename] = (self.retries[filename][0], float("inf"))
+            self.retry_queue.extend(due)
+
+        def forget(self, filename):
+            """File was deleted"""
+            with self.lock:
+                self.saved.discard(filename)
+                self.queued.discard(filename)
+                self.given_up.discard(filename)
+                self.retries.pop(filename, None)
+
     @handler_method
     def report(self, event): logging.info(f"{self}: {event}")
 
 
+class Temp_Image_Index:
+    """Temp image filenames, sorted by acquisition timestamp"""
+    def __init__(self):
+        from threading import Lock
+        self.lock = Lock()
+        self.timestamps = []
+        self.filenames = []
+        self.filename_timestamps = {}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({len(self.filenames)} images)"
+
+    def add(self, timestamp, filename):
+        from bisect import bisect_right
+        with self.lock:
+            if filename in self.filename_timestamps:
+                return
+            i = bisect_right(self.timestamps, timestamp)
+            self.timestamps.insert(i, timestamp)
+            self.filenames.insert(i, filename)
+            self.filename_timestamps[filename] = timestamp
+
+    def remove(self, filename):
+        from bisect import bisect_left
+        with self.lock:
+            if filename not in self.filename_timestamps:
+                return
+            timestamp = self.filename_timestamps.pop(filename)
+            i = bisect_left(self.timestamps, timestamp)
+            while self.filenames[i] != filename:
+                i += 1
+            del self.timestamps[i]
+            del self.filenames[i]
+
+    def clear(self):
+        with self.lock:
+            self.timestamps = []
+            self.filenames = []
+            self.filename_timestamps = {}
+
+    def first_at_or_after(self, timestamp):
+        """Filename of the image with the smallest timestamp >= 'timestamp'
+        Return value: "" if there is none"""
+        from bisect import bisect_left
+        from math import isnan
+        with self.lock:
+            if isnan(timestamp):
+                return ""
+            i = bisect_left(self.timestamps, timestamp)
+            filename = self.filenames[i] if i < len(self.filenames) else ""
+        return filename
+
+
 def mtime(filename):
     """When was the file modified the last time?
     Return value: seconds since 1970-01-01 00:00:00 UTC as floating point number
@@ -6,11 +6,11 @@ File: Rayonix_HS_detector_manual-0.3a.pdf
 
 Author: Friedrich Schotte
 Date created: 2021-09-03
-Date last modified: 2022-06-20
-Revision comment: Fixed: Issue: timestamp not resetting to original when file closed
+Date last modified: 2026-10-17
+Revision comment: acquire_timestamps, header_values: batched header reads
 """
 
-__version__ = "2.8.2"
+__version__ = "2.9.0"
 
 import logging
 
@@ -22,6 +22,7 @@ from rayonix_image_header_property import (
     optional_timestamp_header_property,
 )
 from date_time import date_time
+from cached_function import cached_function
 
 logger = logging.getLogger(__name__)
 if not logger.level:
@@ -245,6 +246,76 @@ class rayonix_image:
         return value
 
 
+def acquire_timestamps(filenames):
+    """Acquisition timestamps of many images at once
+    filenames: list of pathnames
+    Return value: list of seconds since 1970-01-01 00:00:00 UTC (nan if
+    the file cannot be read)"""
+    return header_values(filenames, "acquire_timestamp")
+
+
+def header_values(filenames, name):
+    """Decode a header property for many images at once, reading only the
+    headers of the files, in parallel
+    filenames: list of pathnames
+    name: e.g. "acquire_timestamp", "header_timestamp"
+    Return value: list (for an unreadable file the same value as for an
+    empty header)"""
+    header_property = getattr(rayonix_image, name)
+    headers = read_headers(filenames)
+    empty_header = bytes(rayonix_image.header_size)
+    values = [
+        header_property.get_value(Header_Bytes(header if header is not None else empty_header))
+        for header in headers
+    ]
+    return values
+
+
+def read_headers(filenames):
+    """Headers of many image files, read in parallel
+    filenames: list of pathnames
+    Return value: list of bytes, None for files that cannot be read"""
+    return list(header_reader_pool().map(read_header, filenames))
+
+
+@cached_function()
+def header_reader_pool():
+    from concurrent.futures import ThreadPoolExecutor
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="read_header")
+
+
+def read_header(filename):
+    """Header of an image file, without mapping or locking the file
+    Return value: bytes, padded with zeros if the file is shorter,
+    None if the file cannot be read"""
+    import os
+    size = rayonix_image.header_size
+    try:
+        file = os.open(filename, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    except OSError as x:
+        logger.debug(f"{filename}: {x}")
+        return None
+    try:
+        if hasattr(os, "pread"):
+            header = os.pread(file, size, 0)
+        else:  # Windows
+            header = os.read(file, size)
+    except OSError as x:
+        logger.debug(f"{filename}: {x}")
+        header = None
+    finally:
+        os.close(file)
+    if header is not None:
+        header = header.ljust(size, b"\0")
+    return header
+
+
+class Header_Bytes:
+    """Stands in for a 'rayonix_image' object when decoding header properties"""
+    def __init__(self, header):
+        self.header_ = header
+
+
 def refresh_NFS_cache(filename):
     from os.path import dirname
     from os import listdir
@@ -0,0 +1,263 @@
+"""
+Catalog of the header information of the Rayonix images in a directory,
+such that an analysis of image timestamps, serial numbers etc. does not need
+to open each image file.
+For each image, the decoded header properties of 'rayonix_image' are stored
+together with modification time and size of the file.
+The catalog is saved as a hidden file in the image directory (or in the
+temporary directory if the image directory is not writable), and updated
+by reading only the headers of new or modified files, in parallel.
+
+Usage:
+rayonix_image_headers(filenames)[0].acquire_timestamp
+
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment:
+"""
+__version__ = "1.0"
+
+import logging
+
+from cached_function import cached_function
+
+logger = logging.getLogger(__name__)
+if not logger.level:
+    logger.level = logging.INFO
+
+
+def rayonix_image_headers(filenames):
+    """Header information of Rayonix images, from the catalogs of their
+    directories
+    filenames: list of pathnames of ".mccd" files
+    Return value: list of 'Cataloged_Image' objects"""
+    from os.path import dirname
+    directories = []
+    for filename in filenames:
+        if dirname(filename) not in directories:
+            directories.append(dirname(filename))
+    catalogs = {}
+    for directory in directories:
+        catalogs[directory] = rayonix_image_catalog(directory)
+        catalogs[directory].update()
+    images = [catalogs[dirname(filename)].image(filename) for filename in filenames]
+    return images
+
+
+@cached_function()
+def rayonix_image_catalog(directory):
+    return Rayonix_Image_Catalog(directory)
+
+
+class Rayonix_Image_Catalog:
+    catalog_basename = ".rayonix_image_catalog.pkl"
+
+    def __init__(self, directory):
+        from threading import Lock
+        self.directory = directory
+        self.lock = Lock()
+        self.__entries__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.directory!r})"
+
+    def image(self, filename):
+        """filename: pathname of an image in the directory"""
+        return Cataloged_Image(filename, self)
+
+    def header_values(self, filename):
+        """Decoded header properties of an image, by name
+        filename: pathname or basename
+        Return value: dictionary, None if not in catalog"""
+        from os.path import basename
+        entry = self.entries.get(basename(filename))
+        return entry[2] if entry is not None else None
+
+    def values(self, filenames, name):
+        """A header property for several images
+        filenames: list of pathnames or basenames
+        name: e.g. "acquire_timestamp"
+        """
+        return [self.image(filename).header_value(name) for filename in filenames]
+
+    @property
+    def entries(self):
+        """basename: (modification time, size, header values)"""
+        if self.__entries__ is None:
+            with self.lock:
+                if self.__entries__ is None:
+                    self.__entries__ = self.load()
+        return self.__entries__
+
+    def update(self):
+        """Read the headers of new and modified files"""
+        from os.path import join
+        entries = dict(self.entries)
+        listing = self.directory_listing
+        changed = [name for name in listing
+                   if name not in entries or entries[name][0:2] != listing[name]]
+        removed = [name for name in entries if name not in listing]
+        if changed:
+            logger.debug(f"{self.directory}: reading {len(changed)} image headers")
+            from rayonix_image import read_headers
+            headers = read_headers([join(self.directory, name) for name in changed])
+            for name, header in zip(changed, headers):
+                if header is not None:
+                    entries[name] = listing[name] + (decoded_header_values(header),)
+                else:
+                    logger.warning(f"{self.directory}/{name}: cannot read header")
+        for name in removed:
+            del entries[name]
+        if changed or removed:
+            with self.lock:
+                self.__entries__ = entries
+            self.save()
+
+    @property
+    def directory_listing(self):
+        """basename: (modification time, size) of all image files"""
+        from os import scandir
+        listing = {}
+        try:
+            with scandir(self.directory) as directory_entries:
+                for entry in directory_entries:
+                    if entry.name.endswith(".mccd") and not entry.name.startswith("."):
+                        try:
+                            if entry.is_file():
+                                stat = entry.stat()
+                                listing[entry.name] = (stat.st_mtime, stat.st_size)
+                        except OSError:
+                            pass
+        except OSError as x:
+            logger.warning(f"{self.directory}: {x}")
+        return listing
+
+    def load(self):
+        from pickle import loads
+        entries = {}
+        for filename in self.catalog_filenames:
+            try:
+                content = open(filename, "rb").read()
+            except OSError:
+                continue
+            # noinspection PyBroadException
+            try:
+                entries = loads(content)
+            except Exception as x:
+                logger.warning(f"{filename}: {x}")
+                continue
+            if entries.get("__version__") == header_version():
+                del entries["__version__"]
+                break
+            entries = {}
+        return entries
+
+    def save(self):
+        from pickle import dumps, HIGHEST_PROTOCOL
+        from os import replace, makedirs, getpid
+        from os.path import dirname
+        with self.lock:
+            entries = dict(self.__entries__)
+        entries["__version__"] = header_version()
+        content = dumps(entries, protocol=HIGHEST_PROTOCOL)
+        for filename in self.catalog_filenames:
+            temp_filename = f"{filename}.{getpid()}.tmp"
+            try:
+                makedirs(dirname(filename), exist_ok=True)
+                with open(temp_filename, "wb") as file:
+                    file.write(content)
+                replace(temp_filename, filename)
+            except OSError as x:
+                logger.debug(f"{filename}: {x}")
+                continue
+            break
+
+    @property
+    def catalog_filenames(self):
+        """In the image directory, or, as fallback, in the temporary directory"""
+        from tempfile import gettempdir
+        from os.path import abspath
+        local_name = abspath(self.directory).strip("/").replace("/", "_")
+        return [
+            f"{self.directory}/{self.catalog_basename}",
+            f"{gettempdir()}/rayonix_image_catalog/{local_name}.pkl",
+        ]
+
+
+class Cataloged_Image:
+    """Header properties of a Rayonix image, looked up in the catalog
+    Other attributes are those of a 'rayonix_image' object"""
+    def __init__(self, filename, catalog):
+        self.filename = filename
+        self.catalog = catalog
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.filename!r})"
+
+    def header_value(self, name):
+        values = self.catalog.header_values(self.filename)
+        if values is None:
+            values = empty_header_values()
+        return values[name]
+
+    def __getattr__(self, name):
+        if name in header_property_names():
+            return self.header_value(name)
+        if name.startswith("__") or name in ("filename", "catalog"):
+            raise AttributeError(name)
+        return getattr(self.image, name)
+
+    @property
+    def image(self):
+        from rayonix_image import rayonix_image
+        return rayonix_image(self.filename)
+
+
+def decoded_header_values(header):
+    """header: bytes"""
+    from rayonix_image import rayonix_image, Header_Bytes
+    header = Header_Bytes(bytes(header).ljust(rayonix_image.header_size, b"\0"))
+    values = {}
+    for name in header_property_names():
+        # noinspection PyBroadException
+        try:
+            values[name] = getattr(rayonix_image, name).get_value(header)
+        except Exception as x:
+            logger.debug(f"{name}: {x}")
+            values[name] = None
+    return values
+
+
+@cached_function()
+def empty_header_values():
+    """Same values as rayonix_image for a missing file"""
+    from rayonix_image import rayonix_image
+    return decoded_header_values(bytes(rayonix_image.header_size))
+
+
+@cached_function()
+def header_property_names():
+    from rayonix_image import rayonix_image
+    from rayonix_image_header_property import bytes_header_property
+    names = tuple(sorted(
+        name for (name, value) in vars(rayonix_image).items()
+        if isinstance(value, bytes_header_property)
+    ))
+    return names
+
+
+def header_version():
+    """Catalogs saved by a different version need to be rebuilt"""
+    from rayonix_image import __version__ as rayonix_image_version
+    return f"{__version__},{rayonix_image_version}"
+
+
+if __name__ == "__main__":
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s, line %(lineno)d: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    directory = "/net/femto-data2/C/Data/2021.11/Test/WAXS/Reference/Reference-1_A/xray_images"
+    self = rayonix_image_catalog(directory)
+    print("from time import time; t=time(); self.update(); time()-t")
+    print("self.values(sorted(self.entries)[0:10], 'acquire_timestamp')")
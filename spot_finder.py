@@ -0,0 +1,354 @@
+"""
+Spot finding for batches of diffraction images with Bragg spots, such as
+the frames of a raster scan.
+Same algorithm and result as 'spot_mask' in 'peak_integration', but each
+image is divided into tiles, which overlap by a halo wide enough for the
+filter footprints, and the tiles are processed in a pool of worker processes.
+Images, the random-noise image and the spot mask are exchanged with the
+workers via shared memory, and each worker reuses its filter work buffers
+from tile to tile.
+The noise image added to break ties is the same for every call of
+'spot_mask' (fixed seed), so it is generated only once per image size.
+
+Usage:
+counts, coordinates = spot_finder().find_spots(images)
+mask = spot_mask(I)
+
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment:
+"""
+__version__ = "1.0"
+
+import logging
+
+from cached_function import cached_function
+
+# Filter footprints of 'peak_integration.spot_mask'
+footprint0 = [[0, 1, 1, 1, 0],
+              [1, 1, 1, 1, 1],
+              [1, 1, 1, 1, 1],
+              [1, 1, 1, 1, 1],
+              [0, 1, 1, 1, 0]]
+footprint1 = [[1, 1, 1],
+              [1, 1, 1],
+              [1, 1, 1]]
+footprint3 = [[0, 0, 1, 1, 1, 0, 0],
+              [0, 1, 0, 0, 0, 1, 0],
+              [1, 0, 0, 0, 0, 0, 1],
+              [1, 0, 0, 0, 0, 0, 1],
+              [1, 0, 0, 0, 0, 0, 1],
+              [0, 1, 0, 0, 0, 1, 0],
+              [0, 0, 1, 1, 1, 0, 0]]
+
+# Pixels outside a tile needed to get the same result inside the tile:
+# 7x7 median filter (3), followed by growing the spots by 5x5 (2)
+halo = 3 + 2
+
+# Beam passing through beam attenuator (25 Oct 2014)
+masked_region = (slice(489, 501), slice(485, 497))
+
+
+def spot_mask(I, threshold=5):
+    """Generate a "spot mask" for a diffraction image with Bragg spots.
+    I: 2D numpy array of type uint16
+    threshold: peak detection threshold as multiple of sigma
+    Return value: 2D boolean array, True for pixels that are part of a spot
+    """
+    return spot_finder().spot_mask(I, threshold)
+
+
+@cached_function()
+def spot_finder():
+    return Spot_Finder()
+
+
+class Spot_Finder(object):
+    tile_size = 512  # pixels
+    max_processes = None  # default: number of CPUs
+
+    def __init__(self):
+        from threading import Lock
+        self.lock = Lock()
+        self.pool = None
+        self.slots = [{}, {}]  # shared image and mask of two images in progress
+        self.noise = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}()"
+
+    def spot_mask(self, I, threshold=5):
+        """I: 2D numpy array
+        Return value: 2D boolean array, same shape as I"""
+        for (coordinates, mask) in self.process([I], threshold, with_mask=True):
+            return mask
+
+    def find_spots(self, images, threshold=5):
+        """Peak pixels of the spots in a series of images
+        images: iterable of 2D numpy arrays
+        threshold: peak detection threshold as multiple of sigma
+        Return value: (counts, coordinates)
+        counts: number of spots per image, 1D integer array
+        coordinates: 2D integer array, one row [image index, row, column]
+        per spot"""
+        from numpy import array, concatenate, zeros, full, hstack
+        counts = []
+        coordinates = []
+        for i, (peaks, mask) in enumerate(self.process(images, threshold)):
+            counts.append(len(peaks))
+            coordinates.append(hstack([full((len(peaks), 1), i, dtype=peaks.dtype), peaks]))
+        counts = array(counts, dtype=int)
+        if coordinates:
+            coordinates = concatenate(coordinates)
+        else:
+            coordinates = zeros((0, 3), dtype="int32")
+        return counts, coordinates
+
+    def process(self, images, threshold, with_mask=False):
+        """Generate (peak coordinates, mask) for each image
+        The tiles of the next image are queued for processing before the
+        results of the current image are collected.
+        mask: None unless 'with_mask'"""
+        with self.lock:
+            pending = None
+            for i, I in enumerate(images):
+                tasks = self.submit(self.slots[i % 2], I, threshold, with_mask)
+                if pending is not None:
+                    yield self.collect(*pending)
+                pending = (self.slots[i % 2], tasks, with_mask)
+            if pending is not None:
+                yield self.collect(*pending)
+
+    def submit(self, slot, I, threshold, with_mask):
+        from numpy import asarray
+        I = asarray(I)
+        if I.ndim != 2:
+            raise ValueError(f"Expecting 2D image, got shape {I.shape}")
+        regions = self.regions(I.shape)
+        noise = self.noise_array(I.shape)
+        if self.process_count <= 1:
+            from numpy import zeros
+            mask = zeros(I.shape, bool) if with_mask else None
+            slot["mask"] = mask
+            tasks = [process_tile(I, noise.array, mask, region, threshold) for region in regions]
+        else:
+            image = shared_array(slot, "image", I.shape, I.dtype)
+            image.array[...] = I
+            mask = shared_array(slot, "mask", I.shape, bool) if with_mask else None
+            mask_spec = mask.spec if mask else None
+            tasks = [self.worker_pool.submit(process_shared_tile,
+                                             image.spec, noise.spec, mask_spec, region, threshold)
+                     for region in regions]
+        return tasks
+
+    @staticmethod
+    def collect(slot, tasks, with_mask):
+        from concurrent.futures import Future
+        from numpy import concatenate, zeros
+        peaks = [task.result() if isinstance(task, Future) else task for task in tasks]
+        peaks = concatenate(peaks) if peaks else zeros((0, 2), dtype="int32")
+        mask = None
+        if with_mask:
+            mask = slot["mask"]
+            mask = mask.array.copy() if isinstance(mask, Shared_Array) else mask
+        return peaks, mask
+
+    def regions(self, shape):
+        """Tiles (without halo), as (row start, row end, column start, column end)"""
+        h, w = shape
+        n = self.tile_size
+        return [(i, min(i + n, h), j, min(j + n, w))
+                for i in range(0, h, n) for j in range(0, w, n)]
+
+    def noise_array(self, shape):
+        """Random values to eliminate identical values, same as in
+        'peak_integration.spot_mask'"""
+        from numpy.random import RandomState
+        if self.noise is None or self.noise.shape != tuple(shape):
+            if self.noise is not None:
+                self.noise.close()
+            random_sample = RandomState([1]).random_sample(shape)
+            self.noise = Shared_Array(shape, random_sample.dtype)
+            self.noise.array[...] = (random_sample - 0.5) / 10
+        return self.noise
+
+    @property
+    def process_count(self):
+        from os import cpu_count
+        return self.max_processes or cpu_count() or 1
+
+    @property
+    def worker_pool(self):
+        from concurrent.futures import ProcessPoolExecutor
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.process_count)
+            import atexit
+            atexit.register(self.close)
+        return self.pool
+
+    def close(self):
+        """Stop the worker processes and release the shared memory"""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        for slot in self.slots:
+            for shared in slot.values():
+                if isinstance(shared, Shared_Array):
+                    shared.close()
+            slot.clear()
+        if self.noise is not None:
+            self.noise.close()
+            self.noise = None
+
+
+def shared_array(slot, name, shape, dtype):
+    """Reuse the shared memory of a slot if shape and data type match"""
+    from numpy import dtype as numpy_dtype
+    shared = slot.get(name)
+    if not isinstance(shared, Shared_Array) or \
+            shared.shape != tuple(shape) or shared.dtype != numpy_dtype(dtype):
+        if isinstance(shared, Shared_Array):
+            shared.close()
+        shared = slot[name] = Shared_Array(shape, dtype)
+    return shared
+
+
+class Shared_Array(object):
+    """NumPy array in shared memory, created by the parent process"""
+    def __init__(self, shape, dtype):
+        from multiprocessing.shared_memory import SharedMemory
+        from numpy import dtype as numpy_dtype, ndarray, prod
+        self.shape = tuple(shape)
+        self.dtype = numpy_dtype(dtype)
+        size = int(prod(self.shape)) * self.dtype.itemsize
+        self.memory = SharedMemory(create=True, size=max(size, 1))
+        self.array = ndarray(self.shape, self.dtype, buffer=self.memory.buf)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.shape}, {self.dtype})"
+
+    @property
+    def spec(self):
+        """What a worker process needs to attach to it"""
+        return self.memory.name, self.shape, self.dtype.str
+
+    def close(self):
+        self.array = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+def process_shared_tile(image_spec, noise_spec, mask_spec, region, threshold):
+    """Run in a worker process"""
+    image = attached_array(image_spec)
+    noise = attached_array(noise_spec)
+    mask = attached_array(mask_spec) if mask_spec else None
+    return process_tile(image, noise, mask, region, threshold)
+
+
+attached_memory = {}
+max_attached = 8
+
+
+def attached_array(spec):
+    """Shared memory created by the parent process, as NumPy array"""
+    from multiprocessing.shared_memory import SharedMemory
+    from numpy import ndarray
+    name, shape, dtype = spec
+    if name not in attached_memory:
+        while len(attached_memory) >= max_attached:
+            oldest = next(iter(attached_memory))
+            attached_memory.pop(oldest).close()
+        attached_memory[name] = SharedMemory(name=name)
+    return ndarray(shape, dtype, buffer=attached_memory[name].buf)
+
+
+def process_tile(image, noise, mask, region, threshold):
+    """Find the spots in one tile of an image
+    image: 2D array, complete image
+    noise: 2D float64 array, same shape as image
+    mask: 2D boolean array or None, complete spot mask, updated inside the region
+    region: (row start, row end, column start, column end), without halo
+    Return value: coordinates of peak pixels, 2D integer array [[row, column],...]
+    """
+    from numpy import sqrt, subtract, argwhere, array, errstate
+    from scipy.ndimage import correlate, maximum_filter, median_filter
+    h, w = image.shape
+    i0, i1, j0, j1 = region
+    a0, a1, b0, b1 = max(i0 - halo, 0), min(i1 + halo, h), max(j0 - halo, 0), min(j1 + halo, w)
+    buffers = work_buffers((a1 - a0, b1 - b0))
+
+    # Subtract 10 count offset from active area of image.
+    I = buffers.I
+    I[...] = image[a0:a1, b0:b1]
+    subtract(I, 10, out=I, where=I > 0)
+    rows, columns = masked_region
+    I[max(rows.start - a0, 0):max(rows.stop - a0, 0),
+      max(columns.start - b0, 0):max(columns.stop - b0, 0)] = 0.
+    I += noise[a0:a1, b0:b1]
+
+    N1, N3 = kernel_sums()
+    S1 = correlate(I, weights(1), output=buffers.S1)
+    S3 = median_filter(I, footprint=kernel(3), output=buffers.S3)
+    I_max = maximum_filter(I, footprint=kernel(0), output=buffers.I_max)
+    with errstate(invalid="ignore"):
+        peaks = (I >= I_max) & ((S1 - S3) / sqrt(S1 / N1 + S3 / N3) > threshold)
+
+    interior = (slice(i0 - a0, i1 - a0), slice(j0 - b0, j1 - b0))
+    if mask is not None:
+        spots = correlate(peaks, kernel(0), output=buffers.spots)
+        mask[i0:i1, j0:j1] = spots[interior]
+        # Zero left and rightmost columns to correct for edge effects.
+        mask[i0:min(i1, 3), j0:j1] = False
+        mask[max(i0, h - 3):i1, j0:j1] = False
+    coordinates = argwhere(peaks[interior]).astype("int32") + array([i0, j0], dtype="int32")
+    return coordinates
+
+
+@cached_function()
+def work_buffers(shape):
+    """Reused for all tiles of the same size processed by a worker process"""
+    return Work_Buffers(shape)
+
+
+class Work_Buffers(object):
+    def __init__(self, shape):
+        from numpy import empty, float32
+        self.I = empty(shape, float32)
+        self.S1 = empty(shape, float32)
+        self.S3 = empty(shape, float32)
+        self.I_max = empty(shape, float32)
+        self.spots = empty(shape, bool)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.I.shape})"
+
+
+@cached_function()
+def kernel(i):
+    from numpy import array
+    return array({0: footprint0, 1: footprint1, 3: footprint3}[i])
+
+
+@cached_function()
+def weights(i):
+    from numpy import sum
+    return kernel(i) * 1. / sum(kernel(i))
+
+
+@cached_function()
+def kernel_sums():
+    from numpy import sum
+    return sum(kernel(1)), sum(kernel(3))
+
+
+if __name__ == "__main__":
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s, line %(lineno)d: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    from numpy.random import poisson
+    self = spot_finder()
+    images = [poisson(10, (3840, 3840)).astype("uint16") for i in range(4)]
+    print("from time import time; t=time(); counts, coordinates = self.find_spots(images); time()-t")
+    print("mask = spot_mask(images[0])")
@@ -2,13 +2,13 @@
 It provides a record array interface.
 Author: Friedrich Schotte
 Date created: 2009-08-22
-Date last modified: 2021-05-06
-Revision comment: Fixed: Issue: numpy 1.20 compatbility: isinstance(x.dtype, dtype)
+Date last modified: 2026-10-17
+Revision comment: save_chunked_HDF5: appending only on request
 """
 from __future__ import division # int/int = float
 from logging import debug,info,warning,error
 
-__version__ = "6.9.12" 
+__version__ = "6.11.1" 
 
 try: from status import status
 except ImportError:
@@ -245,6 +245,8 @@ class table(recarray):
 
     def read_HDF5(self,filename):
         """Read a file in HDF5 format."""
+        from chunked_table import is_chunked_HDF5
+        if is_chunked_HDF5(filename): self.read_chunked_HDF5(filename); return
         import tables
         h5file = tables.openFile(filename)
         columns = list(h5file.root._v_children.keys())
@@ -260,6 +262,16 @@ class table(recarray):
         self.file_timestamp = file_timestamp(self.filename)
         self.filesize = filesize(self.filename)
 
+    def read_chunked_HDF5(self,filename):
+        """Read a file written by 'save_chunked_HDF5' completely.
+        (For reading on demand, use chunked_table.Chunked_HDF5_Table.)"""
+        from chunked_table import Chunked_HDF5_Table
+        self.assign(Chunked_HDF5_Table(filename).load())
+        self.filename = filename
+        self.format = "HDF5"
+        self.file_timestamp = file_timestamp(self.filename)
+        self.filesize = filesize(self.filename)
+
     def read_NetCDF(self,filename):
         """Read a file in NetCDF (Network Common Data Form) format.
         vesion 1 or 2, version 4.0 not supported"""
@@ -354,7 +366,7 @@ class table(recarray):
                 return True
         return False
 
-    def save(self,filename=None,format=""):
+    def save(self,filename=None,format="",append=False):
         """Writes contents to a file.
         filename:
         If 'format' is not specified the file's extension determines the
@@ -367,8 +379,10 @@ class table(recarray):
         by the 'save' method.)
         If the filename has any other extension, a formatted ASCII
         text file with multiple columns, separated by tabs, is generated.
-        format: 'text','MTZ','HDF5','MATLAB','pickle'.
+        format: 'text','MTZ','HDF5','chunked HDF5','MATLAB','pickle'.
         Overrides file format based on file extension.
+        append: chunked HDF5 only: the file contains the beginning of the
+        table, write only the rows added since
         """
         ##debug("save(filename=%r,format=%r)" % (repr(filename),repr(format)))
         if filename is None: filename = self.filename
@@ -382,7 +396,13 @@ class table(recarray):
         format = format.upper()
 
         if format in ["MTZ"]: from MTZ import mtzsave; mtzsave(self,filename)
-        elif format in ["HDF5","H5"]: self.save_HDF5(filename)
+        elif format in ["CHUNKED HDF5","CHUNKED_HDF5"]:
+            self.save_chunked_HDF5(filename,append=append)
+        elif format in ["HDF5","H5"]:
+            from chunked_table import is_chunked_HDF5
+            if is_chunked_HDF5(filename):
+                self.save_chunked_HDF5(filename,append=append)
+            else: self.save_HDF5(filename)
         elif format in ["MATLAB","MAT"]: self.save_MATLAB(filename)
         elif format in ["PICKLE","PKL"]: self.save_pickle(filename)
         elif format in ["TEXT","TXT"]: self.save_text(filename)
@@ -416,6 +436,21 @@ class table(recarray):
         self.file_timestamp = file_timestamp(self.filename)
         self.filesize = filesize(self.filename)
 
+    def save_chunked_HDF5(self,filename,append=False):
+        """Write a table object to a file in HDF5 format, as one chunked
+        dataset per column.
+        append: the file already contains the beginning of the table,
+        write only the rows added since.
+        chunked_table.Chunked_HDF5_Table(filename) reads the file on demand."""
+        if filename == "": return
+        self.makedir(filename)
+        from chunked_table import save_chunked_HDF5
+        save_chunked_HDF5(self,filename,append=append)
+        self.filename = filename
+        self.format = "HDF5"
+        self.file_timestamp = file_timestamp(self.filename)
+        self.filesize = filesize(self.filename)
+
     def save_NetCDF(self,filename):
         """Write a table object to file in NetCDF (Network Common Data Form)."""
         if filename == "": return
@@ -501,34 +536,21 @@ class table(recarray):
         """Convert a tab or space-separated multicolumn formatted test
         to a 'table' object, replacing the current contents of the table.
         """
-        from numpy import nan,inf,array,int16,int8
+        from itertools import zip_longest
 
         ##debug("Splitting into lines")
         lines = UNIX_text(text).split("\n")
-        ##debug("Text to binary: pass 1")
-        # First pass: Count number of columns
-        Ncol = 0; Nrow = 0; header_line = ""
+        header_line = ""
         for line in lines:
             if line.startswith("#"): header_line = line
-            elif line == "": pass # skip empty lines
-            else:
-                Ncol = max(Ncol,len(split(line,separator)))
-                Nrow += 1
-
         if header_line == "" and len(lines)>0: header_line = lines[0]
-        labels = split(header_line.strip("# "),separator)
-        for col in range(len(labels),Ncol): labels.append("%d"%col)
 
-        data = []
-        for col in range(0,Ncol): data.append([])
-
-        # Second pass: Read data
-        ##debug("Text to binary: pass 2")
+        ##debug("Splitting into fields")
+        Ncol = 0; Nrow = 0; rows = []
         info_dict = OrderedDict()
         for line in lines:
-            if line == header_line:
-                pass # skip header line
-            elif line.startswith("#"):
+            if line.startswith("#"):
+                if line == header_line: continue # skip header line
                 # Interpret comment lines as key/value pairs to be put into
                 # the table's info_dict dictionary.
                 # '# input_dir: "//Femto/C/Data/2010.02"'
@@ -543,39 +565,20 @@ class table(recarray):
                 if keyword: info_dict[keyword] = value
             elif line == "": pass # skip empty lines
             else:
-                fields = split(line,separator)
-                for col in range(0,Ncol):
-                    try: val = fields[col]
-                    except IndexError: val = ""
-                    if isstring(val) and type(val) != str:
-                        try: val = str(val)
-                        except UnicodeEncodeError: pass
-                    if isstring(val):
-                        try: val = int(val)
-                        except ValueError: pass
-                    if isstring(val):
-                        try: val = float(val)
-                        except ValueError: pass
-                    if isstring(val):
-                        if val in ("NaN","nan","-1.#IND","N.A."): val = nan
-                        elif val in ("Inf","inf","1.#INF"): val = inf
-                        elif val in ("-Inf","-inf","-1.#INF"): val = -inf
-                    data[col].append(val)
-
-        # Convert columns to numpy array.
-        ##debug("Converting to numpy array")
-        for col in range(0,Ncol): data[col] = array(data[col])
-
-        # Reduce the memory footprint of the arrays as much as possible.
-        ##debug("Optimizing data types")
-        for col in range(0,Ncol): 
-            ##if data[col].dtype == float64:
-            ##    data[col] = array(data[col],float32)
-            try:
-                for dtype in int16,int8,bool:
-                    if all(data[col] == array(data[col],dtype)):
-                        data[col] = array(data[col],dtype)
-            except ValueError: pass
+                fields = fast_split(line,separator)
+                Ncol = max(Ncol,len(fields))
+                Nrow += 1
+                if line != header_line: rows.append(fields)
+
+        labels = split(header_line.strip("# "),separator)
+        for col in range(len(labels),Ncol): labels.append("%d"%col)
+
+        # Convert columns to numpy array, reducing the memory footprint of
+        # the arrays as much as possible.
+        ##debug("Text to binary")
+        columns = list(zip_longest(*rows,fillvalue=""))
+        for col in range(len(columns),Ncol): columns.append(("",)*len(rows))
+        data = [shrunk(column_values(columns[col])) for col in range(0,Ncol)]
 
         # Convert columns to record array.
         ##debug("Converting  to record array")
@@ -999,6 +1002,66 @@ def split(s,separator=None):
         return split(s)
     else: return s.split(separator)
 
+def fast_split(s,separator=None):
+    """Same as 'split', using shlex only for lines with quotes"""
+    if separator is None and s.isascii() and not any(c in s for c in "\"'\\"):
+        return s.split()
+    return split(s,separator)
+
+def column_values(strings):
+    """Convert the fields of a text column to a numpy array.
+    Columns that are all integers or all floating point numbers are
+    converted in bulk, others one field at a time.
+    The column type is guessed from the first rows.
+    strings: list of strings"""
+    from numpy import array,float64
+    if len(strings) == 0: return array([],float64)
+    sample = strings[0:column_sample_size]
+    if all(isint(s) for s in sample):
+        try: return array(list(map(int,strings)))
+        except ValueError: pass
+    if all(isfloat(s) for s in sample):
+        try: return array(list(map(float,strings)))
+        except ValueError: pass
+    return array([field_value(s) for s in strings])
+
+column_sample_size = 100
+
+def isint(s):
+    try: int(s)
+    except ValueError: return False
+    return True
+
+def isfloat(s):
+    try: float(s)
+    except ValueError: return False
+    return True
+
+def field_value(val):
+    """Convert a field of a text column to a number, if possible"""
+    from numpy import nan,inf
+    val = str(val)
+    try: return int(val)
+    except ValueError: pass
+    try: return float(val)
+    except ValueError: pass
+    if val in ("NaN","nan","-1.#IND","N.A."): val = nan
+    elif val in ("Inf","inf","1.#INF"): val = inf
+    elif val in ("-Inf","-inf","-1.#INF"): val = -inf
+    return val
+
+def shrunk(values):
+    """Reduce the memory footprint of an array as much as possible."""
+    from numpy import array,int16,int8,all
+    ##if values.dtype == float64:
+    ##    values = array(values,float32)
+    try:
+        for dtype in int16,int8,bool:
+            if all(values == array(values,dtype)):
+                values = array(values,dtype)
+    except ValueError: pass
+    return values
+
 def isarray(x):
     """Is x an array-like object? numpy array, list or tuple"""
     if not hasattr(x,"__len__"): return False
@@ -0,0 +1,145 @@
+"""
+Bulk conversion of date strings from log files to seconds since
+1970-01-01 00:00:00 UTC, using NumPy array arithmetic on the fixed-layout
+digits instead of parsing one string at a time.
+Strings not matching the layout "2017-10-04 20:17:34.286479-0500" (with
+optional fraction and time zone) are converted one at a time, with the
+same result as "timestamp_fast" in "channel_archiver_logfile", or NaN if
+that fails.
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment: Seconds 60 and 61 invalid, as for timestamp_fast
+"""
+__version__ = "1.0.1"
+
+
+def timestamps_fast(date_times):
+    """Convert date strings to number of seconds since 1 Jan 1970 00:00 UTC
+    date_times: list of bytes, e.g. [b"2017-10-04 20:17:34.286479-0500", ...]
+    Return value: float64 array
+    """
+    from numpy import array, zeros, uint8, int64, arange, float64, where, ones
+    from numpy.char import str_len
+
+    n = len(date_times)
+    if n == 0:
+        return zeros(0, dtype=float64)
+    strings = array(date_times, dtype=bytes)
+    width = max(strings.itemsize, 32)
+    chars = zeros((n, width), dtype=uint8)
+    chars[:, 0:strings.itemsize] = strings.view(uint8).reshape(n, strings.itemsize)
+    lengths = str_len(strings)
+    valid = ones(n, dtype=bool)
+
+    rows = arange(n)
+    # Time zone suffix, e.g. "-0500"
+    sign_char = chars[rows, (lengths - 5).clip(0)]
+    has_TZ = (lengths >= 5) & ((sign_char == ord(b"+")) | (sign_char == ord(b"-")))
+    TZ_sign = where(sign_char == ord(b"-"), -1, 1)
+    TZ_hours = digits(chars, rows, lengths - 4, 2)
+    TZ_offset = where(has_TZ, TZ_sign * TZ_hours, 0)
+    # int(TZ[0:3]) requires the two hour characters to be digits.
+    valid &= ~has_TZ | is_digits(chars, rows, lengths - 4, 2)
+    date_length = where(has_TZ, lengths - 5, lengths)
+
+    # Fixed layout "YYYY-mm-dd HH:MM:SS"
+    for (column, char) in (4, b"-"), (7, b"-"), (10, b" "), (13, b":"), (16, b":"):
+        valid &= chars[:, column] == ord(char)
+    for (column, count) in (0, 4), (5, 2), (8, 2), (11, 2), (14, 2), (17, 2):
+        valid &= is_digits(chars, rows, column, count)
+    year = digits(chars, rows, 0, 4)
+    month = digits(chars, rows, 5, 2)
+    day = digits(chars, rows, 8, 2)
+    hour = digits(chars, rows, 11, 2)
+    minute = digits(chars, rows, 14, 2)
+    second = digits(chars, rows, 17, 2)
+
+    # Optional fraction of seconds, 1 to 6 digits
+    fraction_length = date_length - 20
+    has_fraction = date_length > 19
+    valid &= (date_length == 19) | (
+        (chars[:, 19] == ord(b".")) & (fraction_length >= 1) & (fraction_length <= 6))
+    microseconds = zeros(n, dtype=int64)
+    for k in range(0, 6):
+        digit = chars[:, 20 + k].astype(int64) - ord(b"0")
+        present = has_fraction & (k < fraction_length)
+        valid &= ~present | ((digit >= 0) & (digit <= 9))
+        microseconds += where(present, digit, 0) * 10 ** (5 - k)
+
+    # Ranges accepted by "datetime.strptime" (no leap seconds)
+    leap_year = ((year % 4 == 0) & (year % 100 != 0)) | (year % 400 == 0)
+    month_days = array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+    days_in_month = month_days[(month - 1).clip(0, 11)] + ((month == 2) & leap_year)
+    valid &= (year >= 1) & (month >= 1) & (month <= 12)
+    valid &= (day >= 1) & (day <= days_in_month)
+    valid &= (hour <= 23) & (minute <= 59) & (second <= 59)
+
+    days = days_since_epoch(year, month, day)
+    seconds = ((days * 24 + hour) * 60 + minute) * 60 + second
+    # Same rounding as datetime.timedelta.total_seconds
+    timestamps = (seconds * 1000000 + microseconds) / 1e6
+    timestamps -= TZ_offset * 3600
+
+    invalid = where(~valid)[0]
+    if len(invalid) > 0:
+        from channel_archiver_logfile import timestamp_fast
+        from numpy import nan
+        for i in invalid:
+            try:
+                timestamps[i] = timestamp_fast(date_times[i])
+            except ValueError:
+                timestamps[i] = nan
+    return timestamps
+
+
+def digits(chars, rows, columns, count):
+    """Decimal number formed by 'count' characters, starting at 'columns'"""
+    from numpy import int64, zeros, clip
+    value = zeros(len(rows), dtype=int64)
+    for k in range(0, count):
+        value = value * 10 + (chars[rows, clip(columns + k, 0, None)].astype(int64) - ord(b"0"))
+    return value
+
+
+def is_digits(chars, rows, columns, count):
+    from numpy import ones, clip
+    valid = ones(len(rows), dtype=bool)
+    for k in range(0, count):
+        char = chars[rows, clip(columns + k, 0, None)]
+        valid &= (char >= ord(b"0")) & (char <= ord(b"9"))
+    return valid
+
+
+def days_since_epoch(year, month, day):
+    """Days since 1970-01-01 in the proleptic Gregorian calendar"""
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    return era * 146097 + day_of_era - 719468
+
+
+def values_fast(strings):
+    """Convert strings to floating point numbers, all at once if possible
+    strings: list of bytes
+    Return value: array"""
+    from numpy import array, float64
+    try:
+        values = array(strings, dtype=bytes).astype(float64)
+    except ValueError:
+        from channel_archiver_logfile import convert
+        values = array([convert(string, "value") for string in strings], dtype=object)
+        if all(isinstance(value, float) for value in values):
+            values = values.astype(float64)
+    return values
+
+
+if __name__ == "__main__":
+    from channel_archiver_logfile import timestamp_fast
+
+    date_times = [b"2017-10-04 20:17:34.286479-0500", b"2017-10-04 20:17:34-0500",
+                  b"2020-02-29 00:00:00.5", b"2021-02-29 00:00:00", b"invalid"]
+    print("timestamps_fast(date_times)")
+    print("[timestamp_fast(date_time) for date_time in date_times]")
@@ -11,15 +11,17 @@ wput("test\n","//id14timing3.cars.aps.anl.gov:2001/tmp/test.txt")
 wput("."*1000000,"//id14timing3.cars.aps.anl.gov:2001/tmp/test.dat")
 data = wget("//id14timing3.cars.aps.anl.gov:2001/tmp/test.dat")
 wdel("//id14timing3.cars.aps.anl.gov:2001/tmp/test.txt")
+wput_files([b"test1\n",b"test2\n"],["//id14timing3.cars.aps.anl.gov:2001/tmp/test1.txt",
+    "//id14timing3.cars.aps.anl.gov:2001/tmp/test2.txt"])
 
 Transfer speed: 8.2 MB/s upload, 8.1 MB/s download
 : 15 us per file upload, 8 ms per file download
 Author: Friedrich Schotte,
 Date created: 2015-11-21
-Data last modified: 2021-07-16
-Revision comment: Refactored
+Data last modified: 2026-10-17
+Revision comment: wput_files: pipelined upload of multiple files
 """
-__version__ = "1.4.6"
+__version__ = "1.5.0"
 
 from logging import error, warning
 
@@ -57,6 +59,109 @@ def wput(data, URL):
         error(f"{URL!r}: IP address unknown")
 
 
+def wput_files(contents, URLs):
+    """Upload several files across the network, over one connection,
+    sending the requests back-to-back without waiting for replies in between
+    contents: list of bytes. None deletes the file.
+    URLs: e.g. ["//id14timing3.cars.aps.anl.gov:2001/tmp/test1.txt", ...]
+    Return value: number of bytes transferred
+    """
+    from time import time
+    from logging import debug
+
+    servers = {}
+    for (data, URL) in zip(contents, URLs):
+        if has_ip_address(URL):
+            servers.setdefault(ip_address_and_port(URL), []).append((data, pathname(URL)))
+        else:
+            error(f"{URL!r}: IP address unknown")
+
+    byte_count = 0
+    t0 = time()
+    for server in servers:
+        byte_count += put_requests(server, servers[server])
+    dt = time() - t0
+    if byte_count > 0:
+        debug(f"Transferred {len(URLs)} files, {byte_count} bytes in {dt:.3f} s "
+              f"({byte_count / max(dt, 1e-6):.0f} bytes/s)")
+    return byte_count
+
+
+def put_requests(server, files):
+    """Send PUT and DEL requests to a file server in one stream, followed
+    by a SIZE request, whose reply confirms that all requests were processed.
+    server: IP address and port, e.g. "id14timing3.cars.aps.anl.gov:2001"
+    files: list of (content, pathname) tuples, content None = delete
+    Return value: number of bytes transferred
+    """
+    import socket
+    chunk_size = 1024 * 1024
+
+    chunks = []
+    chunk = []
+    chunk_length = 0
+    length = 0
+    for (data, path) in files:
+        if data is not None:
+            request = b"PUT %s\nContent-Length: %d\n\n" % (path.encode("utf-8"), len(data))
+            chunk += [request, data]
+            chunk_length += len(request) + len(data)
+            length += len(data)
+        else:
+            request = b"DEL %s\n\n" % path.encode("utf-8")
+            chunk += [request]
+            chunk_length += len(request)
+        if chunk_length >= chunk_size:
+            chunks.append(b"".join(chunk))
+            chunk, chunk_length = [], 0
+    chunks.append(b"".join(chunk))
+    last_path = files[-1][1] if len(files) > 0 else "/"
+    chunks.append(b"SIZE %s\n\n" % last_path.encode("utf-8"))
+
+    byte_count = 0
+    with lock:  # Allow only one thread at a time inside this function.
+        for attempt in range(0, 2):
+            try:
+                c = connection(server)
+                if c is None:
+                    break
+                for chunk in chunks:
+                    c.sendall(chunk)
+                reply = receive_reply(c)
+                if reply is None:
+                    continue
+            except socket.error:
+                continue
+            byte_count = length
+            break
+    return byte_count
+
+
+def receive_reply(c):
+    """Content of a reply from the file server
+    c: socket
+    Return value: bytes, None if the server disconnected"""
+    reply = b""
+    while b"\n\n" not in reply:
+        r = c.recv(65536)
+        if len(r) == 0:
+            return None
+        reply += r
+    header_size = reply.find(b"\n\n") + 2
+    keyword = b"Content-Length: "
+    if keyword not in reply[0:header_size]:
+        return b""
+    start = reply.find(keyword) + len(keyword)
+    end = start + reply[start:].find(b"\n")
+    file_size = int(reply[start:end])
+    while len(reply) < header_size + file_size:
+        r = c.recv(65536)
+        if len(r) == 0:
+            return None
+        reply += r
+    return reply[header_size:header_size + file_size]
+
+
 def wget(URL):
     """Download a file from the network
     URL: e.g. "//id14timing3.cars.aps.anl.gov:2001/tmp/test.txt"
@@ -341,5 +446,6 @@ if __name__ == "__main__":
         wput(open(filename).read(), URL)
 
     # wput(b"test\n",'localhost:2001/tmp/test.txt')
+    # wput_files([b"test\n"]*500,['localhost:2001/tmp/test%d.txt' % i for i in range(500)])
     # wget('localhost:2001/tmp/test.txt')
     # wdir('localhost:2001/tmp/sequencer_fs/*')
@@ -4,10 +4,10 @@ in "Piano Player" mode.
 
 Author: Friedrich Schotte
 Date created: 2015-05-01
-Date last modified: 2022-08-17
-Revision comment: Omitting new line terminator for sequence counts
+Date last modified: 2026-10-17
+Revision comment: generate_and_put_files: reporting upload errors
 """
-__version__ = "9.2"
+__version__ = "9.5.1"
 __generator_version__ = "8.7.1"
 
 import logging
@@ -592,17 +592,14 @@ class Timing_System_Sequencer_Driver(object):
                 if filename not in uploaded_files:
                     uploaded_files += [filename]
 
-            for i, sequence in enumerate(sequences):
-                if self.update_queues_cancelled:
-                    break
+            filenames = []
+            sequences_to_generate = []
+            for sequence in sequences:
                 filename = self.sequence_dir + "/" + sequence.id
-                if filename not in uploaded_files:
-                    if not sequence.is_cached:
-                        logging.info(f"Generating packets: {i+1}/{len(sequences)}")
-                    file_content = sequence.data
-                    logging.debug(f"Uploading {sequence.id!r}")
-                    self.put_file(filename, file_content)
-                    uploaded_files += [filename]
+                if filename not in uploaded_files and filename not in filenames:
+                    filenames += [filename]
+                    sequences_to_generate += [sequence]
+            self.generate_and_put_files(filenames, sequences_to_generate, uploaded_files)
 
         # Switch queue when ready
         if self.default_queue_name_requested is not None:
@@ -616,6 +613,97 @@ class Timing_System_Sequencer_Driver(object):
 
         self.remove_unused_sequences()
 
+    max_generator_processes = None  # default: number of CPUs
+    generator_lookahead = 2  # sequences queued per process
+
+    def generate_and_put_files(self, filenames, sequences, uploaded_files):
+        """Generate the binary data for sequences in parallel, in separate
+        processes, while uploading the already generated ones to the file
+        system if the timing system
+        filenames: full pathnames on the timing system
+        uploaded_files: list of pathnames, updated with each upload
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from collections import deque
+        from threading import Thread
+        from queue import Queue
+        from os import cpu_count
+
+        process_count = self.max_generator_processes or cpu_count() or 1
+        uploads = Queue(maxsize=process_count * self.generator_lookahead)
+        upload_errors = []
+
+        def upload():
+            # After a failed upload, keep consuming the queue, such that the
+            # generating thread does not block, and report the error at the end.
+            done = False
+            while not done:
+                # Upload all packets generated so far in one batch.
+                items = [uploads.get()]
+                while not uploads.empty():
+                    items.append(uploads.get())
+                if None in items:
+                    items = items[0:items.index(None)]
+                    done = True
+                if len(items) > 0 and not self.update_queues_cancelled and not upload_errors:
+                    filenames = [filename for (filename, _) in items]
+                    logging.debug(f"Uploading {filenames}")
+                    try:
+                        self.put_files(filenames, [file_content for (_, file_content) in items])
+                    except Exception as x:
+                        logging.error(f"Uploading {filenames}: {x}")
+                        upload_errors.append(x)
+                    else:
+                        uploaded_files.extend(filenames)
+
+        uploader = Thread(target=upload, daemon=True)
+        uploader.start()
+
+        generating = deque()
+
+        def finish_generating():
+            i, filename, sequence, future = generating.popleft()
+            if future is not None:
+                logging.info(f"Generating packets: {i+1}/{len(sequences)}")
+                # noinspection PyBroadException
+                try:
+                    data = future.result()
+                except Exception:
+                    logging.warning(f"{sequence.id!r}: {format_exc()}")
+                    data = sequence.data  # Retry in this process.
+                else:
+                    sequence.cached_data = data
+            else:
+                data = sequence.data
+            uploads.put((filename, data))
+
+        def cancelled():
+            return self.update_queues_cancelled or len(upload_errors) > 0
+
+        try:
+            with ProcessPoolExecutor(max_workers=process_count) as pool:
+                for i, (filename, sequence) in enumerate(zip(filenames, sequences)):
+                    if cancelled():
+                        break
+                    if sequence.is_cached:
+                        future = None
+                    else:
+                        register_specs = portable_register_specs(sequence.register_specs)
+                        future = pool.submit(sequencer_packet, register_specs, sequence.descriptor)
+                    generating.append((i, filename, sequence, future))
+                    while len(generating) > process_count * self.generator_lookahead:
+                        finish_generating()
+                while len(generating) > 0 and not cancelled():
+                    finish_generating()
+                for (_, _, _, future) in generating:
+                    if future is not None:
+                        future.cancel()
+        finally:
+            uploads.put(None)
+            uploader.join()
+        if upload_errors:
+            raise upload_errors[0]
+
     @staticmethod
     def unique_sequences(sequences):
         unique_sequences = []
@@ -881,19 +969,15 @@ class Timing_System_Sequencer_Driver(object):
 
     def put_files(self, filenames, contents):
         """Group transfer of several files to the file system if the timing
-        system"""
+        system, sent back-to-back over one connection"""
+        from timing_system_file_client import wput_files
         if len(filenames) > 0:
-            s = f"Transferring {len(filenames)} files:\n"
-            for i in range(0, min(len(filenames), 2)):
-                s += f" {filenames[i]}: {len(contents[i])} bytes\n"
-            from time import time
             n = sum([len(content) for content in contents])
-            t0 = time()
-            logging.debug(f"Transferring {n} bytes of data to timing system")
-            for (filename, content) in zip(filenames, contents):
-                self.put_file(filename, content)
-            dt = time() - t0
-            logging.debug(f"Transferred {n} bytes in {dt:.3f} s ({float(n) / dt:.0f} bytes/s)")
+            logging.debug(f"Transferring {len(filenames)} files, {n} bytes of data to timing system")
+            wput_files(
+                [content if len(content) > 0 else None for content in contents],
+                [self.ip_address + filename for filename in filenames],
+            )
 
     def telnet(self, command):
         """Execute a system command on the timing system's CPU and return
@@ -1032,58 +1116,166 @@ def sequencer_packet(register_specs, descriptor=None):
     registers: list of timing register objects
     counts: list of integer arrays, one array for each register
     """
-    registers = [spec.register for spec in register_specs]
+    from numpy import zeros, uint8, concatenate, lexsort, cumsum, arange, \
+        frombuffer, unique, full, ones
 
     # Find the times when register counts change.
     N = max([len(spec.counts) for spec in register_specs])
-
-    packets = {}
-
-    def append(packets, key, data):
-        packets[key] = packets.get(key, b"") + data
-
-    from sparse_array import starts
+    if N == 0:
+        return b""
+
+    # Packets to be assembled, as tuples (its, rank, data),
+    # its: index counts, rank: (register, operation) position within the
+    # index count, data: 2D array of bytes, one row per index count.
+    groups = []
+    header = interrupt_count_packet(N)
+    if descriptor:
+        header += descriptor_packet(descriptor)
+    groups.append(([0], (-1, 0), frombuffer(header, dtype=uint8)[None, :]))
 
     for i_reg, spec in enumerate(register_specs):
-        for op in spec.op.split(","):
+        its, counts = change_points(spec.counts)
+        ops = spec.op.split(",")
+        for i_op, op in enumerate(ops):
             if op == "set":
-                for it in starts(spec.counts):
-                    count = spec.counts[it]
-                    packet = write_packet(spec.register, count)
-                    append(packets, (it, i_reg), packet)
+                its_op, data = register_packets("write", spec.register, its, counts)
             elif op == "inc":
-                for it in starts(spec.counts):
-                    count = spec.counts[it]
-                    if count != 0:
-                        packet = increment_packet(spec.register, count)
-                        append(packets, (it, i_reg), packet)
+                selected = counts != 0
+                its_op, data = register_packets("increment", spec.register,
+                                                its[selected], counts[selected])
             elif op == "report":
-                for it in starts(spec.counts):
-                    count = spec.counts[it]
-                    if not ("inc" in spec.op and count == 0):
-                        packet = report_packet(spec.register)
-                        append(packets, (it, i_reg), packet)
+                selected = ~(counts == 0) if "inc" in spec.op else ones(len(its), bool)
+                report = frombuffer(report_packet(spec.register), dtype=uint8)
+                its_op, data = its[selected], report[None, :].repeat(selected.sum(), axis=0)
             else:
                 logging.warning(f"{op!r}: Expecting 'set', 'inc', or 'report'")
+                continue
+            groups.append((its_op, (i_reg, i_op), data))
+
+    # Each index count with packets needs an index count packet.
+    index_its = unique(concatenate([[0]] + [its for (its, _, _) in groups]))
+    groups.append((index_its, (-2, 0), index_count_packets(index_its)))
 
     # Assemble packets in correct sequence order
-    interrupt_data = [b""] * N
-    if N > 0:
-        interrupt_data[0] += interrupt_count_packet(N)
-        if descriptor:
-            interrupt_data[0] += descriptor_packet(descriptor)
-    for it in range(0, N):
-        for i_reg in range(0, len(registers)):
-            if (it, i_reg) in packets:
-                interrupt_data[it] += packets[it, i_reg]
-        if len(interrupt_data[it]) > 0:
-            interrupt_data[it] = index_count_packet(it) + interrupt_data[it]
-
-    data = b""
-    for it in range(0, N):
-        data += interrupt_data[it]
+    its = concatenate([its for (its, _, _) in groups]).astype(int)
+    registers = concatenate([full(len(data), rank[0]) for (_, rank, data) in groups])
+    operations = concatenate([full(len(data), rank[1]) for (_, rank, data) in groups])
+    lengths = concatenate([full(len(data), data.shape[1]) for (_, _, data) in groups])
+    sequence = lexsort((operations, registers, its))
+    offsets = zeros(len(its), int)
+    offsets[sequence] = cumsum(lengths[sequence]) - lengths[sequence]
+    data = zeros(lengths.sum(), dtype=uint8)
+    i = 0
+    for (_, _, group_data) in groups:
+        n, length = group_data.shape
+        data[offsets[i:i + n, None] + arange(length)] = group_data
+        i += n
+    return data.tobytes()
 
-    return data
+
+def portable_register_specs(register_specs):
+    """Copies of register specs that can be passed to another process,
+    with only the information about the registers needed to generate packets
+    """
+    from timing_system_register_spec import timing_system_register_spec
+    portable_specs = [
+        timing_system_register_spec(Register_Layout(spec.register), spec.counts, spec.op)
+        for spec in register_specs
+    ]
+    return portable_specs
+
+
+class Register_Layout:
+    """Name, address and bit field of a timing system register"""
+    def __init__(self, register):
+        self.name = register.name
+        self.address = register.address
+        self.bits = register.bits
+        self.bit_offset = register.bit_offset
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r}, address=0x{self.address:X}, " \
+               f"bits={self.bits}, bit_offset={self.bit_offset})"
+
+
+def change_points(counts):
+    """Indices of the elements where the value changes, and the values
+    counts: sparse_array or array
+    Return value: (indices, values), both arrays
+    """
+    from numpy import array, asarray, concatenate, flatnonzero
+    from sparse_array import sparse_array
+    if type(counts) == sparse_array:
+        its = counts.starts
+        values = [counts.content[it] for it in its]
+    else:
+        counts = asarray(counts)
+        changed = counts[1:] != counts[:-1]
+        its = flatnonzero(concatenate([[True], changed])) if len(counts) > 0 else []
+        values = counts[its]
+    return array(its, dtype=int), array(values)
+
+
+def register_packets(packet_type, register, its, counts):
+    """Timing sequencer instructions to write or increment a register,
+    same as 'write_packet' or 'increment_packet', for many counts
+    packet_type: "write" or "increment"
+    register: e.g. pson
+    its: index counts
+    counts: array of integer numbers
+    Return value: (index counts, 2D array of bytes, one row per packet)
+    """
+    from numpy import zeros, uint8, int64, isfinite, all, any
+    count_bitmask = ((1 << register.bits) - 1)
+    bitmask = count_bitmask << register.bit_offset
+    address = register.address
+    vectorizable = counts.dtype.kind in "iub" or \
+        (counts.dtype.kind == "f" and all(isfinite(counts)))
+    if vectorizable:
+        converted_counts = counts.astype(int64) & count_bitmask
+        bit_counts = converted_counts << register.bit_offset
+        vectorizable = not any(converted_counts != counts) and \
+            not any(bit_counts > 0xFFFFFFFF) and \
+            bitmask <= 0xFFFFFFFF and 0 <= address <= 0xFFFFFFFF
+    if vectorizable:
+        records = zeros(len(counts), dtype=[
+            ("type", "u1"), ("version", "u1"), ("length", ">u2"),
+            ("address", ">u4"), ("bitmask", ">u4"), ("count", ">u4"),
+        ])
+        records["type"] = type_codes[packet_type]
+        records["version"] = 1
+        records["length"] = records.itemsize
+        records["address"] = address
+        records["bitmask"] = bitmask
+        records["count"] = bit_counts
+        data = records.view(uint8).reshape(len(counts), records.itemsize)
+    else:
+        # Conversion warnings and errors are handled one packet at a time.
+        function = write_packet if packet_type == "write" else increment_packet
+        packets = [function(register, count) for count in counts.tolist()]
+        its = its[[len(packet) > 0 for packet in packets]]
+        packets = [packet for packet in packets if len(packet) > 0]
+        data = zeros((0, 16), dtype=uint8)
+        if len(packets) > 0:
+            from numpy import frombuffer
+            data = frombuffer(b"".join(packets), dtype=uint8).reshape(len(packets), -1)
+    return its, data
+
+
+def index_count_packets(index_counts):
+    """Timing sequencer instructions, same as 'index_count_packet', for
+    many index counts
+    Return value: 2D array of bytes, one row per packet
+    """
+    from numpy import zeros, uint8
+    records = zeros(len(index_counts), dtype=[
+        ("type", "u1"), ("version", "u1"), ("length", ">u2"), ("index_count", ">u4"),
+    ])
+    records["type"] = type_codes["index count"]
+    records["version"] = 1
+    records["length"] = records.itemsize
+    records["index_count"] = index_counts
+    return records.view(uint8).reshape(len(index_counts), records.itemsize)
 
 
 def packet(packet_type=None, payload=b""):
@@ -3,10 +3,10 @@
 Simulated network server for communicating wit the FPGA timing system.
 Author: Friedrich Schotte
 Date created: 2020-05-29
-Date last modified: 2020-06-03
-Revision comment: Added: module logger
+Date last modified: 2026-10-17
+Revision comment: Processing pipelined requests
 """
-__version__ = "1.0.1"
+__version__ = "1.1.0"
 
 import logging
 logger = logging.getLogger(__name__)
@@ -53,15 +53,24 @@ class File_Server(object):
         self.buffers[addr] += data_received
         buffer = self.buffers[addr]
 
-        if len(buffer) >= self.message_size(buffer):
-            message_size = self.message_size(buffer)
-            message = buffer[0:message_size]
+        # Clients may send several requests back-to-back, without waiting
+        # for a reply (pipelining).
+        offset = 0
+        while True:
+            header_size = self.header_size(buffer[offset:offset+self.max_header_size])
+            if header_size == 0: break
+            header = buffer[offset:offset+header_size]
+            message_size = header_size+self.payload_size(header)
+            if len(buffer)-offset < message_size: break
+            message = buffer[offset:offset+message_size]
             replies += self.process(message)
-            buffer = buffer[message_size:]
+            offset += message_size
 
-        self.buffers[addr] = buffer                   
+        self.buffers[addr] = buffer[offset:]
         return replies
 
+    max_header_size = 4096
+
     def handle_disconnect(self,addr):
         ##debug("Client %r disconnected" % addr)
         if addr in self.buffers: del self.buffers[addr]
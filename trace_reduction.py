@@ -0,0 +1,153 @@
+"""
+Reduction of the oscilloscope traces of a dataset ("xray_traces" directory)
+to one summary table per scope channel, with one row per trigger event
+(segment): trigger time, integrated pulse area, peak amplitude and time of
+the peak.
+Files are processed in parallel in a pool of worker processes; the segments
+of a file are reduced together with array operations on the raw sample
+counts, as mapped from the file, without converting them to voltage first.
+
+Trace filenames end with the channel name: "<basename>_<pass>_<channel>.trc",
+e.g. "GB3_PumpProbe_PC0-1_6240_178ms_01_64.040C_07_01_C1.trc"
+Summary files: "<channel>_trace_summary.txt", tab-separated, readable with
+'table'.
+
+Usage:
+reduce_traces("/net/femto-data2/C/Data/2022.03/WAXS/GB3/GB3_PumpProbe_PC0-1/xray_traces")
+
+Author: Friedrich Schotte
+Date created: 2026-10-17
+Date last modified: 2026-10-17
+Revision comment:
+"""
+__version__ = "1.0"
+
+import logging
+
+logger = logging.getLogger(__name__)
+if not logger.level:
+    logger.level = logging.INFO
+
+columns = ["file", "segment", "trigger_time", "integral[Vs]", "peak[V]", "peak_time[s]"]
+
+
+def reduce_traces(directory, output_directory=None, baseline_samples=0,
+                  max_processes=None, chunksize=16):
+    """Write one summary table per channel
+    directory: containing ".trc" files
+    output_directory: default: same as 'directory'
+    baseline_samples: if > 0, the average of the first samples of a segment
+        is subtracted before integration
+    max_processes: default: number of CPUs
+    Return value: list of names of summary files"""
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    from os import cpu_count
+    from time import time
+
+    if output_directory is None:
+        output_directory = directory
+    filenames = trace_filenames(directory)
+    summary_filenames = []
+    start_time = time()
+    process_count = max_processes or cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=process_count) as pool:
+        for channel in sorted(filenames):
+            reduce = partial(trace_summary, baseline_samples=baseline_samples)
+            summaries = pool.map(reduce, filenames[channel], chunksize=chunksize)
+            summary_filename = f"{output_directory}/{channel}_trace_summary.txt"
+            save_summaries(summary_filename, filenames[channel], summaries)
+            summary_filenames.append(summary_filename)
+    if logger.isEnabledFor(logging.DEBUG):
+        file_count = sum(len(names) for names in filenames.values())
+        logger.debug(f"{directory}: {file_count} files in {time() - start_time:.3f} s")
+    return summary_filenames
+
+
+def trace_filenames(directory):
+    """Trace files by channel name
+    Return value: dictionary of sorted lists of pathnames"""
+    from os import scandir
+    filenames = {}
+    with scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".trc") and not entry.name.startswith("."):
+                channel = trace_channel(entry.name)
+                filenames.setdefault(channel, []).append(entry.path)
+    for channel in filenames:
+        filenames[channel].sort()
+    return filenames
+
+
+def trace_channel(filename):
+    """E.g. "C1" for ".../GB3_PumpProbe_PC0-1_6240_178ms_01_64.040C_07_01_C1.trc" """
+    from os.path import basename, splitext
+    return splitext(basename(filename))[0].split("_")[-1]
+
+
+def trace_summary(filename, baseline_samples=0):
+    """Per-segment values of a trace file
+    Return value: dictionary of 1D arrays with keys "trigger_time",
+    "integral", "peak", "peak_time", one element per segment,
+    None if the file cannot be read"""
+    from numpy import arange, int64
+    from lecroy_scope_trace_file import lecroy_scope_trace_file
+    try:
+        with lecroy_scope_trace_file(filename) as trace:
+            counts = trace.counts
+            if counts.ndim != 2:  # truncated file
+                return None
+            gain, offset = trace.vertical_gain, trace.vertical_offset
+            dt = trace.horiz_interval
+            N = counts.shape[1]
+            sums = counts.sum(axis=1, dtype=int64)
+            i_peak = counts.argmax(axis=1) if gain >= 0 else counts.argmin(axis=1)
+            peak_counts = counts[arange(len(counts)), i_peak]
+            baseline = 0.0
+            if baseline_samples > 0:
+                baseline = counts[:, 0:baseline_samples].mean(axis=1) * gain - offset
+            summary = dict(
+                trigger_time=trace.trigger_times,
+                integral=((sums * gain - N * offset) - N * baseline) * dt,
+                peak=peak_counts * gain - offset - baseline,
+                peak_time=trace.trigger_offsets + i_peak * dt,
+            )
+            del counts
+    except (OSError, ValueError) as x:
+        logger.warning(f"{filename}: {x}")
+        summary = None
+    return summary
+
+
+def save_summaries(filename, filenames, summaries):
+    """Tab-separated table, one row per segment
+    filenames: list of pathnames of trace files
+    summaries: iterable of dictionaries as returned by 'trace_summary'"""
+    from os import makedirs, replace
+    from os.path import basename, dirname
+    lines = ["#" + "\t".join(columns) + "\n"]
+    for trace_filename, summary in zip(filenames, summaries):
+        if summary is None:
+            continue
+        name = basename(trace_filename)
+        lines += [
+            f"{name}\t{i}\t{t:.6f}\t{integral:.6g}\t{peak:.6g}\t{peak_time:.6g}\n"
+            for (i, (t, integral, peak, peak_time)) in enumerate(zip(
+                summary["trigger_time"].tolist(), summary["integral"].tolist(),
+                summary["peak"].tolist(), summary["peak_time"].tolist(),
+            ))
+        ]
+    if dirname(filename):
+        makedirs(dirname(filename), exist_ok=True)
+    with open(filename + ".tmp", "w") as file:
+        file.writelines(lines)
+    replace(filename + ".tmp", filename)
+
+
+if __name__ == "__main__":
+    msg_format = "%(asctime)s %(levelname)s %(module)s.%(funcName)s, line %(lineno)d: %(message)s"
+    logging.basicConfig(level=logging.DEBUG, format=msg_format)
+
+    directory = "//femto-data2/C/Data/2022.03/WAXS/GB3/GB3_PumpProbe_PC0-1/xray_traces"
+    print(f"directory = {directory!r}")
+    print("reduce_traces(directory)")